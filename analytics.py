@@ -0,0 +1,116 @@
+import math
+from array import array
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class BoardAnalytics:
+    # Counters kept in step with the task index: the manager calls add,
+    # remove and update from the same places, under the same lock, and each
+    # call is O(1) in the size of the board. Counts are grouped by scope,
+    # the project title or None for all projects as in TaskIndex, and then
+    # by status or priority. A user's counts are per distinct assigned task.
+    # completions holds, per project, the times tasks entered the done
+    # status, for throughput histograms.
+    def __init__(self, done_status):
+        self.done_status = done_status
+        self.tasks = {}
+        self.status_counts = {}
+        self.priority_counts = {}
+        self.user_counts = {}
+        self.completions: Dict[str, array] = {}
+
+    @staticmethod
+    def _bump(counts: Dict[Any, Dict[Any, int]], group, key, delta: int):
+        group_counts = counts.get(group)
+        if group_counts is None:
+            group_counts = counts[group] = {}
+        count = group_counts.get(key, 0) + delta
+        if count:
+            group_counts[key] = count
+        else:
+            group_counts.pop(key, None)
+            if not group_counts:
+                del counts[group]
+
+    def add(self, project_title: str, task, completed: Iterable[float] = ()):
+        for scope in (project_title, None):
+            self.tasks[scope] = self.tasks.get(scope, 0) + 1
+            self._bump(self.status_counts, scope, task.status, 1)
+            self._bump(self.priority_counts, scope, task.priority, 1)
+        for user in set(task.assigned_to):
+            self._bump(self.user_counts, user, task.status, 1)
+        if completed:
+            self.completions.setdefault(project_title, array('d')).extend(completed)
+
+    def remove(self, project_title: str, task):
+        for scope in (project_title, None):
+            self.tasks[scope] -= 1
+            if not self.tasks[scope]:
+                del self.tasks[scope]
+            self._bump(self.status_counts, scope, task.status, -1)
+            self._bump(self.priority_counts, scope, task.priority, -1)
+        for user in set(task.assigned_to):
+            self._bump(self.user_counts, user, task.status, -1)
+
+    def drop_project(self, project_title: str):
+        self.completions.pop(project_title, None)
+
+    def update(self, project_title: str, task, field: str, old, new, when: float):
+        if field == 'status':
+            for scope in (project_title, None):
+                self._bump(self.status_counts, scope, old, -1)
+                self._bump(self.status_counts, scope, new, 1)
+            for user in set(task.assigned_to):
+                self._bump(self.user_counts, user, old, -1)
+                self._bump(self.user_counts, user, new, 1)
+            if new == self.done_status:
+                self.completions.setdefault(project_title, array('d')).append(when)
+        elif field == 'priority':
+            for scope in (project_title, None):
+                self._bump(self.priority_counts, scope, old, -1)
+                self._bump(self.priority_counts, scope, new, 1)
+        elif field == 'assigned':
+            if task.assigned_to.count(new) == 1:
+                self._bump(self.user_counts, new, task.status, 1)
+        elif field == 'unassigned':
+            if old not in task.assigned_to:
+                self._bump(self.user_counts, old, task.status, -1)
+
+    def board_counts(self, project_title: Optional[str] = None):
+        # A consistent copy of one scope's counters.
+        return (self.tasks.get(project_title, 0), dict(self.status_counts.get(project_title, {})),
+                dict(self.priority_counts.get(project_title, {})))
+
+    def user_counts_of(self, username: str):
+        return dict(self.user_counts.get(username, {}))
+
+    def completion_times(self, project_title: Optional[str] = None):
+        if project_title is not None:
+            return array('d', self.completions.get(project_title, ()))
+        times = array('d')
+        for completed in self.completions.values():
+            times.extend(completed)
+        return times
+
+
+def throughput_histogram(times, start: float, end: float, bucket_seconds: float) -> List[int]:
+    # Number of completion times in each bucket_seconds-wide bucket of
+    # [start, end), vectorized when NumPy is available.
+    buckets = max(0, math.ceil((end - start) / bucket_seconds))
+    if not buckets:
+        return []
+    if numpy is not None:
+        values = numpy.frombuffer(times, dtype=numpy.float64) if len(times) else numpy.empty(0)
+        values = values[(values >= start) & (values < end)]
+        offsets = ((values - start) // bucket_seconds).astype(numpy.int64)
+        return numpy.bincount(offsets, minlength=buckets)[:buckets].tolist()
+    counts = [0] * buckets
+    for when in times:
+        if start <= when < end:
+            counts[min(buckets - 1, int((when - start) // bucket_seconds))] += 1
+    return counts
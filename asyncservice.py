@@ -0,0 +1,233 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import Executor
+from typing import Any, Dict, Iterable, List, Optional
+
+from auth import Authenticator
+from eventbus import Subscription
+from manager import create_admin, verify_admin
+from projectmanager import ProjectManager, Priority, Status, Role
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncProjectManager:
+    # Every manager call runs in the executor: mutations wait on the state
+    # and project locks, which a save or compaction holds for as long as it
+    # takes to write everything out, and may write to the journal or the
+    # storage. Only session lookups stay on the loop. Journal compaction is
+    # scheduled as its own executor job once a mutation makes it due (the
+    # manager's auto_compact is turned off). Identical concurrent reads
+    # share one computation (callers receive the same result object and
+    # must not modify it). Saves are debounced: every save requested within
+    # save_delay is covered by a single flush in the executor.
+    def __init__(self, manager: Optional[ProjectManager] = None, executor: Optional[Executor] = None,
+                 save_delay: float = 0.05):
+        self.manager = manager if manager is not None else ProjectManager()
+        self.manager.auto_compact = False
+        self.auth = Authenticator(self.manager)
+        self.executor = executor
+        self.save_delay = save_delay
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self._pending_save: Optional[asyncio.Task] = None
+        self._pending_compaction: Optional[asyncio.Task] = None
+
+    async def _offload(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def _coalesced(self, func, *args, **kwargs):
+        key = (func.__name__, args, tuple(sorted(kwargs.items())))
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._offload(func, *args, **kwargs))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    def _mutated(self, result):
+        if self.manager._compact_due and self._pending_compaction is None:
+            self._pending_compaction = asyncio.ensure_future(self._compact())
+        return result
+
+    async def _compact(self):
+        try:
+            await self._offload(self.manager.compact)
+        finally:
+            self._pending_compaction = None
+
+    async def create_user(self, username: str, password: str, email: str):
+        return self._mutated(await self._offload(self.manager.create_user, username, password, email))
+
+    async def login(self, username: str, password: str) -> Optional[str]:
+        return self._mutated(await self._offload(self.auth.login, username, password))
+
+    async def authenticate(self, token: str) -> Optional[str]:
+        return self.auth.authenticate(token)
+
+    async def logout(self, token: str):
+        self.auth.logout(token)
+
+    async def change_password(self, username: str, old_password: str, new_password: str) -> bool:
+        return self._mutated(await self._offload(self.auth.change_password, username, old_password, new_password))
+
+    async def create_admin(self, username: str, password: str, email: str):
+        return await self._offload(create_admin, storage=self.manager.storage, username=username,
+                                   password=password, email=email)
+
+    async def verify_admin(self, username: str, password: str) -> bool:
+        return await self._offload(verify_admin, username, password, storage=self.manager.storage)
+
+    async def create_project(self, title: str, creator: str):
+        return self._mutated(await self._offload(self.manager.create_project, title, creator))
+
+    async def add_member_to_project(self, project_title: str, member: str, actor: Optional[str] = None):
+        return self._mutated(await self._offload(self.manager.add_member_to_project, project_title, member,
+                                                 actor=actor))
+
+    async def remove_member_from_project(self, project_title: str, member: str, actor: Optional[str] = None):
+        return self._mutated(await self._offload(self.manager.remove_member_from_project, project_title, member,
+                                                 actor=actor))
+
+    async def set_member_role(self, project_title: str, member: str, role: Role, actor: Optional[str] = None):
+        return self._mutated(await self._offload(self.manager.set_member_role, project_title, member, role,
+                                                 actor=actor))
+
+    async def projects_of_user(self, username: str) -> Dict[str, str]:
+        return await self._coalesced(self.manager.projects_of_user, username)
+
+    async def delete_project(self, project_title: str, actor: Optional[str] = None):
+        return self._mutated(await self._offload(self.manager.delete_project, project_title, actor=actor))
+
+    async def create_task(self, project_title: str, title: str, description: str, assigned_to: List[str],
+                          priority: Priority = Priority.LOW, status: Status = Status.BACKLOG,
+                          actor: Optional[str] = None):
+        return self._mutated(await self._offload(self.manager.create_task, project_title, title, description,
+                                                 assigned_to, priority, status, actor=actor))
+
+    async def create_tasks_bulk(self, project_title: str, tasks: Iterable[Dict[str, Any]], batch_size: int = 1000,
+                                actor: Optional[str] = None):
+        return self._mutated(await self._offload(self.manager.create_tasks_bulk, project_title, tasks, batch_size,
+                                                 actor=actor))
+
+    async def assign_task_to_member(self, project_title: Optional[str], task_id: str, user: str,
+                                    actor: Optional[str] = None):
+        return self._mutated(await self._offload(self.manager.assign_task_to_member, project_title, task_id, user,
+                                                 actor=actor))
+
+    async def unassign_task_from_member(self, project_title: Optional[str], task_id: str, user: str,
+                                        actor: Optional[str] = None):
+        return self._mutated(await self._offload(self.manager.unassign_task_from_member, project_title, task_id, user,
+                                                 actor=actor))
+
+    async def change_task_priority(self, project_title: Optional[str], task_id: str, new_priority: Priority,
+                                   actor: Optional[str] = None):
+        return self._mutated(await self._offload(self.manager.change_task_priority, project_title, task_id,
+                                                 new_priority, actor=actor))
+
+    async def change_task_status(self, project_title: Optional[str], task_id: str, new_status: Status,
+                                 actor: Optional[str] = None):
+        return self._mutated(await self._offload(self.manager.change_task_status, project_title, task_id, new_status,
+                                                 actor=actor))
+
+    async def add_comment_to_task(self, project_title: Optional[str], task_id: str, comment: str, user: str,
+                                  actor: Optional[str] = None):
+        return self._mutated(await self._offload(self.manager.add_comment_to_task, project_title, task_id, comment,
+                                                 user, actor=actor))
+
+    async def view_tasks_in_project(self, project_title: str, fields: Optional[List[str]] = None, offset: int = 0,
+                                    limit: Optional[int] = None, order_by: str = 'created') -> List[Dict[str, Any]]:
+        return await self._coalesced(self.manager.view_tasks_in_project, project_title,
+                                     tuple(fields) if fields else None, offset, limit, order_by)
+
+    async def view_tasks_page(self, project_title: str, limit: int = 50, cursor: Optional[str] = None,
+                              order_by: str = 'created', fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        return await self._coalesced(self.manager.view_tasks_page, project_title, limit, cursor, order_by,
+                                     tuple(fields) if fields else None)
+
+    async def view_task_details(self, project_title: Optional[str], task_id: str,
+                                fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        return await self._coalesced(self.manager.view_task_details, project_title, task_id,
+                                     tuple(fields) if fields else None)
+
+    async def view_task_history(self, project_title: Optional[str], task_id: str) -> List[Dict[str, Any]]:
+        return await self._coalesced(self.manager.view_task_history, project_title, task_id)
+
+    async def view_board_at(self, project_title: str, when: float) -> Dict[str, List[Dict[str, Any]]]:
+        return await self._coalesced(self.manager.view_board_at, project_title, when)
+
+    async def cycle_times(self, project_title: str, start: Status = Status.TODO,
+                          end: Status = Status.DONE) -> Dict[str, float]:
+        return await self._coalesced(self.manager.cycle_times, project_title, start, end)
+
+    async def board_stats(self, project_title: Optional[str] = None) -> Dict[str, Any]:
+        return await self._coalesced(self.manager.board_stats, project_title)
+
+    async def user_stats(self, username: str) -> Dict[str, Any]:
+        return await self._coalesced(self.manager.user_stats, username)
+
+    async def throughput(self, project_title: Optional[str] = None, bucket_seconds: float = 86400,
+                         start: Optional[float] = None, end: Optional[float] = None) -> Dict[str, Any]:
+        return await self._coalesced(self.manager.throughput, project_title, bucket_seconds, start, end)
+
+    async def search_tasks(self, query: str, project_title: Optional[str] = None, user: Optional[str] = None,
+                           limit: int = 20) -> List[Dict[str, Any]]:
+        return await self._coalesced(self.manager.search_tasks, query, project_title, user, limit)
+
+    async def query_tasks(self, project_title: Optional[str] = None, status: Optional[Status] = None,
+                          priority: Optional[Priority] = None, assignee: Optional[str] = None) -> List[Dict[str, Any]]:
+        return await self._coalesced(self.manager.query_tasks, project_title, status, priority, assignee)
+
+    async def view_user_tasks(self, username: str, status: Optional[Status] = None) -> List[Dict[str, Any]]:
+        return await self._coalesced(self.manager.view_user_tasks, username, status)
+
+    async def view_board(self, project_title: str) -> Dict[str, List[Dict[str, Any]]]:
+        return await self._coalesced(self.manager.view_board, project_title)
+
+    async def view_archived_tasks(self, project_title: str, fields: Optional[List[str]] = None, offset: int = 0,
+                                  limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        return await self._coalesced(self.manager.view_archived_tasks, project_title,
+                                     tuple(fields) if fields else None, offset, limit)
+
+    async def archive_tasks(self, project_title: str, task_ids: List[str], actor: Optional[str] = None) -> int:
+        return self._mutated(await self._offload(self.manager.archive_tasks, project_title, task_ids, actor=actor))
+
+    async def archive_stale_tasks(self, project_title: Optional[str] = None, done_days: float = 30,
+                                  actor: Optional[str] = None) -> int:
+        return self._mutated(await self._offload(self.manager.archive_stale_tasks, project_title, done_days,
+                                                 actor=actor))
+
+    async def unarchive_task(self, project_title: str, task_id: str, actor: Optional[str] = None):
+        return self._mutated(await self._offload(self.manager.unarchive_task, project_title, task_id, actor=actor))
+
+    async def import_board(self, path: str, project_title: Optional[str] = None, creator: Optional[str] = None,
+                           actor: Optional[str] = None):
+        return self._mutated(await self._offload(self.manager.import_board, path, project_title, creator, actor=actor))
+
+    async def export_board(self, path: str, project_title: Optional[str] = None):
+        return await self._offload(self.manager.export_board, path, project_title)
+
+    def subscribe(self, projects: Optional[Iterable[str]] = None, users: Optional[Iterable[str]] = None,
+                  kinds: Optional[Iterable[str]] = None, maxsize: int = 1000, overflow: str = 'drop_oldest',
+                  block_timeout: Optional[float] = 1.0) -> Subscription:
+        # Consume with "async for batch in subscription.batches()". Events
+        # are delivered by the executor threads running the mutations, so a
+        # full 'block' subscription holds up those threads, not the loop.
+        return self.manager.events.subscribe(projects, users, kinds, maxsize, overflow, block_timeout)
+
+    async def load_data(self):
+        return await self._offload(self.manager.load_data)
+
+    async def save_data(self):
+        if self._pending_save is None:
+            self._pending_save = asyncio.ensure_future(self._flush())
+        await asyncio.shield(self._pending_save)
+
+    async def _flush(self):
+        await asyncio.sleep(self.save_delay)
+        # Saves requested from here on need a new flush, since this one may
+        # already have taken its snapshot.
+        self._pending_save = None
+        await self._offload(self.manager.save_data)
+        logger.debug('Flushed debounced save')
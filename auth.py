@@ -0,0 +1,152 @@
+import base64
+import hashlib
+import hmac
+import logging
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# scrypt cost parameters (n must be a power of two); raising them only
+# affects newly hashed passwords, older hashes keep their own parameters.
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+# Used where hashlib was built without scrypt.
+PBKDF2_ITERATIONS = 600_000
+SALT_BYTES = 16
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode('ascii')
+
+
+def hash_password(password: str, n: int = SCRYPT_N, r: int = SCRYPT_R, p: int = SCRYPT_P,
+                  iterations: int = PBKDF2_ITERATIONS) -> str:
+    # Returns a self-describing "scheme$params$salt$hash" string.
+    salt = secrets.token_bytes(SALT_BYTES)
+    if hasattr(hashlib, 'scrypt'):
+        digest = hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + (1 << 20))
+        return f'scrypt${n}${r}${p}${_b64(salt)}${_b64(digest)}'
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+    return f'pbkdf2_sha256${iterations}${_b64(salt)}${_b64(digest)}'
+
+
+def is_password_hash(value: str) -> bool:
+    scheme = value.split('$', 1)[0]
+    return scheme in ('scrypt', 'pbkdf2_sha256') and value.count('$') in (3, 5)
+
+
+def verify_password(password: str, stored: str) -> bool:
+    # Values that are not hashes are plaintext passwords from files written
+    # before hashing was introduced; needs_rehash() reports them.
+    if not is_password_hash(stored):
+        return hmac.compare_digest(password.encode('utf-8'), stored.encode('utf-8'))
+    parts = stored.split('$')
+    try:
+        if parts[0] == 'scrypt':
+            n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+            salt, expected = base64.b64decode(parts[4]), base64.b64decode(parts[5])
+            digest = hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                                    maxmem=256 * n * r + (1 << 20), dklen=len(expected))
+        else:
+            iterations = int(parts[1])
+            salt, expected = base64.b64decode(parts[2]), base64.b64decode(parts[3])
+            digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations, len(expected))
+    except (ValueError, TypeError) as e:
+        logger.error('Malformed password hash: %s', e)
+        return False
+    return hmac.compare_digest(digest, expected)
+
+
+def needs_rehash(stored: str) -> bool:
+    if not is_password_hash(stored):
+        return True
+    parts = stored.split('$')
+    if hasattr(hashlib, 'scrypt'):
+        return parts[0] != 'scrypt' or (int(parts[1]), int(parts[2]), int(parts[3])) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return int(parts[1]) != PBKDF2_ITERATIONS
+
+
+class SessionCache:
+    # Tokens map to (username, expiry). Every session gets the same ttl, so
+    # insertion order is expiry order and expired sessions are evicted from
+    # the front of the OrderedDict; each call does O(1) amortized work.
+    # max_sessions bounds memory by dropping the oldest sessions first.
+    def __init__(self, ttl: float = 3600, max_sessions: int = 100_000, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.clock = clock
+        self._sessions: 'OrderedDict[str, Tuple[str, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _evict(self, now: float):
+        # Callers hold _lock.
+        sessions = self._sessions
+        while sessions:
+            token, (_, expires) = next(iter(sessions.items()))
+            if expires > now and len(sessions) <= self.max_sessions:
+                break
+            del sessions[token]
+
+    def create(self, username: str) -> str:
+        token = secrets.token_urlsafe(32)
+        with self._lock:
+            now = self.clock()
+            self._sessions[token] = (username, now + self.ttl)
+            self._evict(now)
+        return token
+
+    def get(self, token: str) -> Optional[str]:
+        with self._lock:
+            self._evict(self.clock())
+            session = self._sessions.get(token)
+        return session[0] if session is not None else None
+
+    def revoke(self, token: str):
+        with self._lock:
+            self._sessions.pop(token, None)
+
+    def revoke_user(self, username: str):
+        with self._lock:
+            for token in [token for token, (user, _) in self._sessions.items() if user == username]:
+                del self._sessions[token]
+
+
+class Authenticator:
+    # Passwords are checked once per login; requests then present the
+    # session token, which costs a dictionary lookup instead of a hash.
+    def __init__(self, manager, ttl: float = 3600, max_sessions: int = 100_000):
+        self.manager = manager
+        self.sessions = SessionCache(ttl, max_sessions)
+
+    def login(self, username: str, password: str) -> Optional[str]:
+        user = self.manager.users.get(username)
+        if user is None or not verify_password(password, user.password):
+            logger.info('Failed login for user: %s', username)
+            return None
+        if needs_rehash(user.password):
+            self.manager.set_password_hash(username, hash_password(password))
+        logger.info('User logged in: %s', username)
+        return self.sessions.create(username)
+
+    def authenticate(self, token: str) -> Optional[str]:
+        return self.sessions.get(token)
+
+    def logout(self, token: str):
+        self.sessions.revoke(token)
+
+    def change_password(self, username: str, old_password: str, new_password: str) -> bool:
+        user = self.manager.users.get(username)
+        if user is None or not verify_password(old_password, user.password):
+            return False
+        self.manager.set_password_hash(username, hash_password(new_password))
+        self.sessions.revoke_user(username)
+        logger.info('Changed password of user: %s', username)
+        return True
@@ -0,0 +1,418 @@
+import argparse
+import asyncio
+import functools
+import gc
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from projectmanager import ProjectManager, Priority, Status
+from storage import JSONStorage, BinaryStorage
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def generate_board(manager: ProjectManager, users: int, projects: int, tasks: int, comments: int,
+                   seed: int = 0):
+    # tasks and comments are per project and per task respectively.
+    rng = random.Random(seed)
+    usernames = [f'user{u}' for u in range(users)]
+    for username in usernames:
+        manager.create_user(username, 'password', f'{username}@example.com')
+    priorities = list(Priority)
+    statuses = list(Status)
+    task_ids = []
+    for p in range(projects):
+        title = f'project-{p}'
+        manager.create_project(title, usernames[p % users])
+        for username in usernames:
+            manager.add_member_to_project(title, username)
+        manager.create_tasks_bulk(title, ({
+            'title': f'Task {p}-{t}',
+            'description': f'Synthetic task {t} of project {p}',
+            'assigned_to': rng.sample(usernames, min(users, 2)),
+            'priority': rng.choice(priorities),
+            'status': rng.choice(statuses),
+            'comments': [{'user': rng.choice(usernames), 'comment': f'Comment {c}'} for c in range(comments)],
+        } for t in range(tasks)))
+        task_ids.extend((title, task.id) for task in manager.projects[title].tasks)
+    return usernames, task_ids
+
+
+def _percentile(sorted_values, fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def _measure(name: str, calls):
+    latencies = []
+    started = time.perf_counter()
+    for call in calls:
+        begin = time.perf_counter_ns()
+        call()
+        latencies.append(time.perf_counter_ns() - begin)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return name, {
+        'calls': len(latencies),
+        'p50_us': round(_percentile(latencies, 0.50) / 1000, 2),
+        'p90_us': round(_percentile(latencies, 0.90) / 1000, 2),
+        'p99_us': round(_percentile(latencies, 0.99) / 1000, 2),
+        'max_us': round(latencies[-1] / 1000, 2),
+        'ops_per_second': round(len(latencies) / elapsed, 1) if elapsed else None,
+    }
+
+
+def _peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def bench_operations(users: int = 50, projects: int = 10, tasks: int = 1000, comments: int = 2,
+                     operations: int = 2000, saves: int = 3, seed: int = 0):
+    logging.disable(logging.CRITICAL)
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as data_dir:
+        manager = ProjectManager(storage=JSONStorage(*(os.path.join(data_dir, name) for name in (
+            'users.json', 'projects.json', 'admin_data.json', 'search_index.json', 'archive.json'))))
+        started = time.perf_counter()
+        usernames, task_ids = generate_board(manager, users, projects, tasks, comments, seed)
+        generate_seconds = time.perf_counter() - started
+        picks = [rng.choice(task_ids) for _ in range(operations)]
+        people = [rng.choice(usernames) for _ in range(operations)]
+        priorities = [rng.choice(list(Priority)) for _ in range(operations)]
+        statuses = [rng.choice(list(Status)) for _ in range(operations)]
+        titles = [f'project-{p}' for p in range(projects)]
+        results = dict([
+            _measure('create_task', (lambda i=i: manager.create_task(
+                titles[i % projects], f'Extra {i}', 'description', [people[i]]) for i in range(operations))),
+            _measure('assign_task_to_member', (lambda i=i: manager.assign_task_to_member(
+                picks[i][0], picks[i][1], people[i]) for i in range(operations))),
+            _measure('unassign_task_from_member', (lambda i=i: manager.unassign_task_from_member(
+                picks[i][0], picks[i][1], people[i]) for i in range(operations))),
+            _measure('change_task_priority', (lambda i=i: manager.change_task_priority(
+                picks[i][0], picks[i][1], priorities[i]) for i in range(operations))),
+            _measure('change_task_status', (lambda i=i: manager.change_task_status(
+                picks[i][0], picks[i][1], statuses[i]) for i in range(operations))),
+            _measure('add_comment_to_task', (lambda i=i: manager.add_comment_to_task(
+                picks[i][0], picks[i][1], 'benchmark comment', people[i]) for i in range(operations))),
+            _measure('view_task_details', (lambda i=i: manager.view_task_details(
+                picks[i][0], picks[i][1]) for i in range(operations))),
+            _measure('view_tasks_in_project', (lambda p=p: manager.view_tasks_in_project(
+                titles[p % projects]) for p in range(max(1, operations // 100)))),
+            _measure('save_data', (manager.save_data for _ in range(saves))),
+        ])
+    logging.disable(logging.NOTSET)
+    return {
+        'benchmark': 'operations',
+        'scale': {'users': users, 'projects': projects, 'tasks': tasks, 'comments': comments,
+                  'operations': operations, 'seed': seed},
+        'generate_seconds': round(generate_seconds, 3),
+        'peak_rss_bytes': _peak_rss_bytes(),
+        'operations': results,
+    }
+
+
+def compare_to_baseline(result, baseline, tolerance: float = 0.25):
+    # Flags operations whose median latency grew, or throughput fell, by
+    # more than the tolerated fraction.
+    regressions = []
+    for name, current in result['operations'].items():
+        previous = baseline.get('operations', {}).get(name)
+        if previous is None:
+            continue
+        if previous['p50_us'] and current['p50_us'] > previous['p50_us'] * (1 + tolerance):
+            regressions.append(f"{name}: p50 {previous['p50_us']}us -> {current['p50_us']}us")
+        if previous['ops_per_second'] and current['ops_per_second'] < previous['ops_per_second'] * (1 - tolerance):
+            regressions.append(f"{name}: {previous['ops_per_second']} -> {current['ops_per_second']} ops/s")
+    return regressions
+
+
+def bench_memory(tasks: int = 1_000_000, projects: int = 10):
+    logging.disable(logging.CRITICAL)
+    gc.collect()
+    tracemalloc.start()
+    manager = ProjectManager()
+    manager.create_user('user0', 'password', 'user0@example.com')
+    for p in range(projects):
+        manager.create_project(f'project-{p}', 'user0')
+    baseline = tracemalloc.get_traced_memory()[0]
+    priorities = list(Priority)
+    statuses = list(Status)
+    for i in range(tasks):
+        manager.create_task(f'project-{i % projects}', f'Task {i}', 'description', ['user0'],
+                            priorities[i % len(priorities)], statuses[i % len(statuses)])
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    logging.disable(logging.NOTSET)
+    return {
+        'benchmark': 'memory',
+        'tasks': tasks,
+        'bytes_per_task': round((current - baseline) / tasks, 1),
+        'peak_bytes': peak,
+    }
+
+
+async def _async_client(service, task_ids, requests: int, rng: random.Random):
+    statuses = list(Status)
+    for _ in range(requests):
+        if rng.random() < 0.8:
+            await service.view_tasks_in_project('project-0')
+        else:
+            await service.change_task_status('project-0', rng.choice(task_ids), rng.choice(statuses))
+
+
+async def _async_run(clients: int, requests: int, tasks: int):
+    from asyncservice import AsyncProjectManager
+
+    service = AsyncProjectManager()
+    await service.create_user('user0', 'password', 'user0@example.com')
+    await service.create_project('project-0', 'user0')
+    service.manager.create_tasks_bulk('project-0', ({'title': f'Task {i}'} for i in range(tasks)))
+    task_ids = [task.id for task in service.manager.projects['project-0'].tasks]
+    started = time.perf_counter()
+    await asyncio.gather(*(_async_client(service, task_ids, requests, random.Random(c)) for c in range(clients)))
+    return time.perf_counter() - started
+
+
+def bench_async(clients=(1, 100, 1000), total_requests: int = 20000, tasks: int = 1000):
+    logging.disable(logging.CRITICAL)
+    results = []
+    for count in clients:
+        per_client = max(1, total_requests // count)
+        elapsed = asyncio.run(_async_run(count, per_client, tasks))
+        results.append({
+            'clients': count,
+            'requests': per_client * count,
+            'requests_per_second': round(per_client * count / elapsed, 1),
+        })
+    logging.disable(logging.NOTSET)
+    return {'benchmark': 'async', 'tasks': tasks, 'results': results}
+
+
+def bench_auth(users: int = 20, requests: int = 100_000, seed: int = 0):
+    # A login pays for one password hash; every later request only looks
+    # its session token up in the cache.
+    from auth import Authenticator
+
+    logging.disable(logging.CRITICAL)
+    rng = random.Random(seed)
+    manager = ProjectManager()
+    for u in range(users):
+        manager.create_user(f'user{u}', f'password{u}', f'user{u}@example.com')
+    authenticator = Authenticator(manager)
+    picks = [rng.randrange(users) for _ in range(requests)]
+    tokens = {}
+
+    def login(u: int):
+        tokens[u] = authenticator.login(f'user{u}', f'password{u}')
+
+    results = dict([
+        _measure('login', (lambda u=u: login(u) for u in range(users))),
+        _measure('authenticate', (lambda u=u: authenticator.authenticate(tokens[u]) for u in picks)),
+    ])
+    logging.disable(logging.NOTSET)
+    return {
+        'benchmark': 'auth',
+        'users': users,
+        'operations': results,
+        'login_to_session_ratio': round(results['login']['p50_us'] / max(results['authenticate']['p50_us'], 0.01)),
+    }
+
+
+def bench_snapshot(tasks: int = 100_000, projects: int = 10, seed: int = 0):
+    # Size, save and load time of the JSON files against binary snapshots,
+    # and how fast a read-only SnapshotReader opens and finds a task.
+    from snapshot import COMPRESSIONS, SnapshotReader
+
+    logging.disable(logging.CRITICAL)
+    manager = ProjectManager()
+    _, task_ids = generate_board(manager, 20, projects, tasks // projects, 1, seed)
+    picks = random.Random(seed).sample(task_ids, min(1000, len(task_ids)))
+    results = {}
+    with tempfile.TemporaryDirectory() as data_dir:
+        storages = {'json': JSONStorage(*(os.path.join(data_dir, name) for name in (
+            'users.json', 'projects.json', 'admin.json', 'search.json', 'archive.json')))}
+        for compression in COMPRESSIONS:
+            storages[compression] = BinaryStorage(os.path.join(data_dir, f'{compression}.snap'), compression)
+        for name, storage in storages.items():
+            manager.storage = storage
+            started = time.perf_counter()
+            manager.save_data()
+            save_seconds = time.perf_counter() - started
+            paths = [storage.path] if name != 'json' else [storage.users_path, storage.projects_path,
+                                                           storage.search_path, storage.archive_path]
+            loaded = ProjectManager(storage=storage)
+            started = time.perf_counter()
+            loaded.load_data()
+            load_seconds = time.perf_counter() - started
+            loaded._load_all_tasks()
+            results[name] = {
+                'bytes': sum(os.path.getsize(path) for path in paths),
+                'save_seconds': round(save_seconds, 3),
+                'load_seconds': round(load_seconds, 3),
+                'load_all_tasks_seconds': round(time.perf_counter() - started, 3),
+            }
+            if name != 'json':
+                started = time.perf_counter()
+                with SnapshotReader(storage.path) as reader:
+                    results[name]['reader_open_seconds'] = round(time.perf_counter() - started, 4)
+                    results[name].update(dict([_measure('reader_task', (
+                        lambda task_id=task_id: reader.task(task_id) for _, task_id in picks))]))
+            del loaded
+            gc.collect()
+    logging.disable(logging.NOTSET)
+    return {'benchmark': 'snapshot', 'tasks': len(task_ids), 'results': results}
+
+
+def _shard_client(router, titles, task_ids, requests: int, rng: random.Random):
+    statuses = list(Status)
+    for _ in range(requests):
+        title = rng.choice(titles)
+        if rng.random() < 0.8:
+            router.view_tasks_page(title, 50, None, 'priority')
+        else:
+            router.change_task_status(title, rng.choice(task_ids[title]), rng.choice(statuses))
+
+
+def bench_shards(shards=(1, 2, 4), projects: int = 64, tasks: int = 500, requests: int = 20000, seed: int = 0):
+    # Requests per second of project-scoped calls from two client threads
+    # per shard, and latency of the cross-shard queries, per shard count.
+    # Shards only run in parallel with at least as many free cores.
+    from sharding import ShardedProjectManager, shard_storage
+
+    logging.disable(logging.CRITICAL)
+    titles = [f'project-{p}' for p in range(projects)]
+    results = []
+    for count in shards:
+        with tempfile.TemporaryDirectory() as data_dir, \
+                ShardedProjectManager(count, functools.partial(shard_storage, directory=data_dir)) as router:
+            rng = random.Random(seed)
+            usernames = [f'user{u}' for u in range(20)]
+            for username in usernames:
+                router.create_user(username, 'password', f'{username}@example.com')
+            task_ids = {}
+            for p, title in enumerate(titles):
+                router.create_project(title, usernames[p % len(usernames)])
+                for username in usernames:
+                    router.add_member_to_project(title, username)
+                router.create_tasks_bulk(title, ({
+                    'title': f'Task {p}-{t}',
+                    'description': f'Synthetic task {t} of project {p}',
+                    'assigned_to': rng.sample(usernames, 2),
+                    'priority': rng.choice(list(Priority)),
+                    'status': rng.choice(list(Status)),
+                } for t in range(tasks)))
+                task_ids[title] = [row['Task ID'] for row in router.view_tasks_in_project(title, ['Task ID'])]
+            clients = 2 * count
+            threads = [threading.Thread(target=_shard_client, args=(
+                router, titles, task_ids, requests // clients, random.Random(seed + c))) for c in range(clients)]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+            results.append({
+                'shards': count,
+                'clients': clients,
+                'requests_per_second': round(requests // clients * clients / elapsed, 1),
+                'fan_out': dict([
+                    _measure('board_stats', (router.board_stats for _ in range(20))),
+                    _measure('view_user_tasks', (lambda: router.view_user_tasks('user0') for _ in range(20))),
+                    _measure('search_tasks', (lambda: router.search_tasks('synthetic task', limit=20)
+                                              for _ in range(20))),
+                    _measure('save_data', (router.save_data for _ in range(3))),
+                ]),
+            })
+    logging.disable(logging.NOTSET)
+    for result in results:
+        result['speedup'] = round(result['requests_per_second'] / results[0]['requests_per_second'], 2)
+    return {'benchmark': 'shards', 'cpus': os.cpu_count(), 'projects': projects, 'tasks': projects * tasks,
+            'results': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Trellomize benchmarks')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    memory_parser = subparsers.add_parser('memory', help='bytes per task')
+    memory_parser.add_argument('--tasks', type=int, default=1_000_000)
+    memory_parser.add_argument('--projects', type=int, default=10)
+    memory_parser.add_argument('--max-bytes-per-task', type=float, default=None,
+                               help='exit with status 1 if the measured bytes per task exceed this value')
+
+    ops_parser = subparsers.add_parser('ops', help='latency and throughput of every ProjectManager operation')
+    ops_parser.add_argument('--users', type=int, default=50)
+    ops_parser.add_argument('--projects', type=int, default=10)
+    ops_parser.add_argument('--tasks', type=int, default=1000, help='tasks per project')
+    ops_parser.add_argument('--comments', type=int, default=2, help='comments per task')
+    ops_parser.add_argument('--operations', type=int, default=2000, help='calls per measured operation')
+    ops_parser.add_argument('--saves', type=int, default=3)
+    ops_parser.add_argument('--seed', type=int, default=0)
+    ops_parser.add_argument('--output', help='write the JSON result to this file')
+    ops_parser.add_argument('--baseline', help='compare against a previously written result')
+    ops_parser.add_argument('--tolerance', type=float, default=0.25)
+
+    async_parser = subparsers.add_parser('async', help='AsyncProjectManager requests per second')
+    async_parser.add_argument('--clients', type=int, nargs='+', default=[1, 100, 1000])
+    async_parser.add_argument('--requests', type=int, default=20000, help='total requests per run')
+    async_parser.add_argument('--tasks', type=int, default=1000)
+
+    auth_parser = subparsers.add_parser('auth', help='login versus cached session verification')
+    auth_parser.add_argument('--users', type=int, default=20, help='logins, one per user')
+    auth_parser.add_argument('--requests', type=int, default=100_000, help='session verifications')
+
+    snapshot_parser = subparsers.add_parser('snapshot', help='JSON files versus binary snapshots')
+    snapshot_parser.add_argument('--tasks', type=int, default=100_000)
+    snapshot_parser.add_argument('--projects', type=int, default=10)
+
+    shards_parser = subparsers.add_parser('shards', help='ShardedProjectManager scaling across processes')
+    shards_parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4])
+    shards_parser.add_argument('--projects', type=int, default=64)
+    shards_parser.add_argument('--tasks', type=int, default=500, help='tasks per project')
+    shards_parser.add_argument('--requests', type=int, default=20000, help='total requests per run')
+    args = parser.parse_args()
+
+    if args.benchmark == 'memory':
+        result = bench_memory(args.tasks, args.projects)
+        print(json.dumps(result, indent=4))
+        if args.max_bytes_per_task is not None and result['bytes_per_task'] > args.max_bytes_per_task:
+            sys.exit(1)
+    elif args.benchmark == 'ops':
+        result = bench_operations(args.users, args.projects, args.tasks, args.comments, args.operations,
+                                  args.saves, args.seed)
+        print(json.dumps(result, indent=4))
+        if args.output:
+            with open(args.output, 'w') as output_file:
+                json.dump(result, output_file, indent=4)
+        if args.baseline:
+            with open(args.baseline) as baseline_file:
+                regressions = compare_to_baseline(result, json.load(baseline_file), args.tolerance)
+            for regression in regressions:
+                print(f'Regression: {regression}', file=sys.stderr)
+            if regressions:
+                sys.exit(1)
+    elif args.benchmark == 'async':
+        print(json.dumps(bench_async(args.clients, args.requests, args.tasks), indent=4))
+    elif args.benchmark == 'auth':
+        print(json.dumps(bench_auth(args.users, args.requests), indent=4))
+    elif args.benchmark == 'snapshot':
+        print(json.dumps(bench_snapshot(args.tasks, args.projects), indent=4))
+    elif args.benchmark == 'shards':
+        print(json.dumps(bench_shards(args.shards, args.projects, args.tasks, args.requests), indent=4))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import csv
+import json
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+CSV_FIELDS = ['project', 'id', 'title', 'description', 'assigned_to', 'priority', 'status']
+
+
+def board_format(path: str, fmt: Optional[str] = None) -> str:
+    if fmt is None:
+        fmt = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+    if fmt not in ('jsonl', 'csv'):
+        raise ValueError(f'Unsupported board format: {fmt}')
+    return fmt
+
+
+def read_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, 'r', encoding='utf-8') as board_file:
+        for line in board_file:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def read_csv(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, 'r', encoding='utf-8', newline='') as board_file:
+        for row in csv.DictReader(board_file):
+            row['assigned_to'] = [user for user in (row.get('assigned_to') or '').split(';') if user]
+            if not row.get('id'):
+                row.pop('id', None)
+            yield row
+
+
+def write_jsonl(path: str, records: Iterable[Dict[str, Any]]) -> int:
+    count = 0
+    with open(path, 'w', encoding='utf-8') as board_file:
+        for record in records:
+            board_file.write(json.dumps(record, separators=(',', ':')))
+            board_file.write('\n')
+            count += 1
+    return count
+
+
+def write_csv(path: str, records: Iterable[Dict[str, Any]]) -> int:
+    # CSV has no room for comment threads; use JSONL for a lossless export.
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as board_file:
+        writer = csv.DictWriter(board_file, fieldnames=CSV_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for record in records:
+            writer.writerow(dict(record, assigned_to=';'.join(record['assigned_to'])))
+            count += 1
+    return count
+
+
+def read_board(path: str, fmt: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    return read_csv(path) if board_format(path, fmt) == 'csv' else read_jsonl(path)
+
+
+def write_board(path: str, records: Iterable[Dict[str, Any]], fmt: Optional[str] = None) -> int:
+    return write_csv(path, records) if board_format(path, fmt) == 'csv' else write_jsonl(path, records)
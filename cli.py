@@ -0,0 +1,486 @@
+import argparse
+import json
+import os
+import shlex
+import sys
+from typing import List, Optional
+
+# Kept as names so building the parser needs no project imports; --help
+# and argument errors never load the board.
+PRIORITIES = ('CRITICAL', 'HIGH', 'MEDIUM', 'LOW')
+STATUSES = ('BACKLOG', 'TODO', 'DOING', 'DONE', 'ARCHIVED')
+ROLES = ('ADMIN', 'MEMBER')
+STORAGES = ('json', 'binary', 'sqlite')
+
+
+class CommandError(Exception):
+    pass
+
+
+def _make_storage(kind: str, directory: str):
+    from storage import JSONStorage, BinaryStorage, SQLiteStorage
+
+    if kind == 'binary':
+        return BinaryStorage(os.path.join(directory, 'trellomize.snap'),
+                             admin_path=os.path.join(directory, 'admin_data.json'))
+    if kind == 'sqlite':
+        return SQLiteStorage(os.path.join(directory, 'trellomize.db'))
+    return JSONStorage(*(os.path.join(directory, name) for name in (
+        'users.json', 'projects.json', 'admin_data.json', 'search_index.json', 'archive.json')))
+
+
+class Session:
+    # One storage for the whole run. The board is loaded the first time a
+    # command needs it and saved once at the end if any command changed it.
+    def __init__(self, storage_kind: str = 'json', directory: str = '.'):
+        self.storage = _make_storage(storage_kind, directory)
+        self._manager = None
+        self.changed = False
+
+    @property
+    def manager(self):
+        if self._manager is None:
+            from projectmanager import ProjectManager
+
+            self._manager = ProjectManager(storage=self.storage)
+            self._manager.load_data()
+        return self._manager
+
+    def close(self):
+        if self.changed:
+            self.manager.save_data()
+        self.storage.close()
+
+
+def _enum(name: str, value: Optional[str]):
+    if value is None:
+        return None
+    import projectmanager
+
+    return getattr(projectmanager, name)[value]
+
+
+# The manager logs failed mutations instead of raising, so handlers check
+# their target exists and that the change took effect.
+def _project(session: Session, title: str):
+    project = session.manager.projects.get(title)
+    if project is None:
+        raise CommandError(f'project {title} does not exist')
+    return project
+
+
+def _find_task(session: Session, project_title: Optional[str], task_id: str):
+    task = session.manager.find_task(task_id, project_title)
+    if task is None:
+        raise CommandError(f'task {task_id} not found' + (f' in {project_title}' if project_title else ''))
+    return task
+
+
+def _user(session: Session, username: str):
+    user = session.manager.users.get(username)
+    if user is None:
+        raise CommandError(f'user {username} does not exist')
+    return user
+
+
+def _create_user(session: Session, args):
+    if args.username in session.manager.users:
+        raise CommandError(f'user {args.username} already exists')
+    session.manager.create_user(args.username, args.password, args.email)
+    if args.username not in session.manager.users:
+        raise CommandError(f'could not create user {args.username}')
+
+
+def _create_admin(session: Session, args):
+    import manager as ma
+
+    ma.create_admin(storage=session.storage, username=args.username, password=args.password, email=args.email)
+
+
+def _create_project(session: Session, args):
+    _user(session, args.creator)
+    if args.title in session.manager.projects:
+        raise CommandError(f'project {args.title} already exists')
+    session.manager.create_project(args.title, args.creator)
+    _project(session, args.title)
+
+
+def _add_member(session: Session, args):
+    project = _project(session, args.project)
+    _user(session, args.member)
+    session.manager.add_member_to_project(args.project, args.member, actor=args.actor)
+    if args.member not in project.members:
+        raise CommandError(f'could not add {args.member} to {args.project}')
+
+
+def _remove_member(session: Session, args):
+    project = _project(session, args.project)
+    if args.member not in project.members:
+        raise CommandError(f'{args.member} is not a member of {args.project}')
+    session.manager.remove_member_from_project(args.project, args.member, actor=args.actor)
+    if args.member in project.members:
+        raise CommandError(f'could not remove {args.member} from {args.project}')
+
+
+def _set_role(session: Session, args):
+    project = _project(session, args.project)
+    if args.member not in project.members:
+        raise CommandError(f'{args.member} is not a member of {args.project}')
+    role = _enum('Role', args.role)
+    session.manager.set_member_role(args.project, args.member, role, actor=args.actor)
+    if project.members.get(args.member) is not role:
+        raise CommandError(f'could not make {args.member} {args.role} in {args.project}')
+
+
+def _delete_project(session: Session, args):
+    _project(session, args.project)
+    session.manager.delete_project(args.project, actor=args.actor)
+    if args.project in session.manager.projects:
+        raise CommandError(f'could not delete project {args.project}')
+
+
+def _create_task(session: Session, args):
+    task = session.manager.create_task(args.project, args.title, args.description, args.assign,
+                                       _enum('Priority', args.priority), _enum('Status', args.status),
+                                       actor=args.actor)
+    if task is None:
+        raise CommandError(f'could not create task {args.title} in {args.project}')
+    return {"Task ID": task.id}
+
+
+def _assign(session: Session, args):
+    task = _find_task(session, args.project, args.task_id)
+    session.manager.assign_task_to_member(args.project, args.task_id, args.user, actor=args.actor)
+    if args.user not in task.assigned_to:
+        raise CommandError(f'could not assign task {args.task_id} to {args.user}')
+
+
+def _unassign(session: Session, args):
+    task = _find_task(session, args.project, args.task_id)
+    if args.user not in task.assigned_to:
+        raise CommandError(f'task {args.task_id} is not assigned to {args.user}')
+    session.manager.unassign_task_from_member(args.project, args.task_id, args.user, actor=args.actor)
+    if args.user in task.assigned_to:
+        raise CommandError(f'could not unassign task {args.task_id} from {args.user}')
+
+
+def _priority(session: Session, args):
+    task = _find_task(session, args.project, args.task_id)
+    priority = _enum('Priority', args.priority)
+    session.manager.change_task_priority(args.project, args.task_id, priority, actor=args.actor)
+    if task.priority is not priority:
+        raise CommandError(f'could not change the priority of task {args.task_id}')
+
+
+def _status(session: Session, args):
+    task = _find_task(session, args.project, args.task_id)
+    status = _enum('Status', args.status)
+    session.manager.change_task_status(args.project, args.task_id, status, actor=args.actor)
+    if task.status is not status:
+        raise CommandError(f'could not change the status of task {args.task_id}')
+
+
+def _comment(session: Session, args):
+    task = _find_task(session, args.project, args.task_id)
+    comments = len(task.comments)
+    session.manager.add_comment_to_task(args.project, args.task_id, args.comment, args.user, actor=args.actor)
+    if len(task.comments) == comments:
+        raise CommandError(f'could not comment on task {args.task_id}')
+
+
+def _archive(session: Session, args):
+    _project(session, args.project)
+    if args.task_ids:
+        archived = session.manager.archive_tasks(args.project, args.task_ids, actor=args.actor)
+        if not archived:
+            raise CommandError(f'no tasks archived in {args.project}')
+        return {"archived": archived}
+    return {"archived": session.manager.archive_stale_tasks(args.project, args.done_days, actor=args.actor)}
+
+
+def _unarchive(session: Session, args):
+    if session.manager.unarchive_task(args.project, args.task_id, actor=args.actor) is None:
+        raise CommandError(f'task {args.task_id} is not archived in {args.project}')
+
+
+def _tasks(session: Session, args):
+    if args.archived:
+        return session.manager.view_archived_tasks(args.project, args.fields, args.offset, args.limit)
+    return session.manager.view_tasks_in_project(args.project, args.fields, args.offset, args.limit, args.order_by)
+
+
+def _task(session: Session, args):
+    details = session.manager.view_task_details(args.project, args.task_id)
+    if not details:
+        raise CommandError(f'task {args.task_id} not found')
+    return details
+
+
+def _history(session: Session, args):
+    return session.manager.view_task_history(args.project, args.task_id)
+
+
+def _board(session: Session, args):
+    return session.manager.view_board(args.project)
+
+
+def _query(session: Session, args):
+    return session.manager.query_tasks(args.project, _enum('Status', args.status), _enum('Priority', args.priority),
+                                       args.assignee)
+
+
+def _search(session: Session, args):
+    return session.manager.search_tasks(args.query, args.project, args.user, args.limit)
+
+
+def _stats(session: Session, args):
+    if args.user is not None:
+        return session.manager.user_stats(args.user)
+    return session.manager.board_stats(args.project)
+
+
+def _projects(session: Session, args):
+    return session.manager.projects_of_user(args.username)
+
+
+def _export(session: Session, args):
+    return {"exported": session.manager.export_board(args.path, args.project, args.format)}
+
+
+def _import(session: Session, args):
+    return {"imported": session.manager.import_board(args.path, args.project, args.creator, args.format,
+                                                     actor=args.actor)}
+
+
+def _delete_all(session: Session, args):
+    if not args.yes:
+        raise CommandError('delete-all drops every user, project and task; pass --yes to confirm')
+    session.manager.delete_all()
+
+
+def _save(session: Session, args):
+    session.manager.save_data()
+
+
+def _admin_gui(session: Session, args):
+    import main
+
+    main.main()
+
+
+def _add_commands(subparsers, batch: bool = False):
+    # Each command sets handler and whether it changes the board (mutates).
+    def command(name: str, handler, help_text: str, mutates: bool = False) -> argparse.ArgumentParser:
+        parser = subparsers.add_parser(name, help=help_text, description=help_text)
+        parser.set_defaults(handler=handler, mutates=mutates)
+        return parser
+
+    def task_command(name: str, handler, help_text: str, mutates: bool = True) -> argparse.ArgumentParser:
+        parser = command(name, handler, help_text, mutates)
+        parser.add_argument('task_id')
+        parser.add_argument('--project', help="the task's project; found from the task ID when omitted")
+        return parser
+
+    parser = command('create-user', _create_user, 'create a user', True)
+    parser.add_argument('username')
+    parser.add_argument('password')
+    parser.add_argument('email')
+
+    parser = command('create-admin', _create_admin, 'create an admin; missing values are prompted for')
+    parser.add_argument('username', nargs='?')
+    parser.add_argument('password', nargs='?')
+    parser.add_argument('email', nargs='?')
+
+    parser = command('create-project', _create_project, 'create a project', True)
+    parser.add_argument('title')
+    parser.add_argument('creator')
+
+    for name, handler, help_text in (('add-member', _add_member, 'add a member to a project'),
+                                     ('remove-member', _remove_member, 'remove a member from a project')):
+        parser = command(name, handler, help_text, True)
+        parser.add_argument('project')
+        parser.add_argument('member')
+        parser.add_argument('--actor')
+
+    parser = command('set-role', _set_role, "change a member's role in a project", True)
+    parser.add_argument('project')
+    parser.add_argument('member')
+    parser.add_argument('role', type=str.upper, choices=ROLES)
+    parser.add_argument('--actor')
+
+    parser = command('delete-project', _delete_project, 'delete a project and its tasks', True)
+    parser.add_argument('project')
+    parser.add_argument('--actor')
+
+    parser = command('create-task', _create_task, 'create a task and print its ID', True)
+    parser.add_argument('project')
+    parser.add_argument('title')
+    parser.add_argument('--description', default='')
+    parser.add_argument('--assign', nargs='+', default=[], metavar='USER')
+    parser.add_argument('--priority', type=str.upper, choices=PRIORITIES, default='LOW')
+    parser.add_argument('--status', type=str.upper, choices=STATUSES, default='BACKLOG')
+    parser.add_argument('--actor')
+
+    for name, handler, help_text in (('assign', _assign, 'assign a task to a member'),
+                                     ('unassign', _unassign, 'unassign a task from a member')):
+        parser = task_command(name, handler, help_text)
+        parser.add_argument('user')
+        parser.add_argument('--actor')
+
+    parser = task_command('priority', _priority, "change a task's priority")
+    parser.add_argument('priority', type=str.upper, choices=PRIORITIES)
+    parser.add_argument('--actor')
+
+    parser = task_command('status', _status, "change a task's status")
+    parser.add_argument('status', type=str.upper, choices=STATUSES)
+    parser.add_argument('--actor')
+
+    parser = task_command('comment', _comment, 'comment on a task')
+    parser.add_argument('user')
+    parser.add_argument('comment')
+    parser.add_argument('--actor')
+
+    parser = command('archive', _archive, 'archive the given tasks, or the stale tasks of a project', True)
+    parser.add_argument('project')
+    parser.add_argument('task_ids', nargs='*')
+    parser.add_argument('--done-days', type=float, default=30,
+                        help='without task IDs, archive DONE tasks older than this')
+    parser.add_argument('--actor')
+
+    parser = command('unarchive', _unarchive, 'bring an archived task back', True)
+    parser.add_argument('project')
+    parser.add_argument('task_id')
+    parser.add_argument('--actor')
+
+    parser = command('tasks', _tasks, 'list the tasks of a project')
+    parser.add_argument('project')
+    parser.add_argument('--fields', nargs='+')
+    parser.add_argument('--offset', type=int, default=0)
+    parser.add_argument('--limit', type=int)
+    parser.add_argument('--order-by', default='created', choices=('created', 'priority', 'status'))
+    parser.add_argument('--archived', action='store_true', help='list archived tasks instead')
+
+    task_command('task', _task, 'show the details of a task', False)
+    task_command('history', _history, 'show the change history of a task', False)
+
+    parser = command('board', _board, "show a project's tasks by status")
+    parser.add_argument('project')
+
+    parser = command('query', _query, 'list tasks matching every given filter')
+    parser.add_argument('--project')
+    parser.add_argument('--status', type=str.upper, choices=STATUSES)
+    parser.add_argument('--priority', type=str.upper, choices=PRIORITIES)
+    parser.add_argument('--assignee')
+
+    parser = command('search', _search, 'full-text search over tasks')
+    parser.add_argument('query')
+    parser.add_argument('--project')
+    parser.add_argument('--user')
+    parser.add_argument('--limit', type=int, default=20)
+
+    parser = command('stats', _stats, 'board statistics of a project, all projects or a user')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--project')
+    group.add_argument('--user')
+
+    parser = command('projects', _projects, 'list the projects of a user and their roles')
+    parser.add_argument('username')
+
+    parser = command('export', _export, 'export tasks to a JSON lines or CSV file')
+    parser.add_argument('path')
+    parser.add_argument('--project')
+    parser.add_argument('--format', choices=('jsonl', 'csv'))
+
+    parser = command('import', _import, 'import tasks from a JSON lines or CSV file', True)
+    parser.add_argument('path')
+    parser.add_argument('--project', help='import every task into this project')
+    parser.add_argument('--creator', help='create missing projects with this creator')
+    parser.add_argument('--format', choices=('jsonl', 'csv'))
+    parser.add_argument('--actor')
+
+    parser = command('delete-all', _delete_all, 'delete every user, project and task', True)
+    parser.add_argument('--yes', action='store_true')
+
+    command('save', _save, 'save now instead of only at the end')
+
+    if not batch:
+        command('admin-gui', _admin_gui, 'open the admin information window')
+        parser = command('batch', None, 'run commands from a file or stdin, one per line, with one load and save')
+        parser.add_argument('file', nargs='?', default='-', help="command file, '-' for stdin (default)")
+        parser.add_argument('--stop-on-error', action='store_true')
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='trellomize', description='Trellomize project manager')
+    parser.add_argument('--storage', choices=STORAGES, default='json')
+    parser.add_argument('--data-dir', default='.', help='directory of the data files (default: current)')
+    parser.add_argument('--log-file', default='project.log')
+    parser.add_argument('--pretty', action='store_true', help='indent JSON output')
+    _add_commands(parser.add_subparsers(dest='command', required=True, metavar='COMMAND'))
+    return parser
+
+
+def build_batch_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='batch', add_help=False)
+    _add_commands(parser.add_subparsers(dest='command', required=True, metavar='COMMAND'), batch=True)
+    return parser
+
+
+def run_command(session: Session, args, pretty: bool = False) -> int:
+    try:
+        result = args.handler(session, args)
+    except CommandError as e:
+        print(f'error: {e}', file=sys.stderr)
+        return 1
+    if args.mutates:
+        session.changed = True
+    if result is not None:
+        print(json.dumps(result, indent=2 if pretty else None, ensure_ascii=False))
+    return 0
+
+
+def run_batch(session: Session, lines, stop_on_error: bool = False, pretty: bool = False) -> int:
+    # Blank lines and # comments are skipped; one failing line does not stop
+    # the rest unless stop_on_error is set. Returns 1 if any line failed.
+    parser = build_batch_parser()
+    status = 0
+    for number, line in enumerate(lines, 1):
+        try:
+            tokens = shlex.split(line, comments=True)
+            if not tokens:
+                continue
+            args = parser.parse_args(tokens)
+        except SystemExit:
+            failed = True
+        except ValueError as e:
+            print(f'line {number}: {e}', file=sys.stderr)
+            failed = True
+        else:
+            failed = run_command(session, args, pretty) != 0
+        if failed:
+            print(f'line {number}: failed: {line.strip()}', file=sys.stderr)
+            status = 1
+            if stop_on_error:
+                break
+    return status
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    from logconfig import configure_logging
+
+    configure_logging(args.log_file)
+    session = Session(args.storage, args.data_dir)
+    try:
+        if args.command == 'batch':
+            if args.file == '-':
+                return run_batch(session, sys.stdin, args.stop_on_error, args.pretty)
+            with open(args.file) as command_file:
+                return run_batch(session, command_file, args.stop_on_error, args.pretty)
+        return run_command(session, args, args.pretty)
+    finally:
+        session.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+import base64
+import json
+import threading
+import zlib
+from collections import Counter
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+CHUNK_SIZE = 500
+
+
+class _Chunk:
+    __slots__ = ('keys', 'data', 'status', 'priority')
+
+    def __init__(self, keys: List[Any], data: bytes, status: Dict[str, int], priority: Dict[str, int]):
+        self.keys = keys
+        self.data = data
+        self.status = status
+        self.priority = priority
+
+
+class ColdStore:
+    # Archived tasks, kept per project in zlib-compressed JSON chunks of at
+    # most CHUNK_SIZE task records. A task's record is only decompressed
+    # when it is asked for. Chunks keep their task keys and status and
+    # priority counts uncompressed, so lookups and board statistics never
+    # decompress anything. Chunk numbers are stable: an emptied chunk is
+    # left as None. version changes with every modification so savers can
+    # skip an unchanged archive.
+    def __init__(self, level: int = 6):
+        self.level = level
+        self.chunks: Dict[str, List[Optional[_Chunk]]] = {}
+        self.locations: Dict[Any, Tuple[str, int]] = {}
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, key) -> bool:
+        return key in self.locations
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def _pack(self, records: List[Tuple[Any, Dict[str, Any]]]) -> _Chunk:
+        data = zlib.compress(json.dumps([record for _, record in records], separators=(',', ':')).encode('utf-8'),
+                             self.level)
+        return _Chunk([key for key, _ in records], data, dict(Counter(record["status"] for _, record in records)),
+                      dict(Counter(record["priority"] for _, record in records)))
+
+    @staticmethod
+    def _unpack(chunk: _Chunk) -> List[Dict[str, Any]]:
+        return json.loads(zlib.decompress(chunk.data))
+
+    def add(self, project_title: str, records: List[Tuple[Any, Dict[str, Any]]]) -> List[int]:
+        # Stores (key, record) pairs in new chunks and returns their numbers.
+        packed = [self._pack(records[i:i + CHUNK_SIZE]) for i in range(0, len(records), CHUNK_SIZE)]
+        numbers = []
+        with self._lock:
+            chunks = self.chunks.setdefault(project_title, [])
+            for chunk in packed:
+                numbers.append(len(chunks))
+                for key in chunk.keys:
+                    self.locations[key] = (project_title, len(chunks))
+                chunks.append(chunk)
+            self.version += 1
+        return numbers
+
+    def project_of(self, key) -> Optional[str]:
+        location = self.locations.get(key)
+        return location[0] if location is not None else None
+
+    def get(self, key) -> Optional[Tuple[str, Dict[str, Any]]]:
+        # (project title, record) of an archived task.
+        with self._lock:
+            location = self.locations.get(key)
+            if location is None:
+                return None
+            chunk = self.chunks[location[0]][location[1]]
+        return location[0], self._unpack(chunk)[chunk.keys.index(key)]
+
+    def remove(self, key) -> Optional[Tuple[str, int, Dict[str, Any]]]:
+        # Takes a task out of the archive; its chunk is recompressed without
+        # it. Returns (project title, chunk number, record).
+        with self._lock:
+            location = self.locations.pop(key, None)
+            if location is None:
+                return None
+            project_title, number = location
+            chunk = self.chunks[project_title][number]
+            position = chunk.keys.index(key)
+            records = list(zip(chunk.keys, self._unpack(chunk)))
+            record = records.pop(position)[1]
+            self.chunks[project_title][number] = self._pack(records) if records else None
+            self.version += 1
+        return project_title, number, record
+
+    def records(self, project_title: str) -> Iterator[Dict[str, Any]]:
+        # Decompresses one chunk at a time.
+        with self._lock:
+            chunks = [chunk for chunk in self.chunks.get(project_title, ()) if chunk is not None]
+        for chunk in chunks:
+            yield from self._unpack(chunk)
+
+    def drop_project(self, project_title: str) -> int:
+        with self._lock:
+            chunks = self.chunks.pop(project_title, None)
+            if chunks is None:
+                return 0
+            dropped = 0
+            for chunk in chunks:
+                for key in chunk.keys if chunk is not None else ():
+                    del self.locations[key]
+                    dropped += 1
+            self.version += 1
+        return dropped
+
+    def counts(self, project_title: Optional[str] = None) -> Tuple[int, Dict[str, int], Dict[str, int]]:
+        # Archived task, status and priority counts of one project or, for
+        # None, of all projects.
+        status, priority = Counter(), Counter()
+        with self._lock:
+            groups = [self.chunks.get(project_title, ())] if project_title is not None else list(self.chunks.values())
+            for chunks in groups:
+                for chunk in chunks:
+                    if chunk is not None:
+                        status.update(chunk.status)
+                        priority.update(chunk.priority)
+        return sum(status.values()), dict(status), dict(priority)
+
+    @staticmethod
+    def _chunk_dict(chunk: Optional[_Chunk], id_of: Callable[[Any], str]) -> Optional[Dict[str, Any]]:
+        if chunk is None:
+            return None
+        return {"ids": [id_of(key) for key in chunk.keys], "status": chunk.status, "priority": chunk.priority,
+                "data": base64.b64encode(chunk.data).decode('ascii')}
+
+    def chunk_data(self, project_title: str, number: int, id_of: Callable[[Any], str]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            chunks = self.chunks.get(project_title, ())
+            return self._chunk_dict(chunks[number] if number < len(chunks) else None, id_of)
+
+    def to_dict(self, id_of: Callable[[Any], str]) -> Dict[str, List[Optional[Dict[str, Any]]]]:
+        with self._lock:
+            return {title: [self._chunk_dict(chunk, id_of) for chunk in chunks] for title, chunks in self.chunks.items()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, List[Optional[Dict[str, Any]]]], key_of: Callable[[str], Any]) -> 'ColdStore':
+        store = cls()
+        for title, chunks in data.items():
+            restored = store.chunks[title] = []
+            for entry in chunks:
+                chunk = None
+                if entry is not None:
+                    packed = entry["data"]
+                    chunk = _Chunk([key_of(task_id) for task_id in entry["ids"]],
+                                   packed if isinstance(packed, bytes) else base64.b64decode(packed),
+                                   entry["status"], entry["priority"])
+                    for key in chunk.keys:
+                        store.locations[key] = (title, len(restored))
+                restored.append(chunk)
+        return store
@@ -0,0 +1,245 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest', 'block')
+
+
+class Event:
+    # kind is the name of the recorded mutation, e.g. 'change_task_status';
+    # users are the users it concerns (the member, commenter or assignees).
+    # data is shared by every subscriber and must not be modified.
+    __slots__ = ('seq', 'time', 'kind', 'project', 'task_id', 'users', 'data')
+
+    def __init__(self, seq: int, when: float, kind: str, project: Optional[str], task_id: Optional[str],
+                 users: tuple, data: Dict[str, Any]):
+        self.seq = seq
+        self.time = when
+        self.kind = kind
+        self.project = project
+        self.task_id = task_id
+        self.users = users
+        self.data = data
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"seq": self.seq, "time": self.time, "kind": self.kind, "project": self.project,
+                "task_id": self.task_id, "users": list(self.users), "data": self.data}
+
+    def __repr__(self) -> str:
+        return f'Event({self.seq}, {self.kind}, project={self.project!r}, task_id={self.task_id!r})'
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class Subscription:
+    # A bounded queue of the events matching every given filter (None
+    # matches anything). When it is full, overflow decides: 'drop_oldest'
+    # discards the oldest queued event, 'drop_newest' the new one, and
+    # 'block' makes the delivering thread wait up to block_timeout seconds
+    # (None: no limit) for the consumer and then drops the event.
+    # dropped counts discarded events; gaps in seq show where they were.
+    # Consumers take events in batches, from threads or from asyncio.
+    def __init__(self, bus: 'EventBus', projects: Optional[Iterable[str]] = None,
+                 users: Optional[Iterable[str]] = None, kinds: Optional[Iterable[str]] = None, maxsize: int = 1000,
+                 overflow: str = 'drop_oldest', block_timeout: Optional[float] = 1.0):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f'Unknown overflow policy: {overflow}')
+        self.bus = bus
+        self.projects = frozenset(projects) if projects is not None else None
+        self.users = frozenset(users) if users is not None else None
+        self.kinds = frozenset(kinds) if kinds is not None else None
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self.closed = False
+        self._queue = deque()
+        self._condition = threading.Condition()
+        # (loop, future) of asyncio consumers waiting for an event.
+        self._waiters = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def matches(self, event: Event) -> bool:
+        return ((self.kinds is None or event.kind in self.kinds)
+                and (self.projects is None or event.project in self.projects)
+                and (self.users is None or not self.users.isdisjoint(event.users)))
+
+    def _wake_waiters(self):
+        # Called with the condition held.
+        waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+    def put(self, event: Event) -> bool:
+        with self._condition:
+            if self.closed:
+                return False
+            if len(self._queue) >= self.maxsize:
+                if self.overflow == 'drop_newest':
+                    self.dropped += 1
+                    return False
+                if self.overflow == 'drop_oldest':
+                    self._queue.popleft()
+                    self.dropped += 1
+                elif not self._condition.wait_for(lambda: len(self._queue) < self.maxsize or self.closed,
+                                                  self.block_timeout) or self.closed:
+                    self.dropped += 1
+                    return False
+            self._queue.append(event)
+            self._condition.notify_all()
+            self._wake_waiters()
+        return True
+
+    def _drain(self, max_items: int) -> List[Event]:
+        # Called with the condition held; frees room for blocked publishers.
+        batch = [self._queue.popleft() for _ in range(min(max_items, len(self._queue)))]
+        if batch:
+            self._condition.notify_all()
+        return batch
+
+    def get_batch(self, max_items: int = 100, timeout: Optional[float] = None,
+                  linger: float = 0.0) -> List[Event]:
+        # Waits up to timeout for a first event, then up to linger seconds
+        # for the batch to fill. An empty batch means the timeout passed or
+        # the subscription is closed and drained.
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._queue or self.closed, timeout):
+                return []
+            if linger > 0:
+                target = min(max_items, self.maxsize)
+                self._condition.wait_for(lambda: len(self._queue) >= target or self.closed, linger)
+            return self._drain(max_items)
+
+    def __iter__(self) -> Iterator[List[Event]]:
+        # Batches until the subscription is closed.
+        while True:
+            batch = self.get_batch()
+            if not batch:
+                return
+            yield batch
+
+    async def next_batch(self, max_items: int = 100, linger: float = 0.0) -> List[Event]:
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self._queue or self.closed:
+                    break
+                future = loop.create_future()
+                self._waiters.append((loop, future))
+            await future
+        if linger > 0:
+            await asyncio.sleep(linger)
+        with self._condition:
+            return self._drain(max_items)
+
+    async def batches(self, max_items: int = 100, linger: float = 0.0) -> AsyncIterator[List[Event]]:
+        while True:
+            batch = await self.next_batch(max_items, linger)
+            if not batch:
+                return
+            yield batch
+
+    def close(self):
+        # Queued events can still be read; waiting consumers get an empty
+        # batch once they are gone.
+        self.bus.unsubscribe(self)
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+            self._wake_waiters()
+
+
+def _deliver(subscription: Subscription, callback: Callable[[List[Event]], Any], max_items: int, linger: float):
+    for batch in iter(lambda: subscription.get_batch(max_items, None, linger), []):
+        try:
+            callback(batch)
+        except Exception as e:
+            logger.error('Error delivering %s events: %s', len(batch), e)
+
+
+class EventBus:
+    # In-process publish/subscribe of board changes. Events are numbered
+    # in post order and every subscription receives its events in that
+    # order. post only numbers and queues an event, so it can be called
+    # under other locks; flush delivers the queue and may wait on 'block'
+    # subscriptions. Whichever thread flushes first delivers for everyone
+    # and the others return at once. Posting costs nothing while there are
+    # no subscribers.
+    def __init__(self):
+        self._subscriptions = ()
+        self._lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+        self._deliver_lock = threading.Lock()
+        self._outbox = deque()
+        self._seq = 0
+
+    @property
+    def active(self) -> bool:
+        return bool(self._subscriptions)
+
+    def subscribe(self, projects: Optional[Iterable[str]] = None, users: Optional[Iterable[str]] = None,
+                  kinds: Optional[Iterable[str]] = None, maxsize: int = 1000, overflow: str = 'drop_oldest',
+                  block_timeout: Optional[float] = 1.0, callback: Optional[Callable[[List[Event]], Any]] = None,
+                  max_batch: int = 100, linger: float = 0.0) -> Subscription:
+        # With a callback, a daemon thread hands it batches of up to
+        # max_batch events until the subscription is closed.
+        subscription = Subscription(self, projects, users, kinds, maxsize, overflow, block_timeout)
+        with self._lock:
+            self._subscriptions += (subscription,)
+        if callback is not None:
+            threading.Thread(target=_deliver, args=(subscription, callback, max_batch, linger),
+                             name='event-delivery', daemon=True).start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions = tuple(other for other in self._subscriptions if other is not subscription)
+
+    def post(self, kind: str, project: Optional[str] = None, task_id: Optional[str] = None,
+             users: Iterable[str] = (), data: Optional[Dict[str, Any]] = None) -> Optional[Event]:
+        subscriptions = self._subscriptions
+        if not subscriptions:
+            return None
+        with self._publish_lock:
+            self._seq += 1
+            event = Event(self._seq, time.time(), kind, project, task_id, tuple(users), data or {})
+            # Subscriptions made after the post do not see the event.
+            self._outbox.append((event, subscriptions))
+        return event
+
+    def flush(self):
+        # Checked again after releasing the lock, for events posted while a
+        # thread that had already found the queue empty still held it.
+        while self._outbox:
+            if not self._deliver_lock.acquire(blocking=False):
+                return
+            try:
+                while self._outbox:
+                    event, subscriptions = self._outbox.popleft()
+                    for subscription in subscriptions:
+                        if subscription.matches(event):
+                            subscription.put(event)
+            finally:
+                self._deliver_lock.release()
+
+    def publish(self, kind: str, project: Optional[str] = None, task_id: Optional[str] = None,
+                users: Iterable[str] = (), data: Optional[Dict[str, Any]] = None) -> Optional[Event]:
+        event = self.post(kind, project, task_id, users, data)
+        self.flush()
+        return event
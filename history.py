@@ -0,0 +1,188 @@
+import bisect
+import threading
+import time
+from array import array
+from enum import IntEnum
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+
+class EventKind(IntEnum):
+    CREATED = 0
+    STATUS = 1
+    PRIORITY = 2
+    ASSIGNED = 3
+    UNASSIGNED = 4
+    COMMENT = 5
+
+
+class HistoryLog:
+    # Append-only, column-per-field event log shared by all tasks of a
+    # manager. old/new hold enum values for status and priority events and
+    # user holds an interned user id (0 means no user). Each task keeps the
+    # positions of its own events in an array('I') in Task._history, in time
+    # order, so per-task queries bisect that array instead of scanning the
+    # whole log. Task creation times live on the task itself. Events of
+    # deleted or archived tasks are released and dropped by compact().
+    # Every read of a task's positions holds _lock, like compact() while it
+    # renumbers them, so a reader sees the log entirely before or entirely
+    # after a compaction.
+    def __init__(self):
+        self.times = array('d')
+        self.kinds = array('B')
+        self.old = array('B')
+        self.new = array('B')
+        self.users = array('I')
+        self.user_names: List[Optional[str]] = [None]
+        self._user_ids: Dict[str, int] = {}
+        self.released = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def _user_id(self, user: Optional[str]) -> int:
+        # Callers hold _lock.
+        if user is None:
+            return 0
+        user_id = self._user_ids.get(user)
+        if user_id is None:
+            user_id = self._user_ids[user] = len(self.user_names)
+            self.user_names.append(user)
+        return user_id
+
+    def append(self, task, kind: EventKind, old: int = 0, new: int = 0, user: Optional[str] = None,
+               timestamp: Optional[float] = None) -> float:
+        positions = task._history
+        if positions is None:
+            positions = task._history = array('I')
+        with self._lock:
+            when = time.time() if timestamp is None else timestamp
+            if positions:
+                # Keeps each task's events in time order even if the clock steps back.
+                when = max(when, self.times[positions[-1]])
+            positions.append(len(self.times))
+            self.times.append(when)
+            self.kinds.append(kind)
+            self.old.append(old)
+            self.new.append(new)
+            self.users.append(self._user_id(user))
+        return when
+
+    def adopt(self, task):
+        # Tasks restored from storage carry their events as the columnar
+        # dict produced by columns(); they are appended to this log.
+        columns = task._history
+        if not isinstance(columns, dict):
+            return
+        task._history = None
+        for when, kind, old, new, user in zip(columns["time"], columns["kind"], columns["old"],
+                                              columns["new"], columns["user"]):
+            self.append(task, EventKind(kind), old, new, user, when)
+
+    def release(self, task):
+        positions = task._history
+        task._history = None
+        if positions is not None and not isinstance(positions, dict):
+            with self._lock:
+                self.released += len(positions)
+
+    def compact(self, tasks: Iterable[Any]):
+        # Rebuilds the columns from the events of the given live tasks.
+        # Callers must make sure no task is adopted meanwhile that is
+        # missing from tasks.
+        columns = (array('d'), array('B'), array('B'), array('B'), array('I'))
+        times, kinds, old, new, users = columns
+        with self._lock:
+            for task in tasks:
+                positions = task._history
+                if not positions or isinstance(positions, dict):
+                    continue
+                moved = array('I', range(len(times), len(times) + len(positions)))
+                for p in positions:
+                    times.append(self.times[p])
+                    kinds.append(self.kinds[p])
+                    old.append(self.old[p])
+                    new.append(self.new[p])
+                    users.append(self.users[p])
+                task._history = moved
+            self.times, self.kinds, self.old, self.new, self.users = columns
+            self.released = 0
+
+    def columns(self, task) -> Optional[Dict[str, List[Any]]]:
+        with self._lock:
+            positions = task._history
+            if positions is None:
+                return None
+            if isinstance(positions, dict):
+                return positions
+            return {
+                "time": [self.times[p] for p in positions],
+                "kind": [self.kinds[p] for p in positions],
+                "old": [self.old[p] for p in positions],
+                "new": [self.new[p] for p in positions],
+                "user": [self.user_names[self.users[p]] for p in positions],
+            }
+
+    def events(self, task) -> Iterator[Dict[str, Any]]:
+        if isinstance(task._history, dict):
+            # A task that was never adopted, e.g. one read from the archive.
+            columns = task._history
+            for when, kind, old, new, user in zip(columns["time"], columns["kind"], columns["old"],
+                                                  columns["new"], columns["user"]):
+                yield {"time": when, "kind": EventKind(kind).name, "old": old, "new": new, "user": user}
+            return
+        with self._lock:
+            events = [(self.times[p], self.kinds[p], self.old[p], self.new[p], self.user_names[self.users[p]])
+                      for p in task._history or ()]
+        for when, kind, old, new, user in events:
+            yield {"time": when, "kind": EventKind(kind).name, "old": old, "new": new, "user": user}
+
+    def entered(self, task, kind: EventKind, value: int) -> List[float]:
+        # Times at which the task's status or priority was set to value.
+        with self._lock:
+            return [self.times[p] for p in task._history or ()
+                    if self.kinds[p] == kind and self.new[p] == value]
+
+    def _first_after(self, positions, when: float) -> int:
+        # Index into positions of the first event after when. Callers hold
+        # _lock.
+        times = self.times
+        return bisect.bisect_right(positions, when, key=lambda p: times[p])
+
+    def value_at(self, task, kind: EventKind, current: int, when: float) -> int:
+        # The task's status or priority as of when: the last matching event
+        # at or before when, else the value that the first later event
+        # replaced, else the current value.
+        with self._lock:
+            positions = task._history
+            if not positions or isinstance(positions, dict):
+                return current
+            kinds = self.kinds
+            split = self._first_after(positions, when)
+            for i in range(split - 1, -1, -1):
+                if kinds[positions[i]] == kind:
+                    return self.new[positions[i]]
+            for i in range(split, len(positions)):
+                if kinds[positions[i]] == kind:
+                    return self.old[positions[i]]
+        return current
+
+    def cycle_time(self, task, start: int, end: int, created: float, initial: Optional[int] = None) -> Optional[float]:
+        # Seconds from first entering the start status (or creation, if the
+        # task was created in it) to last entering the end status.
+        started = created if initial == start else None
+        finished = None
+        with self._lock:
+            positions = task._history
+            if not positions or isinstance(positions, dict):
+                return None
+            for p in positions:
+                if self.kinds[p] != EventKind.STATUS:
+                    continue
+                if started is None and self.new[p] == start:
+                    started = self.times[p]
+                elif started is not None and self.new[p] == end:
+                    finished = self.times[p]
+        if started is None or finished is None:
+            return None
+        return finished - started
@@ -0,0 +1,98 @@
+import json
+import os
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Journal:
+    def __init__(self, log_path: str = 'journal.log', snapshot_path: str = 'snapshot.json',
+                 compact_every: int = 10000, fsync: bool = False):
+        self.log_path = log_path
+        self.snapshot_path = snapshot_path
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.pending = 0
+        self.seq = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.log_path, 'ab')
+        return self._file
+
+    def append(self, record: List[Any]):
+        with self._lock:
+            log_file = self._open()
+            self.seq += 1
+            line = [self.seq, round(time.time(), 6)] + record
+            log_file.write(json.dumps(line, separators=(',', ':')).encode('utf-8') + b'\n')
+            log_file.flush()
+            if self.fsync:
+                os.fsync(log_file.fileno())
+            self.pending += 1
+
+    def needs_compaction(self) -> bool:
+        return self.compact_every > 0 and self.pending >= self.compact_every
+
+    def replay(self, after_seq: int = 0) -> Iterator[Tuple[Optional[float], List[Any]]]:
+        # Yields (timestamp, record) pairs; the timestamp is None for logs
+        # written before records were timestamped. A crash can leave a
+        # partially written last line behind; replay stops there and the log
+        # is cut back to the last complete record. Records already covered by
+        # the snapshot (seq <= after_seq) are skipped, which handles a crash
+        # between replacing the snapshot and clearing the log.
+        self.seq = after_seq
+        if not os.path.exists(self.log_path):
+            return
+        good_offset = 0
+        with open(self.log_path, 'rb') as log_file:
+            for line in log_file:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                good_offset += len(line)
+                if record[0] <= after_seq:
+                    continue
+                self.seq = record[0]
+                self.pending += 1
+                if isinstance(record[1], str):
+                    yield None, record[1:]
+                else:
+                    yield record[1], record[2:]
+        if good_offset != os.path.getsize(self.log_path):
+            logger.error('Truncating journal %s at offset %s after incomplete record', self.log_path, good_offset)
+            with open(self.log_path, 'r+b') as log_file:
+                log_file.truncate(good_offset)
+
+    def load_snapshot(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.snapshot_path):
+            return None
+        with open(self.snapshot_path, 'r') as snapshot_file:
+            return json.load(snapshot_file)
+
+    def write_snapshot(self, data: Dict[str, Any]):
+        data['seq'] = self.seq
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'w') as snapshot_file:
+            json.dump(data, snapshot_file, separators=(',', ':'))
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        # The snapshot now covers everything in the log.
+        self.close()
+        with open(self.log_path, 'wb'):
+            pass
+        self.pending = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,163 @@
+import json
+import re
+import threading
+from array import array
+from typing import Any, Dict, Iterator, List, Tuple
+
+_SKIP_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class JSONSource:
+    # An open handle on a JSON file that spans are read back from. The
+    # handle keeps the scanned data readable after the file is replaced.
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._lock = threading.Lock()
+
+    def read(self, offset: int, length: int) -> bytes:
+        with self._lock:
+            self._file.seek(offset)
+            return self._file.read(length)
+
+    def close(self):
+        self._file.close()
+
+
+class TaskSpans:
+    # A project's tasks in a JSON file, iterable as the {task_id: data}
+    # entries Project.defer_tasks expects. Only the byte offset and length
+    # of every entry are kept; entries are read back and parsed one at a
+    # time while iterating.
+    def __init__(self, source: JSONSource, offsets: array, lengths: array):
+        self.source = source
+        self.offsets = offsets
+        self.lengths = lengths
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __iter__(self) -> Iterator[Dict[str, Dict[str, Any]]]:
+        for offset, length in zip(self.offsets, self.lengths):
+            yield json.loads(self.source.read(offset, length))
+
+
+class _Scanner:
+    # Reads a file as latin-1, so every character is one byte and positions
+    # are byte offsets. raw_decode finds where a value ends; values that
+    # are kept are decoded again from their bytes to get the real text.
+    def __init__(self, json_file, chunk_size: int):
+        self.file = json_file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        # File offset of buffer[0].
+        self.base = 0
+        self.eof = False
+
+    def offset(self) -> int:
+        return self.base + self.pos
+
+    def read_more(self, size: int) -> bool:
+        chunk = self.file.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.base += self.pos
+        self.buffer = self.buffer[self.pos:] + chunk.decode('latin-1')
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            self.pos = _SKIP_WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.read_more(self.chunk_size):
+                return ''
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f'Expected one of {chars!r} at offset {self.offset()} in {self.file.name}')
+        self.pos += 1
+        return char
+
+    def skip(self) -> Tuple[int, int]:
+        # Steps over one value and returns its (offset, length).
+        self.peek()
+        start = self.offset()
+        while True:
+            try:
+                _, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number may continue past the end of the buffer.
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return start, self.offset() - start
+            except ValueError:
+                if self.eof:
+                    raise
+            self.read_more(max(self.chunk_size, len(self.buffer) - self.pos))
+
+    def value(self) -> Any:
+        start, length = self.skip()
+        return json.loads(self.buffer[start - self.base:start - self.base + length].encode('latin-1'))
+
+    def items(self) -> Iterator[str]:
+        # Keys of the object starting here; the caller consumes each value.
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self.expect(',}') == '}':
+                return
+
+
+def iter_json_object(path: str, chunk_size: int = 1 << 16) -> Iterator[Tuple[str, Any]]:
+    # Yields the top-level key/value pairs of a JSON object one at a time, so
+    # only a single value (e.g. one user) is held in memory while parsing.
+    with open(path, 'rb') as json_file:
+        scanner = _Scanner(json_file, chunk_size)
+        for key in scanner.items():
+            yield key, scanner.value()
+
+
+def iter_json_projects(source: JSONSource, chunk_size: int = 1 << 16) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    # Like iter_json_object over a projects file, but a project's "tasks"
+    # are not kept: each entry is parsed only to step over it and find its
+    # task ids. "tasks" becomes a TaskSpans reading from source and
+    # "task_ids" lists the ids, so memory grows with the number of tasks
+    # but not with their size.
+    with open(source.path, 'rb') as json_file:
+        scanner = _Scanner(json_file, chunk_size)
+        for title in scanner.items():
+            data = {}
+            for key in scanner.items():
+                if key != "tasks":
+                    data[key] = scanner.value()
+                    continue
+                offsets = array('Q')
+                lengths = array('I')
+                task_ids: List[str] = []
+                scanner.expect('[')
+                if scanner.peek() == ']':
+                    scanner.pos += 1
+                else:
+                    while True:
+                        scanner.peek()
+                        start = scanner.offset()
+                        for task_id in scanner.items():
+                            task_ids.append(task_id)
+                            scanner.skip()
+                        offsets.append(start)
+                        lengths.append(scanner.offset() - start)
+                        if scanner.expect(',]') == ']':
+                            break
+                data["tasks"] = TaskSpans(source, offsets, lengths)
+                data["task_ids"] = task_ids
+            yield title, data
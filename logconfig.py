@@ -0,0 +1,77 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+from typing import Dict, Optional
+
+DEFAULT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+class OperationFilter(logging.Filter):
+    # Operations are identified by the name of the function that logged the
+    # record, e.g. 'change_task_status'. levels sets a minimum level per
+    # operation; sample_rates keeps only that fraction of records below
+    # WARNING, so errors are never sampled away.
+    def __init__(self, levels: Optional[Dict[str, int]] = None, sample_rates: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self.levels = levels or {}
+        self.sample_rates = sample_rates or {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        level = self.levels.get(record.funcName)
+        if level is not None and record.levelno < level:
+            return False
+        rate = self.sample_rates.get(record.funcName)
+        if rate is not None and record.levelno < logging.WARNING and random.random() >= rate:
+            return False
+        return True
+
+
+class JSONLinesFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'operation': record.funcName,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    # The queue never leaves the process, so the record is passed through
+    # as-is and the message is only formatted by the listener thread.
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def _stop_listener(listener: logging.handlers.QueueListener):
+    # Flushes queued records at exit unless the caller already stopped it.
+    if listener._thread is not None:
+        listener.stop()
+
+
+def configure_logging(filename: str = 'project.log', level: int = logging.INFO, json_lines: bool = False,
+                      levels: Optional[Dict[str, int]] = None, sample_rates: Optional[Dict[str, float]] = None,
+                      queued: bool = True) -> Optional[logging.handlers.QueueListener]:
+    file_handler = logging.FileHandler(filename)
+    file_handler.setFormatter(JSONLinesFormatter() if json_lines else logging.Formatter(DEFAULT_FORMAT))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    listener = None
+    if queued:
+        handler = _LazyQueueHandler(queue.SimpleQueue())
+        listener = logging.handlers.QueueListener(handler.queue, file_handler, respect_handler_level=True)
+        listener.start()
+        atexit.register(_stop_listener, listener)
+    else:
+        handler = file_handler
+    handler.addFilter(OperationFilter(levels, sample_rates))
+    root.addHandler(handler)
+    return listener
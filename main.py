@@ -1,8 +1,9 @@
-import tkinter as tk
-import argparse
-
 class AdminInfoInput:
+    # tkinter is imported on first use so importing this module, as the
+    # command line does, stays fast and works without a display.
     def __init__(self, root):
+        import tkinter as tk
+
         self.root = root
         self.root.title("Admin Information")
         self.root.geometry("300x150")
@@ -28,7 +29,12 @@ class AdminInfoInput:
         print(f"Admin username: {username}")
         print(f"Admin password: {password}")
 
-if __name__ == "__main__":
+def main():
+    import tkinter as tk
+
     root = tk.Tk()
     app = AdminInfoInput(root)
     root.mainloop()
+
+if __name__ == "__main__":
+    main()
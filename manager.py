@@ -1,55 +1,68 @@
-import json
-import os
 import re
 import logging
-from project_manager import ProjectManager
-logging.basicConfig(filename='project.log', level=logging.INFO,format='%(asctime)s - %(levelname)s - %(message)s')
+from storage import StorageBackend, JSONStorage
+from logconfig import configure_logging
+from auth import hash_password, verify_password
+
+logger = logging.getLogger(__name__)
     
     
 def is_valid_email(email):
     email_regex = re.compile(r"^[\w\.-]+@[\w\.-]+\.\w+$")
     return re.match(email_regex, email) is not None
 
-def create_admin(file_path='admin_data.json'):
-    username = input("Enter username for the admin user: ")
-    password = input("Enter password for the admin user: ")
-    email = input("Enter email for the admin user: ")
+def create_admin(file_path='admin_data.json', storage: StorageBackend = None, username=None, password=None,
+                 email=None):
+    # Values not passed in are prompted for.
+    if storage is None:
+        storage = JSONStorage(admin_path=file_path)
+    if username is None:
+        username = input("Enter username for the admin user: ")
+    if password is None:
+        password = input("Enter password for the admin user: ")
+    if email is None:
+        email = input("Enter email for the admin user: ")
 
     if not is_valid_email(email):
         print("Invalid email address")
         return
 
-    if os.path.exists(file_path):
-        with open(file_path, 'r') as file:
-            data = json.load(file)
-            if data.get('username') == username:
-                print(f"Error: Admin with username '{username}' already exists.")
-                return
-    else:
-        data = {}
+    if storage.load_admin(username) is not None:
+        print(f"Error: Admin with username '{username}' already exists.")
+        return
 
-    data['username'] = username
-    data['password'] = password
-    data['email'] = email
+    data = {'username': username, 'password': hash_password(password), 'email': email}
     try:
-        with open(file_path, 'w') as file:
-            json.dump(data, file, indent=4)
+        storage.save_admin(data)
         print(f"Admin '{username}' created successfully.")
-        logging.info("Admin '%s' created successfully.", username)
+        logger.info("Admin '%s' created successfully.", username)
     except Exception as e:
-        logging.error("Error saving admin data: %s", str(e))
+        logger.error("Error saving admin data: %s", e)
         
-def delete_all(self):
-        pr= ProjectManager()
-        confirmation = input("Are you sure you want to delete all data? (yes/no): ")
-        if confirmation.lower() == "yes":
-            pr.users = {}
-            pr.projects = {}
-            print("All data has been deleted.")
-        else:
-            print("Operation canceled.")
+def verify_admin(username, password, file_path='admin_data.json', storage: StorageBackend = None):
+    if storage is None:
+        storage = JSONStorage(admin_path=file_path)
+    data = storage.load_admin(username)
+    if data is None or not verify_password(password, data['password']):
+        logger.info("Failed admin login for '%s'.", username)
+        return False
+    return True
+
+def delete_all(manager=None):
+    from projectmanager import ProjectManager
+    if manager is None:
+        manager = ProjectManager()
+        manager.load_data()
+    confirmation = input("Are you sure you want to delete all data? (yes/no): ")
+    if confirmation.lower() == "yes":
+        manager.delete_all()
+        manager.save_data()
+        print("All data has been deleted.")
+    else:
+        print("Operation canceled.")
             
 def main():
+    configure_logging()
     create_admin()
 
 if __name__ == '__main__':
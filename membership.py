@@ -0,0 +1,56 @@
+from enum import Enum
+from typing import Dict, Iterable, Optional
+
+
+class Role(Enum):
+    CREATOR = 1
+    ADMIN = 2
+    MEMBER = 3
+
+
+# Roles allowed to change a project's membership; every role may work on tasks.
+MANAGING_ROLES = frozenset((Role.CREATOR, Role.ADMIN))
+
+
+class PermissionDenied(Exception):
+    pass
+
+
+class MembershipIndex:
+    # Reverse of Project.members: username -> {project title: role}, so a
+    # user's projects are found without scanning every project.
+    def __init__(self):
+        self.by_user: Dict[str, Dict[str, Role]] = {}
+
+    def add(self, project_title: str, user: str, role: Role):
+        projects = self.by_user.get(user)
+        if projects is None:
+            projects = self.by_user[user] = {}
+        projects[project_title] = role
+
+    def remove(self, project_title: str, user: str):
+        projects = self.by_user.get(user)
+        if projects is not None:
+            projects.pop(project_title, None)
+            if not projects:
+                del self.by_user[user]
+
+    def add_project(self, project_title: str, members: Dict[str, Role]):
+        for user, role in members.items():
+            self.add(project_title, user, role)
+
+    def remove_project(self, project_title: str, members: Iterable[str]):
+        for user in members:
+            self.remove(project_title, user)
+
+    def projects_of(self, user: str) -> Dict[str, Role]:
+        return dict(self.by_user.get(user, {}))
+
+
+def authorize(members: Dict[str, Role], actor: Optional[str], roles=None, action: str = 'do this'):
+    # actor None means a trusted caller (the console, replay, imports).
+    if actor is None:
+        return
+    role = members.get(actor)
+    if role is None or (roles is not None and role not in roles):
+        raise PermissionDenied(f'{actor} may not {action}')
@@ -1,12 +1,35 @@
-import json
 import re
+import sys
 import uuid
+import itertools
+import bisect
+import heapq
+import functools
+import threading
 import logging
+import time
 from enum import Enum
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Iterable, Iterator
 import manager as ma
+from taskindex import TaskIndex
+from journal import Journal
+from history import HistoryLog, EventKind
+from analytics import BoardAnalytics, throughput_histogram
+from searchindex import SearchIndex, tokenize
+from coldstore import ColdStore
+from eventbus import EventBus
+from storage import StorageBackend, JSONStorage
+from boardio import read_board, write_board
+from logconfig import configure_logging
+from locks import RWLock
+from auth import hash_password
+from membership import Role, MembershipIndex, PermissionDenied, MANAGING_ROLES, authorize
 
-logging.basicConfig( filename='project.log', level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+_materialize_lock = threading.Lock()
+# Creation order of tasks within this process; pagination cursors build on it.
+_task_sequence = itertools.count()
 
 class Priority(Enum):
     CRITICAL = 1
@@ -21,289 +44,1501 @@ class Status(Enum):
     DONE = 4
     ARCHIVED = 5
 
+def task_key(task_id: str):
+    # Tasks are keyed by their 16-byte binary UUID; ids that are not UUIDs
+    # (e.g. from hand-edited files) are kept as strings.
+    try:
+        return uuid.UUID(task_id).bytes
+    except (ValueError, TypeError, AttributeError):
+        return task_id
+
 class User:
+    # password holds the salted hash from auth.hash_password; users loaded
+    # from older files keep their plaintext until their next login.
+    __slots__ = ('username', 'password', 'email')
+
     def __init__(self, username: str, password: str, email: str):
-        self.username = username
+        self.username = sys.intern(username)
         self.password = password
         self.email = email
         try:
             if not self.is_valid_email(email):
                 raise ValueError("Invalid email address")
-            logging.info(f'Created user: {username}')
+            logger.debug('Created user: %s', username)
         except Exception as e:
-            logging.error(f'Error creating user {username}: {e}')
+            logger.error('Error creating user %s: %s', username, e)
 
-    
+    @staticmethod
     def is_valid_email(email: str) -> bool:
         email_regex = re.compile(r"^[\w\.-]+@[\w\.-]+\.\w+$")
         return re.match(email_regex, email) is not None
 
 class Project:
+    # members maps each username to its Role; dict keys keep join order and
+    # make membership checks O(1).
+    __slots__ = ('id', 'title', 'creator', 'members', 'pending_tasks', 'on_task_loaded', '_tasks')
+
     def __init__(self, title: str, creator: str):
         try:
             self.id = str(uuid.uuid4())
             self.title = title
-            self.creator = creator
-            self.members = [creator]
+            self.creator = sys.intern(creator)
+            self.members = {self.creator: Role.CREATOR}
+            self.pending_tasks = None
+            self.on_task_loaded = None
             self.tasks = []
-            logging.info(f'Created project: {title} by {creator}')
+            logger.debug('Created project: %s by %s', title, creator)
+        except Exception as e:
+            logger.error('Error creating project %s: %s', title, e)
+
+    @property
+    def tasks(self) -> List['Task']:
+        self.materialize()
+        return self._tasks
+
+    @tasks.setter
+    def tasks(self, tasks: List['Task']):
+        self.pending_tasks = None
+        self._tasks = tasks
+
+    def defer_tasks(self, task_entries: List[Dict[str, Any]], on_task_loaded=None):
+        self.pending_tasks = task_entries
+        self.on_task_loaded = on_task_loaded
+
+    def materialize(self):
+        # Turns deferred task entries into Tasks; reading tasks does this on
+        # first use, callers that only need the tasks registered call it.
+        if self.pending_tasks is not None:
+            with _materialize_lock:
+                if self.pending_tasks is not None:
+                    self._materialize_tasks()
+
+    def _materialize_tasks(self):
+        # The list is published only once it is complete, so concurrent
+        # readers never see a half-loaded project.
+        tasks = list(self._tasks)
+        try:
+            for entry in self.pending_tasks:
+                for task_id, data in entry.items():
+                    task = Task.from_data(task_id, data)
+                    tasks.append(task)
+                    if self.on_task_loaded is not None:
+                        self.on_task_loaded(self.title, task)
+            logger.debug('Loaded %s tasks of project: %s', len(tasks), self.title)
         except Exception as e:
-            logging.error(f'Error creating project {title}: {e}')
+            logger.error('Error loading tasks of project %s: %s', self.title, e)
+        self._tasks = tasks
+        self.pending_tasks = None
 
-    def add_member(self, user: str):
+    def add_member(self, user: str, role: Role = Role.MEMBER):
         try:
-            self.members.append(user)
-            logging.info(f'Added member: {user} to project: {self.title}')
+            if user not in self.members:
+                self.members[sys.intern(user)] = role
+                logger.debug('Added member: %s to project: %s', user, self.title)
         except Exception as e:
-            logging.error(f'Error adding member {user} to project {self.title}: {e}')
+            logger.error('Error adding member %s to project %s: %s', user, self.title, e)
 
     def remove_member(self, user: str):
         try:
-            if user in self.members:
-                self.members.remove(user)
-                logging.info(f'Removed member: {user} from project: {self.title}')
+            if self.members.get(user) not in (None, Role.CREATOR):
+                del self.members[user]
+                logger.debug('Removed member: %s from project: %s', user, self.title)
         except Exception as e:
-            logging.error(f'Error removing member {user} from project {self.title}: {e}')
+            logger.error('Error removing member %s from project %s: %s', user, self.title, e)
+
+    def set_role(self, user: str, role: Role):
+        try:
+            if role is not Role.CREATOR and self.members.get(user) not in (None, Role.CREATOR):
+                self.members[user] = role
+                logger.debug('Set role of member: %s in project: %s to %s', user, self.title, role.name)
+        except Exception as e:
+            logger.error('Error setting role of member %s in project %s: %s', user, self.title, e)
 
     def delete_project(self):
+        # Drops the project's own references; the manager takes it out of
+        # its registries and indexes.
         try:
-            logging.info(f'Deleting project: {self.title}')
-            del self
+            logger.debug('Deleting project: %s', self.title)
+            self.members.clear()
+            self.tasks = []
+            self.on_task_loaded = None
         except Exception as e:
-            logging.error(f'Error deleting project {self.title}: {e}')
+            logger.error('Error deleting project %s: %s', self.title, e)
 
 class Task:
+    # Comments are stored as (user, text) tuples and, like history, only
+    # allocated once the first entry is added. _history holds the positions
+    # of the task's events in its manager's HistoryLog; a created time of 0
+    # means the task predates creation tracking.
+    __slots__ = ('key', 'seq', 'title', 'description', 'assigned_to', 'priority', 'status', 'created',
+                 '_history', '_comments', 'observer')
+
     def __init__(self, title: str, description: str, assigned_to: List[str], priority: Priority = Priority.LOW,
-                 status: Status = Status.BACKLOG):
+                 status: Status = Status.BACKLOG, task_id: Optional[str] = None):
         try:
-            self.id = str(uuid.uuid4())
+            self.key = task_key(task_id) if task_id is not None else uuid.uuid4().bytes
+            self.seq = next(_task_sequence)
             self.title = title
             self.description = description
-            self.assigned_to = assigned_to
+            self.assigned_to = [sys.intern(user) for user in assigned_to]
             self.priority = priority
             self.status = status
-            self.history = []
-            self.comments = []
-            logging.info(f'Created task: {title} with ID: {self.id} in status: {status.name} and priority: {priority.name}')
+            self.created = time.time()
+            self._history = None
+            self._comments = None
+            self.observer = None
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('Created task: %s with ID: %s in status: %s and priority: %s', title, self.id, status.name, priority.name)
         except Exception as e:
-            logging.error(f'Error creating task {title}: {e}')
+            logger.error('Error creating task %s: %s', title, e)
+
+    @classmethod
+    def restore(cls, task_id: Optional[str], title: str, description: str, assigned_to: List[str],
+                priority: Priority, status: Status, comments: Optional[List[Dict[str, str]]] = None,
+                created: Optional[float] = None, history: Optional[Dict[str, List[Any]]] = None) -> 'Task':
+        # Builds a task from stored or imported data without per-task logging.
+        # history is kept in its stored columnar form until the task is
+        # registered with a manager.
+        task = cls.__new__(cls)
+        task.key = task_key(task_id) if task_id is not None else uuid.uuid4().bytes
+        task.seq = next(_task_sequence)
+        task.title = title
+        task.description = description
+        task.assigned_to = [sys.intern(user) for user in assigned_to]
+        task.priority = priority
+        task.status = status
+        task.created = time.time() if created is None else created
+        task._history = history
+        task.comments = comments or []
+        task.observer = None
+        return task
+
+    @classmethod
+    def from_data(cls, task_id: Optional[str], data: Dict[str, Any]) -> 'Task':
+        # data as produced by ProjectManager._task_data.
+        return cls.restore(task_id, data["title"], data["description"], data["assigned_to"],
+                           Priority[data["priority"]], Status[data["status"]], data["comments"],
+                           data.get("created", 0.0), data.get("history"))
+
+    @property
+    def id(self) -> str:
+        return str(uuid.UUID(bytes=self.key)) if isinstance(self.key, bytes) else self.key
+
+    @property
+    def history(self) -> List[Dict[str, Any]]:
+        if self.observer is None or self._history is None:
+            return []
+        return list(self.observer.history.events(self))
+
+    @property
+    def comments(self) -> List[Dict[str, str]]:
+        if self._comments is None:
+            return []
+        return [{"user": user, "comment": comment} for user, comment in self._comments]
+
+    @comments.setter
+    def comments(self, comments: List[Dict[str, str]]):
+        self._comments = [(sys.intern(entry["user"]), entry["comment"]) for entry in comments] or None
 
     def assign_task(self, user: str):
         try:
+            # A short list rather than a set keeps tasks small; assignees
+            # are few, so the membership test is effectively constant time.
+            if user in self.assigned_to:
+                return
+            user = sys.intern(user)
             self.assigned_to.append(user)
-            logging.info(f'Assigned task: {self.title} to user: {user}')
+            if self.observer is not None:
+                self.observer.task_changed(self, 'assigned', None, user)
+            logger.debug('Assigned task: %s to user: %s', self.title, user)
         except Exception as e:
-            logging.error(f'Error assigning task {self.title} to user {user}: {e}')
+            logger.error('Error assigning task %s to user %s: %s', self.title, user, e)
 
     def unassign_task(self, user: str):
         try:
             if user in self.assigned_to:
                 self.assigned_to.remove(user)
-                logging.info(f'Unassigned task: {self.title} from user: {user}')
+                if self.observer is not None:
+                    self.observer.task_changed(self, 'unassigned', user, None)
+                logger.debug('Unassigned task: %s from user: %s', self.title, user)
         except Exception as e:
-            logging.error(f'Error unassigning task {self.title} from user {user}: {e}')
+            logger.error('Error unassigning task %s from user %s: %s', self.title, user, e)
 
     def change_priority(self, new_priority: Priority):
         try:
-            logging.info(f'Changing priority of task: {self.title} from {self.priority.name} to {new_priority.name}')
+            logger.debug('Changing priority of task: %s from %s to %s', self.title, self.priority.name, new_priority.name)
+            old_priority = self.priority
             self.priority = new_priority
+            if self.observer is not None:
+                self.observer.task_changed(self, 'priority', old_priority, new_priority)
         except Exception as e:
-            logging.error(f'Error changing priority of task {self.title}: {e}')
+            logger.error('Error changing priority of task %s: %s', self.title, e)
 
     def change_status(self, new_status: Status):
         try:
-            logging.info(f'Changing status of task: {self.title} from {self.status.name} to {new_status.name}')
+            logger.debug('Changing status of task: %s from %s to %s', self.title, self.status.name, new_status.name)
+            old_status = self.status
             self.status = new_status
+            if self.observer is not None:
+                self.observer.task_changed(self, 'status', old_status, new_status)
         except Exception as e:
-            logging.error(f'Error changing status of task {self.title}: {e}')
+            logger.error('Error changing status of task %s: %s', self.title, e)
 
     def add_comment(self, comment: str, user: str):
         try:
-            self.comments.append({"user": user, "comment": comment})
-            logging.info(f'User: {user} added comment to task: {self.title}')
+            if self._comments is None:
+                self._comments = []
+            user = sys.intern(user)
+            self._comments.append((user, comment))
+            if self.observer is not None:
+                self.observer.task_changed(self, 'comment', None, user)
+            logger.debug('User: %s added comment to task: %s', user, self.title)
         except Exception as e:
-            logging.error(f'Error adding comment to task {self.title} by user {user}: {e}')
+            logger.error('Error adding comment to task %s by user %s: %s', self.title, user, e)
+
+def _mutates(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._state_lock.read():
+            result = method(self, *args, **kwargs)
+        self.events.flush()
+        if self._compact_due and self.auto_compact:
+            self.compact()
+        return result
+    return wrapper
+
+def _project_title_getter(method):
+    # The project is the method's first argument; task operations may pass
+    # None there, in which case the task's own project is locked.
+    names = method.__code__.co_varnames[1:method.__code__.co_argcount]
+
+    def project_title_of(self, args, kwargs) -> Optional[str]:
+        bound = dict(zip(names, args))
+        bound.update(kwargs)
+        project_title = bound.get(names[0])
+        if project_title is None and bound.get('task_id') is not None:
+            return self.get_task_project(bound['task_id'])
+        return project_title
+    return project_title_of
+
+def _writes_project(method):
+    project_title_of = _project_title_getter(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        lock = self._project_lock(project_title_of(self, args, kwargs))
+        with self._state_lock.read(), lock.write():
+            result = method(self, *args, **kwargs)
+        self.events.flush()
+        if self._compact_due and self.auto_compact:
+            self.compact()
+        return result
+    return wrapper
+
+def _reads_project(method):
+    project_title_of = _project_title_getter(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._project_lock(project_title_of(self, args, kwargs)).read():
+            return method(self, *args, **kwargs)
+    return wrapper
 
 class ProjectManager:
-    def __init__(self):
+    # Locking: every mutation holds the manager-wide state lock in shared
+    # mode plus its project's write lock, so different projects change in
+    # parallel while save_data/compact take the state lock exclusively for
+    # a consistent snapshot. Registry dicts and the task index are guarded
+    # by _registry_lock, which is only held for short sections and never
+    # while acquiring another lock.
+    def __init__(self, journal: Optional[Journal] = None, storage: Optional[StorageBackend] = None):
         try:
+            self.journal = journal
+            self.storage = storage if storage is not None else JSONStorage()
+            self._replaying = False
+            self._compact_due = False
+            # Compact as soon as the journal needs it, in the mutating call;
+            # callers that schedule compaction themselves turn this off.
+            self.auto_compact = True
+            self._state_lock = RWLock()
+            self._registry_lock = threading.RLock()
+            self._project_locks = {}
             self.users = {}
             self.projects = {}
-            logging.info('Initialized ProjectManager')
+            self.tasks = {}
+            self.task_projects = {}
+            self.index = TaskIndex()
+            self.memberships = MembershipIndex()
+            self.history = HistoryLog()
+            self.analytics = BoardAnalytics(Status.DONE)
+            self.search_index = SearchIndex()
+            self.archive = ColdStore()
+            # Every recorded mutation is published here; see _publish.
+            self.events = EventBus()
+            # Wall-clock time of the journal record being replayed.
+            self._event_time = None
+            logger.info('Initialized ProjectManager')
         except Exception as e:
-            logging.error(f'Error initializing ProjectManager: {e}')
+            logger.error('Error initializing ProjectManager: %s', e)
+
+    def _project_lock(self, project_title: Optional[str]) -> RWLock:
+        with self._registry_lock:
+            lock = self._project_locks.get(project_title)
+            if lock is None:
+                lock = self._project_locks[project_title] = RWLock()
+            return lock
 
-    def create_user(self, username: str, password: str, email: str):
+    @_mutates
+    def create_user(self, username: str, password: Optional[str], email: str, password_hash: Optional[str] = None):
+        # password is always hashed; callers that hashed it already (the
+        # shard router) pass password_hash instead. The journal records the
+        # hash, which replay passes back in as the password.
         try:
-            if username not in self.users:
-                self.users[username] = User(username, password, email)
-                logging.info(f'Created user: {username}')
+            if username in self.users:
+                return
+            if password_hash is not None:
+                password = password_hash
+            elif not self._replaying:
+                password = hash_password(password)
+            with self._registry_lock:
+                created = username not in self.users
+                if created:
+                    self.users[username] = User(username, password, email)
+            if created:
+                self._record('create_user', username, password, email)
+                logger.info('Created user: %s', username)
         except Exception as e:
-            logging.error(f'Error creating user {username}: {e}')
+            logger.error('Error creating user %s: %s', username, e)
 
+    @_mutates
+    def set_password_hash(self, username: str, password_hash: str):
+        try:
+            user = self.users.get(username)
+            if user is not None:
+                user.password = password_hash
+                self._record('set_password_hash', username, password_hash)
+                logger.info('Updated password of user: %s', username)
+        except Exception as e:
+            logger.error('Error updating password of user %s: %s', username, e)
+
+    @_writes_project
     def create_project(self, title: str, creator: str):
         try:
             if creator in self.users:
-                self.projects[title] = Project(title, creator)
-                logging.info(f'Created project: {title} by creator: {creator}')
+                with self._registry_lock:
+                    if title in self.projects:
+                        # Journals written before titles had to be unique
+                        # may still re-create a project; only replay may.
+                        if not self._replaying:
+                            raise PermissionDenied(f'project {title} already exists')
+                        self._drop_project(self.projects[title])
+                    project = self.projects[title] = Project(title, creator)
+                    self.memberships.add_project(title, project.members)
+                self._record('create_project', title, creator)
+                logger.info('Created project: %s by creator: %s', title, creator)
         except Exception as e:
-            logging.error(f'Error creating project {title}: {e}')
+            logger.error('Error creating project %s: %s', title, e)
 
-    def add_member_to_project(self, project_title: str, member: str):
+    @_writes_project
+    def add_member_to_project(self, project_title: str, member: str, actor: Optional[str] = None):
         try:
             if project_title in self.projects:
-                self.projects[project_title].add_member(member)
-                logging.info(f'Added member: {member} to project: {project_title}')
+                project = self.projects[project_title]
+                self._authorize(project, actor, MANAGING_ROLES, 'add members')
+                if member in project.members:
+                    return
+                project.add_member(member)
+                with self._registry_lock:
+                    self.memberships.add(project_title, member, project.members[member])
+                self._record('add_member_to_project', project_title, member)
+                logger.info('Added member: %s to project: %s', member, project_title)
         except Exception as e:
-            logging.error(f'Error adding member {member} to project {project_title}: {e}')
+            logger.error('Error adding member %s to project %s: %s', member, project_title, e)
 
-    def remove_member_from_project(self, project_title: str, member: str):
+    @_writes_project
+    def remove_member_from_project(self, project_title: str, member: str, actor: Optional[str] = None):
         try:
             if project_title in self.projects:
-                self.projects[project_title].remove_member(member)
-                logging.info(f'Removed member: {member} from project: {project_title}')
+                project = self.projects[project_title]
+                self._authorize(project, actor, MANAGING_ROLES, 'remove members')
+                if project.members.get(member) is Role.CREATOR:
+                    raise PermissionDenied(f'the creator of {project_title} cannot be removed')
+                if member not in project.members:
+                    return
+                project.remove_member(member)
+                project.materialize()
+                with self._registry_lock:
+                    self.memberships.remove(project_title, member)
+                    assigned = [task for task in self.index.by_assignee.get(member, ())
+                                if self.task_projects.get(task.key) == project_title]
+                # Former members keep no assignments in the project; replay
+                # repeats this, so only the removal itself is recorded.
+                for task in assigned:
+                    while member in task.assigned_to:
+                        task.unassign_task(member)
+                self._record('remove_member_from_project', project_title, member)
+                logger.info('Removed member: %s from project: %s', member, project_title)
         except Exception as e:
-            logging.error(f'Error removing member {member} from project {project_title}: {e}')
+            logger.error('Error removing member %s from project %s: %s', member, project_title, e)
 
-    def delete_project(self, project_title: str):
+    @_writes_project
+    def set_member_role(self, project_title: str, member: str, role: Role, actor: Optional[str] = None):
         try:
             if project_title in self.projects:
-                del self.projects[project_title]
-                logging.info(f'Deleted project: {project_title}')
+                project = self.projects[project_title]
+                self._authorize(project, actor, MANAGING_ROLES, 'change roles')
+                if role is Role.CREATOR or project.members.get(member) in (None, Role.CREATOR):
+                    raise PermissionDenied(f'the role of {member} in {project_title} cannot become {role.name}')
+                project.set_role(member, role)
+                with self._registry_lock:
+                    self.memberships.add(project_title, member, role)
+                self._record('set_member_role', project_title, member, role.name)
+                logger.info('Set role of member: %s in project: %s to %s', member, project_title, role.name)
         except Exception as e:
-            logging.error(f'Error deleting project {project_title}: {e}')
+            logger.error('Error setting role of member %s in project %s: %s', member, project_title, e)
 
-    def create_task(self, project_title: str, title: str, description: str, assigned_to: List[str],
-                    priority: Priority = Priority.LOW, status: Status = Status.BACKLOG):
+    def projects_of_user(self, username: str) -> Dict[str, str]:
+        with self._registry_lock:
+            projects = self.memberships.projects_of(username)
+        return {title: role.name for title, role in projects.items()}
+
+    def _authorize(self, project: Project, actor: Optional[str], roles=None, action: str = 'change this project'):
+        if not self._replaying:
+            authorize(project.members, actor, roles, f'{action} in {project.title}')
+
+    def _check_assignee(self, project: Project, user: str):
+        if not self._replaying and user not in project.members:
+            raise PermissionDenied(f'{user} is not a member of {project.title}')
+
+    @_writes_project
+    def delete_project(self, project_title: str, actor: Optional[str] = None):
         try:
             if project_title in self.projects:
-                task = Task(title, description, assigned_to, priority, status)
-                self.projects[project_title].tasks.append(task)
-                logging.info(f'Created task: {title} in project: {project_title}')
+                self._authorize(self.projects[project_title], actor, (Role.CREATOR,), 'delete the project')
+                with self._registry_lock:
+                    self._drop_project(self.projects.pop(project_title))
+                self._record('delete_project', project_title)
+                logger.info('Deleted project: %s', project_title)
         except Exception as e:
-            logging.error(f'Error creating task {title} in project {project_title}: {e}')
+            logger.error('Error deleting project %s: %s', project_title, e)
 
-    def assign_task_to_member(self, project_title: str, task_id: str, user: str):
+    @_writes_project
+    def create_task(self, project_title: str, title: str, description: str, assigned_to: List[str],
+                    priority: Priority = Priority.LOW, status: Status = Status.BACKLOG, task_id: Optional[str] = None,
+                    actor: Optional[str] = None):
         try:
             if project_title in self.projects:
-                for task in self.projects[project_title].tasks:
-                    if task.id == task_id:
-                        task.assign_task(user)
-                        logging.info(f'Assigned task: {task_id} to user: {user} in project: {project_title}')
+                project = self.projects[project_title]
+                self._authorize(project, actor, None, 'create tasks')
+                assigned_to = list(dict.fromkeys(assigned_to))
+                for user in assigned_to:
+                    self._check_assignee(project, user)
+                if task_id is not None:
+                    key = task_key(task_id)
+                    if key in self.task_projects or key in self.archive:
+                        raise ValueError(f'task {task_id} already exists')
+                task = Task(title, description, assigned_to, priority, status, task_id)
+                if self._event_time is not None:
+                    task.created = self._event_time
+                project.tasks.append(task)
+                self._register_task(project_title, task)
+                self._record('create_task', project_title, title, description, assigned_to,
+                             priority.name, status.name, task.id)
+                self._store_event(task, EventKind.CREATED, 0, status.value, None, task.created)
+                logger.info('Created task: %s in project: %s', title, project_title)
+                return task
         except Exception as e:
-            logging.error(f'Error assigning task {task_id} to user {user} in project {project_title}: {e}')
+            logger.error('Error creating task %s in project %s: %s', title, project_title, e)
 
-    def unassign_task_from_member(self, project_title: str, task_id: str, user: str):
+    @_writes_project
+    def create_tasks_bulk(self, project_title: str, tasks: Iterable[Dict[str, Any]], batch_size: int = 1000,
+                          actor: Optional[str] = None) -> int:
+        created = 0
         try:
-            if project_title in self.projects:
-                for task in self.projects[project_title].tasks:
-                    if task.id == task_id:
-                        task.unassign_task(user)
-                        logging.info(f'Unassigned task: {task_id} from user: {user} in project: {project_title}')
+            project = self.projects.get(project_title)
+            if project is None:
+                logger.error('Project %s does not exist', project_title)
+                return 0
+            self._authorize(project, actor, None, 'create tasks')
+            iterator = iter(tasks)
+            while True:
+                batch = list(itertools.islice(iterator, batch_size))
+                if not batch:
+                    break
+                created += self._create_task_batch(project, batch)
+        except Exception as e:
+            logger.error('Error creating tasks in bulk in project %s: %s', project_title, e)
+        return created
+
+    def _create_task_batch(self, project: Project, records: List[Dict[str, Any]]) -> int:
+        # Like create_task, tasks with an assignee who is not a member are
+        # rejected; replay recreates whatever was recorded.
+        members = project.members if not self._replaying else None
+        new_tasks = []
+        rejected = 0
+        for record in records:
+            try:
+                assigned_to = list(dict.fromkeys(record.get("assigned_to", [])))
+                if members is not None and not all(user in members for user in assigned_to):
+                    rejected += 1
+                    continue
+                priority = record.get("priority") or Priority.LOW
+                status = record.get("status") or Status.BACKLOG
+                task = Task.restore(record.get("id"), record["title"], record.get("description", ""), assigned_to,
+                                    priority if isinstance(priority, Priority) else Priority[priority.upper()],
+                                    status if isinstance(status, Status) else Status[status.upper()],
+                                    record.get("comments"), record.get("created"), record.get("history"))
+            except (KeyError, TypeError, AttributeError):
+                rejected += 1
+                continue
+            if task.key in self.task_projects or task.key in self.archive:
+                rejected += 1
+                continue
+            new_tasks.append(task)
+        with self.batch():
+            project.tasks.extend(new_tasks)
+            for task in new_tasks:
+                self._register_task(project.title, task)
+            if new_tasks and (self.journal is not None or self.storage.incremental or self.events.active):
+                self._record('create_tasks_bulk', project.title, [self._task_record(task) for task in new_tasks])
+        logger.info('Created %s tasks in project: %s (%s rejected)', len(new_tasks), project.title, rejected)
+        return len(new_tasks)
+
+    def _task_data(self, task: Task) -> Dict[str, Any]:
+        data = {
+            "title": task.title,
+            "description": task.description,
+            "assigned_to": task.assigned_to,
+            "priority": task.priority.name,
+            "status": task.status.name,
+            "comments": task.comments,
+            "created": task.created
+        }
+        history = self.history.columns(task)
+        if history is not None:
+            data["history"] = history
+        return data
+
+    def _task_record(self, task: Task) -> Dict[str, Any]:
+        return dict(self._task_data(task), id=task.id)
+
+    def iter_task_records(self, project_title: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        titles = [project_title] if project_title is not None else list(self.projects)
+        for title in titles:
+            with self._project_lock(title).read():
+                project = self.projects.get(title)
+                if project is None:
+                    continue
+                if project.pending_tasks is not None:
+                    for entry in project.pending_tasks:
+                        for task_id, data in entry.items():
+                            yield dict(data, id=task_id, project=title)
+                else:
+                    for task in project.tasks:
+                        yield dict(self._task_record(task), project=title)
+                for record in self.archive.records(title):
+                    yield dict(record, project=title)
+
+    def export_board(self, path: str, project_title: Optional[str] = None, fmt: Optional[str] = None) -> int:
+        try:
+            count = write_board(path, self.iter_task_records(project_title), fmt)
+            logger.info('Exported %s tasks to %s', count, path)
+            return count
         except Exception as e:
-            logging.error(f'Error unassigning task {task_id} from user {user} in project {project_title}: {e}')
+            logger.error('Error exporting tasks to %s: %s', path, e)
+            return 0
 
-    def change_task_priority(self, project_title: str, task_id: str, new_priority: Priority):
+    def import_board(self, path: str, project_title: Optional[str] = None, creator: Optional[str] = None,
+                     fmt: Optional[str] = None, batch_size: int = 1000, actor: Optional[str] = None) -> int:
+        imported = 0
         try:
-            if project_title in self.projects:
-                for task in self.projects[project_title].tasks:
-                    if task.id == task_id:
-                        task.change_priority(new_priority)
-                        logging.info(f'Changed priority of task: {task_id} to {new_priority.name} in project: {project_title}')
+            records = read_board(path, fmt)
+            for title, group in itertools.groupby(records, key=lambda record: project_title or record.get("project")):
+                if title not in self.projects and creator is not None:
+                    self.create_project(title, creator)
+                imported += self.create_tasks_bulk(title, group, batch_size, actor=actor)
+            logger.info('Imported %s tasks from %s', imported, path)
         except Exception as e:
-            logging.error(f'Error changing priority of task {task_id} to {new_priority.name} in project {project_title}: {e}')
+            logger.error('Error importing tasks from %s: %s', path, e)
+        return imported
+
+    def find_task(self, task_id: str, project_title: Optional[str] = None) -> Optional[Task]:
+        key = task_key(task_id)
+        task = self._task_by_key(key)
+        if task is not None and project_title is not None and self.task_projects[key] != project_title:
+            return None
+        return task
+
+    def get_task_project(self, task_id: str) -> Optional[str]:
+        return self.task_projects.get(task_key(task_id))
+
+    def _register_task(self, project_title: str, task: Task):
+        self.history.adopt(task)
+        completed = self.history.entered(task, EventKind.STATUS, Status.DONE.value) if task._history else ()
+        if task.key not in self.search_index:
+            # Tasks loaded alongside a persisted search index are already in it.
+            self.search_index.add(task.key, task.title, self._task_texts(task))
+        with self._registry_lock:
+            self.tasks[task.key] = task
+            self.task_projects[task.key] = project_title
+            self.index.add(project_title, task)
+            self.analytics.add(project_title, task, completed)
+        task.observer = self
+
+    @staticmethod
+    def _task_texts(task: Task) -> List[str]:
+        return [task.description] + [comment for _, comment in task._comments or ()]
+
+    def _load_all_tasks(self):
+        for project in self.projects.values():
+            project.materialize()
+
+    def _unregister_task(self, project_title: str, task: Task):
+        # Callers hold _registry_lock.
+        self.search_index.remove(task.key)
+        self.tasks.pop(task.key, None)
+        self.task_projects.pop(task.key, None)
+        self.index.remove(project_title, task)
+        self.analytics.remove(project_title, task)
+        self.history.release(task)
+        task.observer = None
+
+    def _unregister_tasks(self, project: Project):
+        # Callers hold _registry_lock.
+        if project.pending_tasks is not None:
+            for entry in project.pending_tasks:
+                for task_id in entry:
+                    self.task_projects.pop(task_key(task_id), None)
+                    self.search_index.remove(task_key(task_id))
+            project.pending_tasks = None
+        for task in project.tasks:
+            self._unregister_task(project.title, task)
+        self.analytics.drop_project(project.title)
 
-    def change_task_status(self, project_title: str, task_id: str, new_status: Status):
+    def _drop_project(self, project: Project):
+        # Callers hold _registry_lock. Everything the project owns goes with
+        # it: its tasks and their index, search and history entries, its
+        # archived tasks and its members' memberships.
+        self._unregister_tasks(project)
+        self.memberships.remove_project(project.title, project.members)
+        self.archive.drop_project(project.title)
+        project.delete_project()
+
+    _EVENT_KINDS = {
+        'status': EventKind.STATUS,
+        'priority': EventKind.PRIORITY,
+        'assigned': EventKind.ASSIGNED,
+        'unassigned': EventKind.UNASSIGNED,
+        'comment': EventKind.COMMENT,
+    }
+
+    def task_changed(self, task: Task, field: str, old, new):
+        kind = self._EVENT_KINDS[field]
+        if kind in (EventKind.STATUS, EventKind.PRIORITY):
+            codes, user = (old.value, new.value), None
+        else:
+            codes, user = (0, 0), new if new is not None else old
+        when = self.history.append(task, kind, *codes, user, self._event_time)
+        with self._registry_lock:
+            project_title = self.task_projects.get(task.key)
+            if project_title is not None:
+                self.index.update(project_title, task, field, old, new)
+                self.analytics.update(project_title, task, field, old, new, when)
+        if kind == EventKind.COMMENT:
+            self.search_index.add_text(task.key, task._comments[-1][1])
+        self._store_event(task, kind, *codes, user, when)
+
+    def _store_event(self, task: Task, kind: EventKind, old: int, new: int, user: Optional[str], when: float):
+        # History is rebuilt by replay, so it goes to incremental storage
+        # but never into the journal.
+        if not self._replaying and self.storage.incremental:
+            self.storage.apply('record_event', (task.id, when, int(kind), old, new, user))
+
+    @_writes_project
+    def assign_task_to_member(self, project_title: Optional[str], task_id: str, user: str,
+                              actor: Optional[str] = None):
         try:
-            if project_title in self.projects:
-                for task in self.projects[project_title].tasks:
-                    if task.id == task_id:
-                        task.change_status(new_status)
-                        logging.info(f'Changed status of task: {task_id} to {new_status.name} in project: {project_title}')
+            task = self.find_task(task_id, project_title)
+            if task is not None:
+                project = self.projects[self.task_projects[task.key]]
+                self._authorize(project, actor, None, 'assign tasks')
+                self._check_assignee(project, user)
+                if user in task.assigned_to:
+                    return
+                task.assign_task(user)
+                self._record('assign_task_to_member', project_title, task_id, user)
+                logger.info('Assigned task: %s to user: %s in project: %s', task_id, user, self.task_projects[task.key])
         except Exception as e:
-            logging.error(f'Error changing status of task {task_id} to {new_status.name} in project {project_title}: {e}')
+            logger.error('Error assigning task %s to user %s in project %s: %s', task_id, user, project_title, e)
 
-    def add_comment_to_task(self, project_title: str, task_id: str, comment: str, user: str):
+    @_writes_project
+    def unassign_task_from_member(self, project_title: Optional[str], task_id: str, user: str,
+                                  actor: Optional[str] = None):
         try:
-            if project_title in self.projects:
-                for task in self.projects[project_title].tasks:
-                    if task.id == task_id:
-                        task.add_comment(comment, user)
-                        logging.info(f'Added comment to task: {task_id} by user: {user} in project: {project_title}')
+            task = self.find_task(task_id, project_title)
+            if task is not None:
+                self._authorize(self.projects[self.task_projects[task.key]], actor, None, 'unassign tasks')
+                task.unassign_task(user)
+                self._record('unassign_task_from_member', project_title, task_id, user)
+                logger.info('Unassigned task: %s from user: %s in project: %s', task_id, user, self.task_projects[task.key])
+        except Exception as e:
+            logger.error('Error unassigning task %s from user %s in project %s: %s', task_id, user, project_title, e)
+
+    @_writes_project
+    def change_task_priority(self, project_title: Optional[str], task_id: str, new_priority: Priority,
+                             actor: Optional[str] = None):
+        try:
+            task = self.find_task(task_id, project_title)
+            if task is not None:
+                self._authorize(self.projects[self.task_projects[task.key]], actor, None, 'change task priorities')
+                task.change_priority(new_priority)
+                self._record('change_task_priority', project_title, task_id, new_priority.name)
+                logger.info('Changed priority of task: %s to %s in project: %s', task_id, new_priority.name, self.task_projects[task.key])
+        except Exception as e:
+            logger.error('Error changing priority of task %s to %s in project %s: %s', task_id, new_priority.name, project_title, e)
+
+    @_writes_project
+    def change_task_status(self, project_title: Optional[str], task_id: str, new_status: Status,
+                           actor: Optional[str] = None):
+        try:
+            task = self.find_task(task_id, project_title)
+            if task is not None:
+                self._authorize(self.projects[self.task_projects[task.key]], actor, None, 'change task statuses')
+                task.change_status(new_status)
+                self._record('change_task_status', project_title, task_id, new_status.name)
+                logger.info('Changed status of task: %s to %s in project: %s', task_id, new_status.name, self.task_projects[task.key])
+        except Exception as e:
+            logger.error('Error changing status of task %s to %s in project %s: %s', task_id, new_status.name, project_title, e)
+
+    @_writes_project
+    def add_comment_to_task(self, project_title: Optional[str], task_id: str, comment: str, user: str,
+                            actor: Optional[str] = None):
+        try:
+            task = self.find_task(task_id, project_title)
+            if task is not None:
+                self._authorize(self.projects[self.task_projects[task.key]], actor, None, 'comment on tasks')
+                task.add_comment(comment, user)
+                self._record('add_comment_to_task', project_title, task_id, comment, user)
+                logger.info('Added comment to task: %s by user: %s in project: %s', task_id, user, self.task_projects[task.key])
+        except Exception as e:
+            logger.error('Error adding comment to task %s by user %s in project %s: %s', task_id, user, project_title, e)
+
+    @_writes_project
+    def archive_tasks(self, project_title: str, task_ids: List[str], actor: Optional[str] = None) -> int:
+        # Moves tasks out of the hot task list, indexes and search into the
+        # cold store. Returns the number of tasks archived.
+        try:
+            project = self.projects.get(project_title)
+            if project is None:
+                logger.error('Project %s does not exist', project_title)
+                return 0
+            self._authorize(project, actor, None, 'archive tasks')
+            moving = {}
+            for task_id in task_ids:
+                task = self.find_task(task_id, project_title)
+                if task is not None:
+                    moving[task.key] = task
+            if not moving:
+                return 0
+            records = [(key, self._task_record(task)) for key, task in moving.items()]
+            with self._registry_lock:
+                for task in moving.values():
+                    self._unregister_task(project_title, task)
+                project.tasks = [task for task in project.tasks if task.key not in moving]
+                chunks = self.archive.add(project_title, records)
+            self._record('archive_tasks', project_title, [record["id"] for _, record in records])
+            for number in chunks:
+                self._store_archive_chunk(project_title, number)
+            logger.info('Archived %s tasks of project: %s', len(records), project_title)
+            return len(records)
+        except Exception as e:
+            logger.error('Error archiving tasks of project %s: %s', project_title, e)
+            return 0
+
+    def archive_stale_tasks(self, project_title: Optional[str] = None, done_days: float = 30,
+                            actor: Optional[str] = None) -> int:
+        # Archives ARCHIVED tasks, and DONE tasks that have been done for more
+        # than done_days, so the hot working set only holds active work. DONE
+        # tasks from older files have no history or created time; their age
+        # is unknown, so they stay.
+        archived = 0
+        try:
+            cutoff = time.time() - done_days * 86400
+            for title in [project_title] if project_title is not None else list(self.projects):
+                with self._project_lock(title).read():
+                    project = self.projects.get(title)
+                    if project is None:
+                        continue
+                    project.materialize()
+                    with self._registry_lock:
+                        stale = list(self.index.by_status.get((title, Status.ARCHIVED), ()))
+                        done = list(self.index.by_status.get((title, Status.DONE), ()))
+                    for task in done:
+                        finished = self.history.entered(task, EventKind.STATUS, Status.DONE.value)
+                        done_since = finished[-1] if finished else task.created
+                        if done_since and done_since < cutoff:
+                            stale.append(task)
+                if stale:
+                    archived += self.archive_tasks(title, [task.id for task in stale], actor=actor)
+            if archived:
+                with self._state_lock.write():
+                    self._reclaim()
         except Exception as e:
-            logging.error(f'Error adding comment to task {task_id} by user {user} in project {project_title}: {e}')
+            logger.error('Error archiving stale tasks of project %s: %s', project_title, e)
+        return archived
 
-    def view_tasks_in_project(self, project_title: str) -> List[Dict[str, Any]]:
+    @_writes_project
+    def unarchive_task(self, project_title: str, task_id: str, actor: Optional[str] = None) -> Optional[Task]:
+        try:
+            key = task_key(task_id)
+            project = self.projects.get(project_title)
+            if project is None or self.archive.project_of(key) != project_title:
+                logger.error('Task %s is not archived in project %s', task_id, project_title)
+                return None
+            self._authorize(project, actor, None, 'unarchive tasks')
+            project.materialize()
+            with self._registry_lock:
+                _, number, record = self.archive.remove(key)
+            task = Task.from_data(record["id"], record)
+            project.tasks.append(task)
+            self._register_task(project_title, task)
+            self._record('unarchive_task', project_title, task_id)
+            if not self._replaying and self.storage.incremental:
+                # The journal replays unarchive_task against its own archive;
+                # incremental storage needs the task itself back.
+                self.storage.apply('create_tasks_bulk', (project_title, [record]))
+            self._store_archive_chunk(project_title, number)
+            logger.info('Unarchived task: %s in project: %s', task_id, project_title)
+            return task
+        except Exception as e:
+            logger.error('Error unarchiving task %s in project %s: %s', task_id, project_title, e)
+            return None
+
+    def _store_archive_chunk(self, project_title: str, number: int):
+        if not self._replaying and self.storage.incremental:
+            self.storage.apply('store_archive_chunk', (project_title, number,
+                                                       self.archive.chunk_data(project_title, number, self._task_id)))
+
+    @staticmethod
+    def _task_id(key) -> str:
+        return str(uuid.UUID(bytes=key)) if isinstance(key, bytes) else key
+
+    def _archived_task(self, task_id: str, project_title: Optional[str] = None) -> Optional[Task]:
+        # A detached copy of an archived task, for reading only.
+        found = self.archive.get(task_key(task_id))
+        if found is None or (project_title is not None and found[0] != project_title):
+            return None
+        return Task.from_data(found[1]["id"], found[1])
+
+    @_reads_project
+    def view_archived_tasks(self, project_title: str, fields: Optional[List[str]] = None, offset: int = 0,
+                            limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        try:
+            records = itertools.islice(self.archive.records(project_title), offset,
+                                       None if limit is None else offset + limit)
+            return [self._task_row(Task.from_data(record["id"], record), fields) for record in records]
+        except Exception as e:
+            logger.error('Error viewing archived tasks in project %s: %s', project_title, e)
+            return []
+
+    @_reads_project
+    def view_tasks_in_project(self, project_title: str, fields: Optional[List[str]] = None, offset: int = 0,
+                              limit: Optional[int] = None, order_by: str = 'created') -> List[Dict[str, Any]]:
         try:
             if project_title in self.projects:
-                tasks_info = []
-                for task in self.projects[project_title].tasks:
-                    tasks_info.append({
-                        "Task ID": task.id,
-                        "Title": task.title,
-                        "Description": task.description,
-                        "Priority": task.priority.name,
-                        "Status": task.status.name
-                    })
-                logging.info(f'Viewed tasks in project: {project_title}')
+                tasks = self._ordered_tasks(self.projects[project_title], order_by, None,
+                                            None if limit is None else offset + limit)
+                tasks_info = [self._task_row(task, fields) for task in itertools.islice(
+                    tasks, offset, None if limit is None else offset + limit)]
+                logger.info('Viewed tasks in project: %s', project_title)
                 return tasks_info
             else:
-                logging.error(f'Project {project_title} does not exist')
+                logger.error('Project %s does not exist', project_title)
+                return []
+        except Exception as e:
+            logger.error('Error viewing tasks in project %s: %s', project_title, e)
+            return []
+
+    _ROW_FIELDS = ("Task ID", "Title", "Description", "Priority", "Status")
+    _FIELD_GETTERS = {
+        "Task ID": lambda task: task.id,
+        "Title": lambda task: task.title,
+        "Description": lambda task: task.description,
+        "Assigned To": lambda task: list(task.assigned_to),
+        "Priority": lambda task: task.priority.name,
+        "Status": lambda task: task.status.name,
+        "Comments": lambda task: task.comments,
+    }
+
+    @classmethod
+    def _task_row(cls, task: Task, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        getters = cls._FIELD_GETTERS
+        return {field: getters[field](task) for field in (fields or cls._ROW_FIELDS)}
+
+    def _ordered_tasks(self, project: Project, order_by: str = 'created', after: Optional[tuple] = None,
+                       limit: Optional[int] = None) -> Iterator[Task]:
+        # Orders are 'created', 'priority' or 'status', each falling back to
+        # creation order; after is the sort key of the last task already seen.
+        tasks = project.tasks
+        if order_by == 'created':
+            start = bisect.bisect_right(tasks, after[-1], key=lambda task: task.seq) if after else 0
+            return (tasks[i] for i in range(start, len(tasks)))
+        if order_by == 'priority':
+            buckets, members = self.index.by_priority, Priority
+        elif order_by == 'status':
+            buckets, members = self.index.by_status, Status
+        else:
+            raise ValueError(f'Unknown task order: {order_by}')
+        return self._ordered_buckets(project.title, buckets, members, after, limit)
+
+    @staticmethod
+    def _ordered_buckets(project_title: str, buckets, members, after: Optional[tuple], limit: Optional[int]):
+        for member in members:
+            if after and member.value < after[0]:
+                continue
+            min_seq = after[1] if after and member.value == after[0] else -1
+            candidates = (task for task in buckets.get((project_title, member), ()) if task.seq > min_seq)
+            if limit is None:
+                yield from sorted(candidates, key=lambda task: task.seq)
+                continue
+            page = heapq.nsmallest(limit, candidates, key=lambda task: task.seq)
+            yield from page
+            limit -= len(page)
+            if limit <= 0:
+                return
+
+    @staticmethod
+    def _task_sort_key(task: Task, order_by: str) -> tuple:
+        if order_by == 'priority':
+            return task.priority.value, task.seq
+        if order_by == 'status':
+            return task.status.value, task.seq
+        return task.seq,
+
+    @_reads_project
+    def view_tasks_page(self, project_title: str, limit: int = 50, cursor: Optional[str] = None,
+                        order_by: str = 'created', fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        # Cursors are opaque strings tied to this process's task sequence.
+        try:
+            if project_title not in self.projects:
+                logger.error('Project %s does not exist', project_title)
+                return {"tasks": [], "next_cursor": None}
+            after = None
+            if cursor is not None:
+                cursor_order, *key = cursor.split(':')
+                if cursor_order != order_by:
+                    raise ValueError(f'Cursor {cursor} does not belong to order {order_by}')
+                after = tuple(int(part) for part in key)
+            page = list(itertools.islice(
+                self._ordered_tasks(self.projects[project_title], order_by, after, limit + 1), limit + 1))
+            next_cursor = None
+            if len(page) > limit:
+                page = page[:limit]
+                next_cursor = ':'.join([order_by] + [str(part) for part in self._task_sort_key(page[-1], order_by)])
+            return {"tasks": [self._task_row(task, fields) for task in page], "next_cursor": next_cursor}
+        except Exception as e:
+            logger.error('Error paging tasks in project %s: %s', project_title, e)
+            return {"tasks": [], "next_cursor": None}
+
+    def iter_tasks_in_project(self, project_title: str, order_by: str = 'created',
+                              fields: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        # The order is fixed under the project's read lock; rows are built
+        # lazily afterwards, so callers may modify the board while streaming.
+        with self._project_lock(project_title).read():
+            if project_title not in self.projects:
+                logger.error('Project %s does not exist', project_title)
+                return
+            tasks = list(self._ordered_tasks(self.projects[project_title], order_by))
+        for task in tasks:
+            yield self._task_row(task, fields)
+
+    @_reads_project
+    def query_tasks(self, project_title: Optional[str] = None, status: Optional[Status] = None,
+                    priority: Optional[Priority] = None, assignee: Optional[str] = None) -> List[Dict[str, Any]]:
+        try:
+            if project_title is not None and project_title not in self.projects:
+                logger.error('Project %s does not exist', project_title)
                 return []
+            if project_title is not None:
+                self.projects[project_title].materialize()
+            else:
+                self._load_all_tasks()
+            with self._registry_lock:
+                if status is None and priority is None and assignee is None:
+                    tasks = self.projects[project_title].tasks if project_title is not None else list(self.tasks.values())
+                else:
+                    tasks = self.index.query(project_title, status, priority, assignee, self.task_projects)
+            return [self._task_row(task) for task in tasks]
         except Exception as e:
-            logging.error(f'Error viewing tasks in project {project_title}: {e}')
+            logger.error('Error querying tasks in project %s: %s', project_title, e)
             return []
 
-    def view_task_details(self, project_title: str, task_id: str) -> Dict[str, Any]:
+    def view_user_tasks(self, username: str, status: Optional[Status] = None) -> List[Dict[str, Any]]:
+        return self.query_tasks(status=status, assignee=username)
+
+    @_reads_project
+    def view_board(self, project_title: str) -> Dict[str, List[Dict[str, Any]]]:
         try:
-            if project_title in self.projects:
-                for task in self.projects[project_title].tasks:
-                    if task.id == task_id:
-                        logging.info(f'Viewed details of task: {task_id} in project: {project_title}')
-                        return {
-                            "Task ID": task.id,
-                            "Title": task.title,
-                            "Description": task.description,
-                            "Assigned To": task.assigned_to,
-                            "Priority": task.priority.name,
-                            "Status": task.status.name,
-                            "Comments": task.comments
-                        }
-                logging.error(f'Task {task_id} does not exist in project {project_title}')
+            if project_title not in self.projects:
+                logger.error('Project %s does not exist', project_title)
+                return {}
+            self.projects[project_title].materialize()
+            with self._registry_lock:
+                columns = {status: self.index.query(project_title, status=status) for status in Status}
+            return {status.name: [self._task_row(task) for task in tasks] for status, tasks in columns.items()}
+        except Exception as e:
+            logger.error('Error viewing board of project %s: %s', project_title, e)
+            return {}
+
+    def board_stats(self, project_title: Optional[str] = None) -> Dict[str, Any]:
+        # Read from the analytics counters plus the archive's per-chunk
+        # counts; task lists are only touched to load projects that have
+        # never been materialized.
+        try:
+            if project_title is not None and project_title not in self.projects:
+                logger.error('Project %s does not exist', project_title)
+                return {}
+            if project_title is not None:
+                self.projects[project_title].materialize()
+            else:
+                self._load_all_tasks()
+            with self._registry_lock:
+                total, statuses, priorities = self.analytics.board_counts(project_title)
+                archived, archived_statuses, archived_priorities = self.archive.counts(project_title)
+            statuses = {status.name: statuses.get(status, 0) + archived_statuses.get(status.name, 0)
+                        for status in Status}
+            total += archived
+            finished = statuses[Status.DONE.name] + statuses[Status.ARCHIVED.name]
+            return {
+                "tasks": total,
+                "archived": archived,
+                "status": statuses,
+                "priority": {priority.name: priorities.get(priority, 0) + archived_priorities.get(priority.name, 0)
+                             for priority in Priority},
+                "completion": round(100 * finished / total, 2) if total else 0.0
+            }
+        except Exception as e:
+            logger.error('Error computing stats of project %s: %s', project_title, e)
+            return {}
+
+    def user_stats(self, username: str) -> Dict[str, Any]:
+        # Counts the user's tasks that are not archived.
+        try:
+            self._load_all_tasks()
+            with self._registry_lock:
+                statuses = self.analytics.user_counts_of(username)
+            return {
+                "assigned": sum(statuses.values()),
+                "status": {status.name: statuses.get(status, 0) for status in Status},
+                "wip": statuses.get(Status.DOING, 0)
+            }
+        except Exception as e:
+            logger.error('Error computing stats of user %s: %s', username, e)
+            return {}
+
+    def throughput(self, project_title: Optional[str] = None, bucket_seconds: float = 86400,
+                   start: Optional[float] = None, end: Optional[float] = None) -> Dict[str, Any]:
+        # Tasks moved to DONE per bucket of [start, end), by default the
+        # seven days up to now.
+        try:
+            end = time.time() if end is None else end
+            start = end - 7 * 86400 if start is None else start
+            if project_title is not None:
+                self.projects[project_title].materialize()
+            else:
+                self._load_all_tasks()
+            with self._registry_lock:
+                times = self.analytics.completion_times(project_title)
+            return {
+                "start": start,
+                "bucket_seconds": bucket_seconds,
+                "counts": throughput_histogram(times, start, end, bucket_seconds)
+            }
+        except Exception as e:
+            logger.error('Error computing throughput of project %s: %s', project_title, e)
+            return {}
+
+    def search_tasks(self, query: str, project_title: Optional[str] = None, user: Optional[str] = None,
+                     limit: int = 20) -> List[Dict[str, Any]]:
+        # Terms must all match; term* matches by prefix and "a b" as a
+        # phrase. Results are ranked by idf-weighted term frequency, with
+        # title matches counting extra.
+        try:
+            if user is not None:
+                self._load_all_tasks()
+            task_projects = self.task_projects
+
+            def accept(key) -> bool:
+                if project_title is not None and task_projects.get(key) != project_title:
+                    return False
+                if user is not None:
+                    task = self.tasks.get(key)
+                    return task is not None and user in task.assigned_to
+                return key in task_projects
+
+            def verify(key, phrases: List[List[str]]) -> bool:
+                task = self._task_by_key(key)
+                if task is None:
+                    return False
+                tokens = tokenize(' '.join([task.title] + self._task_texts(task)))
+                return all(any(tokens[i:i + len(phrase)] == phrase for i in range(len(tokens) - len(phrase) + 1))
+                           for phrase in phrases)
+
+            results = []
+            for key, score in self.search_index.search(query, accept, verify, limit):
+                task = self._task_by_key(key)
+                if task is not None:
+                    results.append(dict(self._task_row(task), Score=round(score, 4)))
+            logger.info('Searched tasks for: %s (%s results)', query, len(results))
+            return results
+        except Exception as e:
+            logger.error('Error searching tasks for %s: %s', query, e)
+            return []
+
+    def _task_by_key(self, key) -> Optional[Task]:
+        task = self.tasks.get(key)
+        if task is None and key in self.task_projects:
+            # Owned by a project whose tasks have not been materialized yet.
+            self.projects[self.task_projects[key]].materialize()
+            task = self.tasks.get(key)
+        return task
+
+    _DETAIL_FIELDS = ("Task ID", "Title", "Description", "Assigned To", "Priority", "Status", "Comments")
+
+    @_reads_project
+    def view_task_details(self, project_title: Optional[str], task_id: str,
+                          fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        try:
+            if project_title is None or project_title in self.projects:
+                task = self.find_task(task_id, project_title) or self._archived_task(task_id, project_title)
+                if task is not None:
+                    logger.info('Viewed details of task: %s in project: %s', task_id,
+                                self.task_projects.get(task.key) or self.archive.project_of(task.key))
+                    return self._task_row(task, fields or self._DETAIL_FIELDS)
+                logger.error('Task %s does not exist in project %s', task_id, project_title)
                 return {}
             else:
-                logging.error(f'Project {project_title} does not exist')
+                logger.error('Project %s does not exist', project_title)
                 return {}
         except Exception as e:
-            logging.error(f'Error viewing details of task {task_id} in project {project_title}: {e}')
+            logger.error('Error viewing details of task %s in project %s: %s', task_id, project_title, e)
             return {}
 
+    @_reads_project
+    def view_task_history(self, project_title: Optional[str], task_id: str) -> List[Dict[str, Any]]:
+        try:
+            task = self.find_task(task_id, project_title) or self._archived_task(task_id, project_title)
+            if task is None:
+                logger.error('Task %s does not exist in project %s', task_id, project_title)
+                return []
+            events = []
+            for event in self.history.events(task):
+                if event["kind"] == 'STATUS':
+                    event["old"], event["new"] = Status(event["old"]).name, Status(event["new"]).name
+                elif event["kind"] == 'PRIORITY':
+                    event["old"], event["new"] = Priority(event["old"]).name, Priority(event["new"]).name
+                else:
+                    del event["old"], event["new"]
+                events.append(event)
+            return events
+        except Exception as e:
+            logger.error('Error viewing history of task %s in project %s: %s', task_id, project_title, e)
+            return []
+
+    @_reads_project
+    def view_board_at(self, project_title: str, when: float) -> Dict[str, List[Dict[str, Any]]]:
+        # The board as of the given time.time() timestamp. Each task answers
+        # from its own events, so the cost does not grow with the history of
+        # the rest of the board.
+        try:
+            if project_title not in self.projects:
+                logger.error('Project %s does not exist', project_title)
+                return {}
+            board = {status.name: [] for status in Status}
+            for task in self.projects[project_title].tasks:
+                if task.created > when:
+                    continue
+                status = Status(self.history.value_at(task, EventKind.STATUS, task.status.value, when))
+                priority = Priority(self.history.value_at(task, EventKind.PRIORITY, task.priority.value, when))
+                board[status.name].append(dict(self._task_row(task), Priority=priority.name, Status=status.name))
+            return board
+        except Exception as e:
+            logger.error('Error viewing board of project %s at %s: %s', project_title, when, e)
+            return {}
+
+    @_reads_project
+    def cycle_times(self, project_title: str, start: Status = Status.TODO,
+                    end: Status = Status.DONE) -> Dict[str, float]:
+        # Seconds from first entering start to last entering end, for tasks
+        # that are currently at end or later. Only those tasks' events are read.
+        try:
+            result = {}
+            for status in Status:
+                if status.value < end.value:
+                    continue
+                for task in list(self.index.by_status.get((project_title, status), ())):
+                    initial = self.history.value_at(task, EventKind.STATUS, task.status.value, task.created)
+                    seconds = self.history.cycle_time(task, start.value, end.value, task.created, initial)
+                    if seconds is not None:
+                        result[task.id] = seconds
+            return result
+        except Exception as e:
+            logger.error('Error computing cycle times of project %s: %s', project_title, e)
+            return {}
+
+    def _projects_data(self) -> Dict[str, Any]:
+        projects_data = {}
+        for title, project in self.projects.items():
+            if project.pending_tasks is not None:
+                # Never materialized since loading, so the raw entries are still current.
+                projects_data[title] = {
+                    "creator": project.creator,
+                    "members": list(project.members),
+                    "admins": self._admins_of(project),
+                    "tasks": list(project.pending_tasks)
+                }
+                continue
+            projects_data[title] = {
+                "creator": project.creator,
+                "members": list(project.members),
+                "admins": self._admins_of(project),
+                "tasks": [{task.id: self._task_data(task)} for task in project.tasks]
+            }
+        return projects_data
+
+    @staticmethod
+    def _admins_of(project: Project) -> List[str]:
+        return [user for user, role in project.members.items() if role is Role.ADMIN]
+
+    def _task_loaded(self, project_title: str, task: Task):
+        self._register_task(project_title, task)
+
+    def _restore_projects(self, projects_data):
+        for title, data in projects_data:
+            if title in self.projects:
+                self._drop_project(self.projects[title])
+            project = Project(title, data["creator"])
+            for member in data["members"]:
+                project.add_member(member)
+            for admin in data.get("admins", ()):
+                project.set_role(admin, Role.ADMIN)
+            self.memberships.add_project(title, project.members)
+            project.defer_tasks(data["tasks"], self._task_loaded)
+            self.projects[title] = project
+            # Storage that can list the keys or ids up front spares a pass over the tasks.
+            keys = data.get("task_keys")
+            if keys is None:
+                task_ids = data.get("task_ids")
+                if task_ids is None:
+                    task_ids = (task_id for entry in data["tasks"] for task_id in entry)
+                keys = map(task_key, task_ids)
+            for key in keys:
+                self.task_projects[key] = title
+
+    def _search_index_data(self) -> Dict[str, Any]:
+        return self.search_index.to_dict(self._task_id)
+
+    def _restore_search_index(self, data: Dict[str, Any]):
+        self.search_index = SearchIndex.from_dict(data, task_key)
+
+    def _archive_data(self) -> Dict[str, Any]:
+        return self.archive.to_dict(self._task_id)
+
+    def _restore_archive(self, data: Dict[str, Any]):
+        self.archive = ColdStore.from_dict(data, task_key)
+
+    def _reclaim(self):
+        # Callers hold the state lock exclusively. Once most of the history
+        # log or search index belongs to deleted or archived tasks, it is
+        # rebuilt from the live ones; the registries are copied too, since
+        # dicts never shrink by themselves.
+        stale_history = self.history.released * 2 > len(self.history)
+        stale_search = self.search_index.removed() * 2 > len(self.search_index.keys)
+        if stale_history:
+            # Readers may still load projects; holding _materialize_lock
+            # keeps any task from being adopted into the old columns while
+            # the live ones are collected and renumbered.
+            with _materialize_lock:
+                self.history.compact(list(self.tasks.values()))
+        if stale_search:
+            self.search_index.compact()
+        if stale_history or stale_search:
+            with self._registry_lock:
+                self.tasks = dict(self.tasks)
+                self.task_projects = dict(self.task_projects)
+                self.index.compact()
+
+    def _ensure_search_index(self):
+        # Without a stored index it is built from the stored task data, so
+        # projects that have not been used stay unloaded.
+        if len(self.search_index) or not self.task_projects:
+            return
+        for project in list(self.projects.values()):
+            if project.pending_tasks is not None:
+                for entry in project.pending_tasks:
+                    for task_id, data in entry.items():
+                        texts = [data["description"]] + [comment["comment"] for comment in data["comments"]]
+                        self.search_index.add(task_key(task_id), data["title"], texts)
+            else:
+                for task in project.tasks:
+                    if task.key not in self.search_index:
+                        self.search_index.add(task.key, task.title, self._task_texts(task))
+
+    def _restore_users(self, users):
+        for username, password, email in users:
+            self.users[username] = User(username, password, email)
+
+    def load_data(self):
+        try:
+            self.storage.load(self)
+            self._ensure_search_index()
+            logger.info('Loaded data from %s', type(self.storage).__name__)
+        except Exception as e:
+            logger.error('Error loading data: %s', e)
+
     def save_data(self):
         try:
-            with open("users.json", "w") as users_file:
-                json.dump({user.username: user.password for user in self.users.values()}, users_file, indent=4)
-            with open("projects.json", "w") as projects_file:
-                projects_data = {}
-                for title, project in self.projects.items():
-                    projects_data[title] = {
-                        "creator": project.creator,
-                        "members": project.members,
-                        "tasks": [{task.id: {
-                            "title": task.title,
-                            "description": task.description,
-                            "assigned_to": task.assigned_to,
-                            "priority": task.priority.name,
-                            "status": task.status.name,
-                            "comments": task.comments
-                        }} for task in project.tasks]
-                    }
-                json.dump(projects_data, projects_file, indent=4)
-            logging.info('Saved data to users.json and projects.json')
-        except Exception as e:
-            logging.error(f'Error saving data: {e}')
+            with self._state_lock.write():
+                self._reclaim()
+                self.storage.save(self)
+            logger.info('Saved data to %s', type(self.storage).__name__)
+        except Exception as e:
+            logger.error('Error saving data: %s', e)
+
+    def delete_all(self):
+        # Drops every user, project and task; recorded like any other mutation.
+        try:
+            with self._state_lock.write():
+                with self._registry_lock:
+                    for project in self.projects.values():
+                        project.delete_project()
+                    self.users = {}
+                    self.projects = {}
+                    self.tasks = {}
+                    self.task_projects = {}
+                    self.index = TaskIndex()
+                    self.memberships = MembershipIndex()
+                    self.history = HistoryLog()
+                    self.analytics = BoardAnalytics(Status.DONE)
+                    self.search_index = SearchIndex()
+                    self.archive = ColdStore()
+                self._record('delete_all')
+            self.events.flush()
+            logger.info('Deleted all data')
+        except Exception as e:
+            logger.error('Error deleting all data: %s', e)
+
+    def batch(self):
+        return self.storage.transaction()
+
+    def _record(self, op: str, *args):
+        if self._replaying:
+            return
+        self.storage.apply(op, args)
+        if self.journal is not None:
+            self.journal.append([op, *args])
+            if self.journal.needs_compaction():
+                # Run by the locking wrapper once the current operation released its locks.
+                self._compact_due = True
+        if self.events.active:
+            self._publish(op, args)
+
+    # Names of each recorded mutation's arguments in its event; None leaves
+    # an argument out. set_password_hash is never published.
+    _EVENT_ARGS = {
+        'create_user': ('user', None, 'email'),
+        'create_project': ('project', 'creator'),
+        'add_member_to_project': ('project', 'member'),
+        'remove_member_from_project': ('project', 'member'),
+        'set_member_role': ('project', 'member', 'role'),
+        'delete_project': ('project',),
+        'create_task': ('project', 'title', 'description', 'assigned_to', 'priority', 'status', 'task_id'),
+        'assign_task_to_member': ('project', 'task_id', 'user'),
+        'unassign_task_from_member': ('project', 'task_id', 'user'),
+        'change_task_priority': ('project', 'task_id', 'priority'),
+        'change_task_status': ('project', 'task_id', 'status'),
+        'add_comment_to_task': ('project', 'task_id', 'comment', 'user'),
+        'archive_tasks': ('project', 'task_ids'),
+        'unarchive_task': ('project', 'task_id'),
+        'delete_all': (),
+    }
+
+    def _publish(self, op: str, args: tuple):
+        # Runs under the mutation's locks, right after it was recorded, and
+        # only queues the event: the locking wrappers deliver it once the
+        # locks are released. A task event concerns the task's assignees
+        # besides any named user.
+        if op == 'create_tasks_bulk':
+            for record in args[1]:
+                self.events.post('create_task', args[0], record["id"], record["assigned_to"], record)
+            return
+        names = self._EVENT_ARGS.get(op)
+        if names is None:
+            return
+        data = {name: value for name, value in zip(names, args) if name is not None}
+        project_title = data.pop('project', None)
+        task_id = data.pop('task_id', None)
+        users = [data[name] for name in ('user', 'creator', 'member') if name in data]
+        users.extend(data.get('assigned_to', ()))
+        if task_id is not None:
+            key = task_key(task_id)
+            if project_title is None:
+                project_title = self.task_projects.get(key) or self.archive.project_of(key)
+            task = self.tasks.get(key)
+            if task is not None:
+                users.extend(task.assigned_to)
+        self.events.post(op, project_title, task_id, dict.fromkeys(users), data)
+
+    def compact(self):
+        try:
+            if self.journal is not None:
+                with self._state_lock.write():
+                    self._compact_due = False
+                    self._reclaim()
+                    self.journal.write_snapshot({
+                        "users": {user.username: {"password": user.password, "email": user.email}
+                                  for user in self.users.values()},
+                        "projects": self._projects_data(),
+                        "archive": self._archive_data()
+                    })
+                logger.info('Compacted journal into %s', self.journal.snapshot_path)
+        except Exception as e:
+            logger.error('Error compacting journal: %s', e)
+
+    def recover(self):
+        try:
+            if self.journal is None:
+                return
+            self._replaying = True
+            snapshot = self.journal.load_snapshot() or {}
+            self._restore_users((username, user_data["password"], user_data["email"])
+                                for username, user_data in snapshot.get("users", {}).items())
+            self._restore_projects(snapshot.get("projects", {}).items())
+            self._restore_archive(snapshot.get("archive", {}))
+            replayed = 0
+            for self._event_time, (op, *args) in self.journal.replay(snapshot.get("seq", 0)):
+                if op == 'change_task_priority':
+                    args[2] = Priority[args[2]]
+                elif op == 'set_member_role':
+                    args[2] = Role[args[2]]
+                elif op == 'change_task_status':
+                    args[2] = Status[args[2]]
+                elif op == 'create_task':
+                    args[4], args[5] = Priority[args[4]], Status[args[5]]
+                getattr(self, op)(*args)
+                replayed += 1
+            self._ensure_search_index()
+            logger.info('Recovered state from %s and %s journal records', self.journal.snapshot_path, replayed)
+        except Exception as e:
+            logger.error('Error recovering from journal: %s', e)
+        finally:
+            self._replaying = False
+            self._event_time = None
 
 def main():
+    configure_logging()
     manager = ProjectManager()
+    manager.load_data()
 
     while True:
         
@@ -325,9 +1560,9 @@ def main():
 
         choice = input("Enter your choice: ")
         if choice == '0':
-            manager= ma.create_admin()
-            
-        if choice == '1':
+            ma.create_admin(storage=manager.storage)
+
+        elif choice == '1':
             username = input("Enter username: ")
             password = input("Enter password: ")
             email = input("Enter email: ")
@@ -352,7 +1587,8 @@ def main():
             project_title = input("Enter project title: ")
             title = input("Enter task title: ")
             description = input("Enter task description: ")
-            assigned_to = input("Enter usernames of assigned members (comma-separated): ").split(",")
+            names = input("Enter usernames of assigned members (comma-separated): ").split(",")
+            assigned_to = [name.strip() for name in names if name.strip()]
             priority = Priority[input("Enter task priority (CRITICAL, HIGH, MEDIUM, LOW): ").upper()]
             status = Status[input("Enter task status (BACKLOG, TODO, DOING, DONE, ARCHIVED): ").upper()]
             manager.create_task(project_title, title, description, assigned_to, priority, status)
@@ -390,10 +1626,9 @@ def main():
 
         elif choice == '11':
             project_title = input("Enter project title: ")
-            tasks = manager.view_tasks_in_project(project_title)
-            for task in tasks:
+            for task in manager.iter_tasks_in_project(project_title):
                 print(task)
-                print
+
         elif choice == '12':
             project_title = input("Enter project title: ")
             task_id = input("Enter task ID: ")
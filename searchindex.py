@@ -0,0 +1,229 @@
+import bisect
+import heapq
+import itertools
+import math
+import re
+import threading
+from array import array
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+_TOKEN = re.compile(r'\w+')
+_QUERY = re.compile(r'"([^"]*)"|(\S+)')
+TITLE_WEIGHT = 3
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def parse_query(query: str) -> Tuple[List[str], List[str], List[List[str]]]:
+    # Splits a query into plain terms, prefixes (written as term*) and
+    # quoted phrases. Every part has to match.
+    terms, prefixes, phrases = [], [], []
+    for phrase, word in _QUERY.findall(query):
+        if phrase:
+            tokens = tokenize(phrase)
+            if len(tokens) > 1:
+                phrases.append(tokens)
+            terms.extend(tokens)
+        elif word.endswith('*') and tokenize(word):
+            prefixes.append(tokenize(word)[0])
+        else:
+            terms.extend(tokenize(word))
+    return terms, prefixes, phrases
+
+
+class SearchIndex:
+    # Inverted index over task titles, descriptions and comments. Every
+    # task gets a document number; a term's postings are two parallel
+    # arrays, sorted document numbers and term frequencies (title terms
+    # count TITLE_WEIGHT times), so a million-task index costs a few bytes
+    # per posting. Documents of removed tasks are left in the postings and
+    # dropped from keys, and are compacted away when the index is saved or
+    # compact() is called.
+    # vocabulary is kept sorted for prefix lookups.
+    def __init__(self):
+        self.keys: List[Any] = []
+        self.documents: Dict[Any, int] = {}
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.vocabulary: List[str] = []
+        self._lock = threading.Lock()
+
+    def __contains__(self, key) -> bool:
+        return key in self.documents
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _post(self, term: str, document: int, frequency: int):
+        # Callers hold _lock.
+        entry = self.postings.get(term)
+        if entry is None:
+            entry = self.postings[term] = (array('I'), array('H'))
+            bisect.insort(self.vocabulary, term)
+        documents, frequencies = entry
+        if not documents or documents[-1] < document:
+            documents.append(document)
+            frequencies.append(min(frequency, 0xFFFF))
+            return
+        i = bisect.bisect_left(documents, document)
+        if i < len(documents) and documents[i] == document:
+            frequencies[i] = min(frequencies[i] + frequency, 0xFFFF)
+        else:
+            documents.insert(i, document)
+            frequencies.insert(i, min(frequency, 0xFFFF))
+
+    @staticmethod
+    def _frequencies(texts: Iterable[str], title: Optional[str] = None) -> Dict[str, int]:
+        counts = Counter(tokenize(' '.join(texts)))
+        if title:
+            for term in tokenize(title):
+                counts[term] += TITLE_WEIGHT
+        return counts
+
+    def add(self, key, title: str, texts: Iterable[str] = ()):
+        counts = self._frequencies(texts, title)
+        with self._lock:
+            if key in self.documents:
+                return
+            document = self.documents[key] = len(self.keys)
+            self.keys.append(key)
+            postings = self.postings
+            for term, frequency in counts.items():
+                entry = postings.get(term)
+                if entry is None:
+                    entry = postings[term] = (array('I'), array('H'))
+                    bisect.insort(self.vocabulary, term)
+                # The new document has the highest number, so it goes last.
+                entry[0].append(document)
+                entry[1].append(min(frequency, 0xFFFF))
+
+    def add_text(self, key, text: str):
+        # E.g. a new comment on an indexed task.
+        counts = self._frequencies((text,))
+        with self._lock:
+            document = self.documents.get(key)
+            if document is None:
+                return
+            for term, frequency in counts.items():
+                self._post(term, document, frequency)
+
+    def remove(self, key):
+        with self._lock:
+            document = self.documents.pop(key, None)
+            if document is not None:
+                self.keys[document] = None
+
+    def removed(self) -> int:
+        return len(self.keys) - len(self.documents)
+
+    def compact(self):
+        # Drops removed documents from the postings and renumbers the rest.
+        with self._lock:
+            numbers = {}
+            keys = []
+            for document, key in enumerate(self.keys):
+                if key is not None:
+                    numbers[document] = len(keys)
+                    keys.append(key)
+            postings = {}
+            for term, (documents, frequencies) in self.postings.items():
+                live = [(numbers[document], frequency) for document, frequency in zip(documents, frequencies)
+                        if document in numbers]
+                if live:
+                    postings[term] = (array('I', [document for document, _ in live]),
+                                      array('H', [frequency for _, frequency in live]))
+            self.keys = keys
+            self.documents = {key: document for document, key in enumerate(keys)}
+            self.postings = postings
+            self.vocabulary = sorted(postings)
+
+    def _expand(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        end = bisect.bisect_left(self.vocabulary, prefix + '\U0010ffff')
+        return self.vocabulary[start:end]
+
+    def _idf(self, term: str) -> float:
+        return math.log(1 + len(self.keys) / len(self.postings[term][0]))
+
+    def search(self, query: str, accept: Optional[Callable[[Any], bool]] = None,
+               verify: Optional[Callable[[Any, List[List[str]]], bool]] = None,
+               limit: int = 20) -> List[Tuple[Any, float]]:
+        # Returns (key, score) pairs, best first. The rarest term drives the
+        # scan and every other term is checked by bisecting its postings.
+        # accept filters candidates (e.g. by project); verify is asked to
+        # confirm phrase matches against the task text.
+        terms, prefixes, phrases = parse_query(query)
+        with self._lock:
+            clauses = []
+            for term in dict.fromkeys(terms):
+                if term not in self.postings:
+                    return []
+                clauses.append([term])
+            for prefix in prefixes:
+                expanded = self._expand(prefix)
+                if not expanded:
+                    return []
+                clauses.append(expanded)
+            if not clauses:
+                return []
+            weights = {term: self._idf(term) for clause in clauses for term in clause}
+            clauses.sort(key=lambda clause: sum(len(self.postings[term][0]) for term in clause))
+            driver, rest = clauses[0], clauses[1:]
+            candidates = {}
+            for term in driver:
+                documents, frequencies = self.postings[term]
+                for document, frequency in zip(documents, frequencies):
+                    candidates[document] = candidates.get(document, 0.0) + frequency * weights[term]
+            scored = []
+            for document, score in candidates.items():
+                key = self.keys[document]
+                if key is None:
+                    continue
+                for clause in rest:
+                    matched = 0.0
+                    for term in clause:
+                        documents, frequencies = self.postings[term]
+                        i = bisect.bisect_left(documents, document)
+                        if i < len(documents) and documents[i] == document:
+                            matched += frequencies[i] * weights[term]
+                    if not matched:
+                        break
+                    score += matched
+                else:
+                    if accept is None or accept(key):
+                        scored.append((score, document, key))
+        if phrases and verify is not None:
+            # Verified best first, so only as many as needed are checked.
+            ranked = (entry for entry in sorted(scored, reverse=True) if verify(entry[2], phrases))
+            return [(key, score) for score, _, key in itertools.islice(ranked, limit)]
+        return [(key, score) for score, _, key in heapq.nlargest(limit, scored)]
+
+    def to_dict(self, id_of: Callable[[Any], str]) -> Dict[str, Any]:
+        # Live documents only, renumbered densely.
+        with self._lock:
+            numbers = {}
+            keys = []
+            for document, key in enumerate(self.keys):
+                if key is not None:
+                    numbers[document] = len(keys)
+                    keys.append(id_of(key))
+            terms = {}
+            for term in self.vocabulary:
+                documents, frequencies = self.postings[term]
+                live = [(numbers[document], frequency) for document, frequency in zip(documents, frequencies)
+                        if document in numbers]
+                if live:
+                    terms[term] = [[document for document, _ in live], [frequency for _, frequency in live]]
+        return {"documents": keys, "terms": terms}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], key_of: Callable[[str], Any]) -> 'SearchIndex':
+        index = cls()
+        index.keys = [key_of(document) for document in data["documents"]]
+        index.documents = {key: document for document, key in enumerate(index.keys)}
+        for term, (documents, frequencies) in data["terms"].items():
+            index.postings[term] = (array('I', documents), array('H', frequencies))
+        index.vocabulary = sorted(index.postings)
+        return index
@@ -0,0 +1,362 @@
+import contextlib
+import heapq
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import zlib
+from collections import Counter
+from collections.abc import Iterator as IteratorType
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from auth import hash_password
+from boardio import read_board, write_board
+from journal import Journal
+from projectmanager import ProjectManager, Priority, Status, Task, task_key
+from storage import StorageBackend, BinaryStorage
+
+logger = logging.getLogger(__name__)
+
+
+class ShardError(Exception):
+    pass
+
+
+def shard_of(project_title: str, shards: int) -> int:
+    # Stable across processes and runs, unlike hash() of a str.
+    return zlib.crc32(project_title.encode('utf-8')) % shards
+
+
+def shard_storage(shard: int, directory: str = '.', compression: str = 'zlib') -> StorageBackend:
+    return BinaryStorage(os.path.join(directory, f'shard-{shard}.snap'), compression,
+                         os.path.join(directory, 'admin_data.json'))
+
+
+def shard_journal(shard: int, directory: str = '.') -> Journal:
+    return Journal(os.path.join(directory, f'shard-{shard}.log'), os.path.join(directory, f'shard-{shard}.json'))
+
+
+# Requests the router needs answered that are not ProjectManager methods.
+_SHARD_OPS = {
+    'owns_task': lambda manager, task_id: task_key(task_id) in manager.task_projects or task_key(task_id) in manager.archive,
+    'has_project': lambda manager, project_title: project_title in manager.projects,
+    'users': lambda manager: dict(manager.users),
+}
+
+
+def _serve(connection, shard: int, storage_factory: Callable[[int], StorageBackend],
+           journal_factory: Optional[Callable[[int], Optional[Journal]]]):
+    # Worker loop: one (method, args, kwargs) request at a time, answered
+    # with (True, result) or (False, error). None asks the worker to stop.
+    journal = journal_factory(shard) if journal_factory is not None else None
+    manager = ProjectManager(journal=journal, storage=storage_factory(shard))
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        method, args, kwargs = request
+        try:
+            op = _SHARD_OPS.get(method)
+            result = op(manager, *args, **kwargs) if op is not None else getattr(manager, method)(*args, **kwargs)
+            if isinstance(result, Task):
+                result = Task.from_data(result.id, manager._task_data(result))
+            elif isinstance(result, IteratorType):
+                result = list(result)
+            connection.send((True, result))
+        except Exception as e:
+            logger.error('Error running %s on shard %s: %s', method, shard, e)
+            connection.send((False, f'{type(e).__name__}: {e}'))
+    manager.storage.close()
+    if journal is not None:
+        journal.close()
+    connection.close()
+
+
+def _routed(name: str):
+    # A ProjectManager method whose first argument is the project title.
+    def method(self, project_title: str, *args, **kwargs):
+        return self._call(self.shard_of(project_title), name, project_title, *args, **kwargs)
+    method.__name__ = method.__qualname__ = name
+    return method
+
+
+def _task_routed(name: str):
+    # A ProjectManager method taking (project_title, task_id, ...), where a
+    # project title of None means the task's own project.
+    def method(self, project_title: Optional[str], task_id: str, *args, **kwargs):
+        shard = self.shard_of(project_title) if project_title is not None else self._task_shard(task_id)
+        return self._call(shard, name, project_title, task_id, *args, **kwargs)
+    method.__name__ = method.__qualname__ = name
+    return method
+
+
+class ShardedProjectManager:
+    # Partitions projects across worker processes by a CRC32 of their title.
+    # Every worker runs its own ProjectManager with its own storage (and
+    # optional journal), so shards load, save and recover independently.
+    # Users are replicated to every shard because membership is checked
+    # where the project lives. Project calls go to the owning shard; task
+    # calls without a project title first ask all shards which one holds
+    # the task. Cross-project queries are sent to every shard before any
+    # reply is read, so the shards work in parallel, and are merged here.
+    # Tasks returned by a shard are detached copies, for reading only.
+    # Callers may share one router between threads: each shard serves one
+    # request at a time and fan-outs take the shards in order.
+    def __init__(self, shards: Optional[int] = None,
+                 storage_factory: Callable[[int], StorageBackend] = shard_storage,
+                 journal_factory: Optional[Callable[[int], Optional[Journal]]] = None, context=None):
+        self.shards = shards or os.cpu_count() or 1
+        context = context if context is not None else multiprocessing.get_context()
+        self._connections = []
+        self._locks = []
+        self._processes = []
+        for shard in range(self.shards):
+            connection, child = context.Pipe()
+            process = context.Process(target=_serve, args=(child, shard, storage_factory, journal_factory),
+                                      name=f'trellomize-shard-{shard}', daemon=True)
+            process.start()
+            child.close()
+            self._connections.append(connection)
+            self._locks.append(threading.Lock())
+            self._processes.append(process)
+        logger.info('Started %s shards', self.shards)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for connection, lock in zip(self._connections, self._locks):
+            with lock:
+                with contextlib.suppress(OSError):
+                    connection.send(None)
+                connection.close()
+        for process in self._processes:
+            process.join()
+        self._connections = []
+        self._processes = []
+        logger.info('Stopped %s shards', self.shards)
+
+    def shard_of(self, project_title: str) -> int:
+        return shard_of(project_title, self.shards)
+
+    @staticmethod
+    def _receive(connection, method: str):
+        try:
+            ok, result = connection.recv()
+        except (EOFError, OSError) as e:
+            raise ShardError(f'shard stopped while running {method}') from e
+        if not ok:
+            raise ShardError(result)
+        return result
+
+    def _call(self, shard: int, method: str, *args, **kwargs):
+        with self._locks[shard]:
+            connection = self._connections[shard]
+            connection.send((method, args, kwargs))
+            return self._receive(connection, method)
+
+    def _broadcast(self, method: str, *args, **kwargs) -> List[Any]:
+        # Results in shard order.
+        with contextlib.ExitStack() as stack:
+            for lock in self._locks:
+                stack.enter_context(lock)
+            for connection in self._connections:
+                connection.send((method, args, kwargs))
+            return [self._receive(connection, method) for connection in self._connections]
+
+    def _task_shard(self, task_id: str) -> int:
+        # A task no shard holds is looked for on shard 0, which answers
+        # the way a single manager answers for an unknown task.
+        owners = self._broadcast('owns_task', task_id)
+        return owners.index(True) if True in owners else 0
+
+    @property
+    def users(self) -> Dict[str, Any]:
+        # A copy; change users through create_user and set_password_hash.
+        return self._call(0, 'users')
+
+    def create_user(self, username: str, password: str, email: str):
+        # Hashed once so every shard stores the same hash.
+        self._broadcast('create_user', username, None, email, password_hash=hash_password(password))
+
+    def set_password_hash(self, username: str, password_hash: str):
+        self._broadcast('set_password_hash', username, password_hash)
+
+    def projects_of_user(self, username: str) -> Dict[str, str]:
+        projects = {}
+        for part in self._broadcast('projects_of_user', username):
+            projects.update(part)
+        return projects
+
+    def get_task_project(self, task_id: str) -> Optional[str]:
+        return next((title for title in self._broadcast('get_task_project', task_id) if title is not None), None)
+
+    def find_task(self, task_id: str, project_title: Optional[str] = None) -> Optional[Task]:
+        shard = self.shard_of(project_title) if project_title is not None else self._task_shard(task_id)
+        return self._call(shard, 'find_task', task_id, project_title)
+
+    create_project = _routed('create_project')
+    add_member_to_project = _routed('add_member_to_project')
+    remove_member_from_project = _routed('remove_member_from_project')
+    set_member_role = _routed('set_member_role')
+    delete_project = _routed('delete_project')
+    create_task = _routed('create_task')
+    archive_tasks = _routed('archive_tasks')
+    unarchive_task = _routed('unarchive_task')
+    view_archived_tasks = _routed('view_archived_tasks')
+    view_tasks_in_project = _routed('view_tasks_in_project')
+    view_tasks_page = _routed('view_tasks_page')
+    view_board = _routed('view_board')
+    view_board_at = _routed('view_board_at')
+    cycle_times = _routed('cycle_times')
+
+    assign_task_to_member = _task_routed('assign_task_to_member')
+    unassign_task_from_member = _task_routed('unassign_task_from_member')
+    change_task_priority = _task_routed('change_task_priority')
+    change_task_status = _task_routed('change_task_status')
+    add_comment_to_task = _task_routed('add_comment_to_task')
+    view_task_details = _task_routed('view_task_details')
+    view_task_history = _task_routed('view_task_history')
+
+    def create_tasks_bulk(self, project_title: str, tasks: Iterable[Dict[str, Any]], batch_size: int = 1000,
+                          actor: Optional[str] = None) -> int:
+        # Sent in batches so a large import never has to fit in one message.
+        created = 0
+        tasks = iter(tasks)
+        while True:
+            chunk = list(itertools.islice(tasks, batch_size))
+            if not chunk:
+                return created
+            created += self._call(self.shard_of(project_title), 'create_tasks_bulk', project_title, chunk,
+                                  batch_size, actor=actor)
+
+    def iter_tasks_in_project(self, project_title: str, order_by: str = 'created',
+                              fields: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        yield from self._call(self.shard_of(project_title), 'iter_tasks_in_project', project_title, order_by, fields)
+
+    def iter_task_records(self, project_title: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        if project_title is not None:
+            yield from self._call(self.shard_of(project_title), 'iter_task_records', project_title)
+        else:
+            for records in self._broadcast('iter_task_records'):
+                yield from records
+
+    def export_board(self, path: str, project_title: Optional[str] = None, fmt: Optional[str] = None) -> int:
+        try:
+            count = write_board(path, self.iter_task_records(project_title), fmt)
+            logger.info('Exported %s tasks to %s', count, path)
+            return count
+        except Exception as e:
+            logger.error('Error exporting tasks to %s: %s', path, e)
+            return 0
+
+    def import_board(self, path: str, project_title: Optional[str] = None, creator: Optional[str] = None,
+                     fmt: Optional[str] = None, batch_size: int = 1000, actor: Optional[str] = None) -> int:
+        imported = 0
+        try:
+            records = read_board(path, fmt)
+            for title, group in itertools.groupby(records, key=lambda record: project_title or record.get("project")):
+                if creator is not None and not self._call(self.shard_of(title), 'has_project', title):
+                    self.create_project(title, creator)
+                imported += self.create_tasks_bulk(title, group, batch_size, actor=actor)
+            logger.info('Imported %s tasks from %s', imported, path)
+        except Exception as e:
+            logger.error('Error importing tasks from %s: %s', path, e)
+        return imported
+
+    def archive_stale_tasks(self, project_title: Optional[str] = None, done_days: float = 30,
+                            actor: Optional[str] = None) -> int:
+        if project_title is not None:
+            return self._call(self.shard_of(project_title), 'archive_stale_tasks', project_title, done_days,
+                              actor=actor)
+        return sum(self._broadcast('archive_stale_tasks', None, done_days, actor=actor))
+
+    def query_tasks(self, project_title: Optional[str] = None, status: Optional[Status] = None,
+                    priority: Optional[Priority] = None, assignee: Optional[str] = None) -> List[Dict[str, Any]]:
+        if project_title is not None:
+            return self._call(self.shard_of(project_title), 'query_tasks', project_title, status, priority, assignee)
+        return [row for rows in self._broadcast('query_tasks', None, status, priority, assignee) for row in rows]
+
+    def view_user_tasks(self, username: str, status: Optional[Status] = None) -> List[Dict[str, Any]]:
+        return self.query_tasks(status=status, assignee=username)
+
+    def board_stats(self, project_title: Optional[str] = None) -> Dict[str, Any]:
+        if project_title is not None:
+            return self._call(self.shard_of(project_title), 'board_stats', project_title)
+        parts = [part for part in self._broadcast('board_stats', None) if part]
+        if not parts:
+            return {}
+        statuses, priorities = Counter(), Counter()
+        for part in parts:
+            statuses.update(part["status"])
+            priorities.update(part["priority"])
+        total = sum(part["tasks"] for part in parts)
+        finished = statuses[Status.DONE.name] + statuses[Status.ARCHIVED.name]
+        return {
+            "tasks": total,
+            "archived": sum(part["archived"] for part in parts),
+            "status": {status.name: statuses[status.name] for status in Status},
+            "priority": {priority.name: priorities[priority.name] for priority in Priority},
+            "completion": round(100 * finished / total, 2) if total else 0.0
+        }
+
+    def user_stats(self, username: str) -> Dict[str, Any]:
+        parts = [part for part in self._broadcast('user_stats', username) if part]
+        if not parts:
+            return {}
+        statuses = Counter()
+        for part in parts:
+            statuses.update(part["status"])
+        return {
+            "assigned": sum(part["assigned"] for part in parts),
+            "status": {status.name: statuses[status.name] for status in Status},
+            "wip": sum(part["wip"] for part in parts)
+        }
+
+    def throughput(self, project_title: Optional[str] = None, bucket_seconds: float = 86400,
+                   start: Optional[float] = None, end: Optional[float] = None) -> Dict[str, Any]:
+        # The window is fixed here so every shard fills the same buckets.
+        end = time.time() if end is None else end
+        start = end - 7 * 86400 if start is None else start
+        if project_title is not None:
+            return self._call(self.shard_of(project_title), 'throughput', project_title, bucket_seconds, start, end)
+        parts = [part for part in self._broadcast('throughput', None, bucket_seconds, start, end) if part]
+        if not parts:
+            return {}
+        return {
+            "start": start,
+            "bucket_seconds": bucket_seconds,
+            "counts": [sum(counts) for counts in zip(*(part["counts"] for part in parts))]
+        }
+
+    def search_tasks(self, query: str, project_title: Optional[str] = None, user: Optional[str] = None,
+                     limit: int = 20) -> List[Dict[str, Any]]:
+        # Across shards the best of every shard's top results are kept;
+        # each shard weighs terms by its own document frequencies.
+        if project_title is not None:
+            return self._call(self.shard_of(project_title), 'search_tasks', query, project_title, user, limit)
+        rows = itertools.chain.from_iterable(self._broadcast('search_tasks', query, None, user, limit))
+        return heapq.nlargest(limit, rows, key=lambda row: row["Score"])
+
+    def load_data(self):
+        self._broadcast('load_data')
+
+    def save_data(self):
+        self._broadcast('save_data')
+
+    def compact(self):
+        self._broadcast('compact')
+
+    def recover(self):
+        self._broadcast('recover')
+
+    def delete_all(self):
+        self._broadcast('delete_all')
@@ -0,0 +1,563 @@
+import argparse
+import base64
+import lzma
+import mmap
+import os
+import struct
+import sys
+import threading
+import uuid
+import zlib
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# File layout (little endian):
+#   header     magic, version, compression, directory offset
+#   blocks     each a u32 length and the, possibly compressed, concatenation
+#              of up to BLOCK_SIZE length-prefixed task records
+#   directory  user name table, users, projects with their members and
+#              block lists, the task index (fixed-size entries sorted by
+#              binary task id), then the archive and search index sections
+# Usernames inside task records are numbers into the name table, task ids
+# are stored as 16 raw bytes and priorities, statuses and roles as their
+# enum values, so a task costs a few dozen bytes plus its text.
+
+MAGIC = b'TRLS'
+VERSION = 1
+COMPRESSIONS = ('none', 'zlib', 'lzma')
+BLOCK_SIZE = 256
+# Names in enum value order: code n is the name at position n - 1.
+PRIORITIES = ('CRITICAL', 'HIGH', 'MEDIUM', 'LOW')
+STATUSES = ('BACKLOG', 'TODO', 'DOING', 'DONE', 'ARCHIVED')
+ROLES = ('CREATOR', 'ADMIN', 'MEMBER')
+
+_HEADER = struct.Struct('<4sBBHQ')
+_INDEX_ENTRY = struct.Struct('<16sIIIB')
+_U8 = struct.Struct('<B')
+_U16 = struct.Struct('<H')
+_U32 = struct.Struct('<I')
+_BLOCK_REF = struct.Struct('<QII')
+_TASK_FIXED = struct.Struct('<BBd')
+_BIG_ENDIAN = sys.byteorder == 'big'
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _compress(data: bytes, compression: int) -> bytes:
+    if compression == 1:
+        return zlib.compress(data, 6)
+    if compression == 2:
+        return lzma.compress(data, preset=1)
+    return data
+
+
+def _decompress(data, compression: int):
+    if compression == 1:
+        return zlib.decompress(data)
+    if compression == 2:
+        return lzma.decompress(data)
+    return data
+
+
+def _index_key(task_id: str) -> Tuple[bytes, bool]:
+    # Ids that are not UUIDs are placed in the index by a name-based UUID.
+    # Canonical UUID strings skip the uuid module, which dominates encoding.
+    if len(task_id) == 36 and task_id[8] == task_id[13] == task_id[18] == task_id[23] == '-':
+        try:
+            return bytes.fromhex(task_id.replace('-', '')), True
+        except ValueError:
+            pass
+    try:
+        return uuid.UUID(task_id).bytes, True
+    except (ValueError, TypeError, AttributeError):
+        return uuid.uuid5(uuid.NAMESPACE_OID, str(task_id)).bytes, False
+
+
+def _uuid_string(key) -> str:
+    digits = key.hex()
+    return f'{digits[:8]}-{digits[8:12]}-{digits[12:16]}-{digits[16:20]}-{digits[20:]}'
+
+
+def _le_bytes(values: array) -> bytes:
+    if _BIG_ENDIAN:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _le_array(typecode: str, data) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if _BIG_ENDIAN:
+        values.byteswap()
+    return values
+
+
+class _Writer:
+    def __init__(self):
+        self.parts: List[bytes] = []
+        self.names: Dict[str, int] = {}
+
+    def u8(self, value: int):
+        self.parts.append(_U8.pack(value))
+
+    def u16(self, value: int):
+        self.parts.append(_U16.pack(value))
+
+    def u32(self, value: int):
+        self.parts.append(_U32.pack(value))
+
+    def bytes(self, data: bytes):
+        self.parts.append(_U32.pack(len(data)))
+        self.parts.append(data)
+
+    def str(self, text: str):
+        self.bytes(text.encode('utf-8'))
+
+    def name_number(self, user: Optional[str]) -> int:
+        # 0 stands for no user.
+        if user is None:
+            return 0
+        number = self.names.get(user)
+        if number is None:
+            number = self.names[user] = len(self.names) + 1
+        return number
+
+    def name(self, user: Optional[str]):
+        self.u32(self.name_number(user))
+
+    def task_id(self, task_id: str) -> Tuple[bytes, bool]:
+        key, is_uuid = _index_key(task_id)
+        if is_uuid:
+            self.u8(0)
+            self.parts.append(key)
+        else:
+            self.u8(1)
+            self.str(task_id)
+        return key, is_uuid
+
+    def take(self) -> bytes:
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+class _Reader:
+    def __init__(self, buffer, offset: int = 0):
+        self.buffer = buffer
+        self.offset = offset
+
+    def unpack(self, fmt: struct.Struct) -> tuple:
+        values = fmt.unpack_from(self.buffer, self.offset)
+        self.offset += fmt.size
+        return values
+
+    def u8(self) -> int:
+        return self.unpack(_U8)[0]
+
+    def u16(self) -> int:
+        return self.unpack(_U16)[0]
+
+    def u32(self) -> int:
+        return self.unpack(_U32)[0]
+
+    def raw(self, size: int):
+        data = self.buffer[self.offset:self.offset + size]
+        self.offset += size
+        return data
+
+    def bytes(self):
+        return self.raw(self.u32())
+
+    def str(self) -> str:
+        return str(self.bytes(), 'utf-8')
+
+    def task_id(self) -> str:
+        if self.u8() == 0:
+            return _uuid_string(self.raw(16))
+        return self.str()
+
+
+def _encode_task(out: _Writer, task_id: str, task: Dict[str, Any]) -> Tuple[bytes, bool]:
+    key = out.task_id(task_id)
+    out.parts.append(_TASK_FIXED.pack(PRIORITIES.index(task["priority"]) + 1, STATUSES.index(task["status"]) + 1,
+                                      task.get("created") or 0.0))
+    out.str(task["title"])
+    out.str(task["description"])
+    out.u16(len(task["assigned_to"]))
+    for user in task["assigned_to"]:
+        out.name(user)
+    out.u32(len(task["comments"]))
+    for comment in task["comments"]:
+        out.name(comment["user"])
+        out.str(comment["comment"])
+    events = task.get("history")
+    count = len(events["time"]) if events else 0
+    out.u32(count)
+    if count:
+        out.parts.append(_le_bytes(array('d', events["time"])))
+        out.parts.append(bytes(events["kind"]))
+        out.parts.append(bytes(events["old"]))
+        out.parts.append(bytes(events["new"]))
+        out.parts.append(_le_bytes(array('I', [out.name_number(user) for user in events["user"]])))
+    return key
+
+
+def _decode_task(reader: _Reader, names: List[Optional[str]]) -> Tuple[str, Dict[str, Any]]:
+    task_id = reader.task_id()
+    priority, status, created = reader.unpack(_TASK_FIXED)
+    title = reader.str()
+    description = reader.str()
+    assigned_to = [names[reader.u32()] for _ in range(reader.u16())]
+    comments = []
+    for _ in range(reader.u32()):
+        user = names[reader.u32()]
+        comments.append({"user": user, "comment": reader.str()})
+    task = {
+        "title": title,
+        "description": description,
+        "assigned_to": assigned_to,
+        "priority": PRIORITIES[priority - 1],
+        "status": STATUSES[status - 1],
+        "comments": comments,
+        "created": created
+    }
+    count = reader.u32()
+    if count:
+        task["history"] = {
+            "time": _le_array('d', reader.raw(8 * count)).tolist(),
+            "kind": list(reader.raw(count)),
+            "old": list(reader.raw(count)),
+            "new": list(reader.raw(count)),
+            "user": [names[user] for user in _le_array('I', reader.raw(4 * count))],
+        }
+    return task_id, task
+
+
+def write_snapshot(path: str, users: Iterable[Tuple[str, str, str]], projects: Dict[str, Dict[str, Any]],
+                   archive: Optional[Dict[str, List[Optional[Dict[str, Any]]]]] = None,
+                   search: Optional[Dict[str, Any]] = None, compression: str = 'zlib') -> int:
+    # projects, archive and search take the shapes of the manager's
+    # _projects_data(), _archive_data() and _search_index_data(). The file
+    # is written next to path and moved into place. Returns the task count.
+    code = COMPRESSIONS.index(compression)
+    out = _Writer()
+    projects_meta, index = [], []
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as snapshot_file:
+        snapshot_file.write(_HEADER.pack(MAGIC, VERSION, code, 0, 0))
+        offset = _HEADER.size
+        for project_number, (title, data) in enumerate(projects.items()):
+            blocks = []
+            block, count, size = [], 0, 0
+            tasks = (item for entry in data["tasks"] for item in entry.items())
+            while True:
+                item = next(tasks, None)
+                if item is not None:
+                    task_id, task = item
+                    key, is_uuid = _encode_task(out, task_id, task)
+                    record = out.take()
+                    index.append((key, project_number, len(blocks), size, is_uuid))
+                    block.append(_U32.pack(len(record)) + record)
+                    count += 1
+                    size += _U32.size + len(record)
+                if count and (item is None or count == BLOCK_SIZE):
+                    stored = _compress(b''.join(block), code)
+                    snapshot_file.write(_U32.pack(len(stored)))
+                    snapshot_file.write(stored)
+                    blocks.append((offset + _U32.size, len(stored), count))
+                    offset += _U32.size + len(stored)
+                    block, count, size = [], 0, 0
+                if item is None:
+                    break
+            projects_meta.append((title, data, blocks))
+        # The directory shares the name table with the task records; the
+        # table goes first but is only complete at the end.
+        out.u32(0)
+        users = list(users)
+        out.u32(len(users))
+        for username, password, email in users:
+            out.name(username)
+            out.str(password)
+            out.str(email)
+        out.u32(len(projects_meta))
+        for title, data, blocks in projects_meta:
+            admins = set(data.get("admins", ()))
+            out.str(title)
+            out.name(data["creator"])
+            out.u32(len(data["members"]))
+            for member in data["members"]:
+                out.name(member)
+                out.u8(1 if member == data["creator"] else 2 if member in admins else 3)
+            out.u32(len(blocks))
+            for block_ref in blocks:
+                out.parts.append(_BLOCK_REF.pack(*block_ref))
+        index.sort()
+        out.u32(len(index))
+        out.parts.extend(_INDEX_ENTRY.pack(*entry) for entry in index)
+        out.bytes(_encode_archive(archive or {}))
+        out.bytes(_encode_search(search or {"documents": [], "terms": {}}))
+        names = _Writer()
+        names.u32(len(out.names))
+        for name in out.names:
+            names.str(name)
+        out.parts[0] = names.take()
+        snapshot_file.write(out.take())
+        snapshot_file.seek(0)
+        snapshot_file.write(_HEADER.pack(MAGIC, VERSION, code, 0, offset))
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+    os.replace(tmp_path, path)
+    return len(index)
+
+
+def _encode_archive(archive: Dict[str, List[Optional[Dict[str, Any]]]]) -> bytes:
+    out = _Writer()
+    out.u32(len(archive))
+    for title, chunks in archive.items():
+        out.str(title)
+        out.u32(len(chunks))
+        for chunk in chunks:
+            out.u8(chunk is not None)
+            if chunk is None:
+                continue
+            out.u32(len(chunk["ids"]))
+            for task_id in chunk["ids"]:
+                out.task_id(task_id)
+            for counts in (chunk["status"], chunk["priority"]):
+                out.u32(len(counts))
+                for name, count in counts.items():
+                    out.str(name)
+                    out.u32(count)
+            data = chunk["data"]
+            out.bytes(data if isinstance(data, bytes) else base64.b64decode(data))
+    return out.take()
+
+
+def _decode_archive(reader: _Reader) -> Dict[str, List[Optional[Dict[str, Any]]]]:
+    archive = {}
+    for _ in range(reader.u32()):
+        chunks = archive[reader.str()] = []
+        for _ in range(reader.u32()):
+            if not reader.u8():
+                chunks.append(None)
+                continue
+            ids = [reader.task_id() for _ in range(reader.u32())]
+            status = {reader.str(): reader.u32() for _ in range(reader.u32())}
+            priority = {reader.str(): reader.u32() for _ in range(reader.u32())}
+            chunks.append({"ids": ids, "status": status, "priority": priority, "data": bytes(reader.bytes())})
+    return archive
+
+
+def _encode_search(search: Dict[str, Any]) -> bytes:
+    out = _Writer()
+    out.u32(len(search["documents"]))
+    for task_id in search["documents"]:
+        out.task_id(task_id)
+    out.u32(len(search["terms"]))
+    for term, (documents, frequencies) in search["terms"].items():
+        out.str(term)
+        out.u32(len(documents))
+        out.parts.append(_le_bytes(array('I', documents)))
+        out.parts.append(_le_bytes(array('H', frequencies)))
+    return out.take()
+
+
+def _decode_search(reader: _Reader) -> Dict[str, Any]:
+    documents = [reader.task_id() for _ in range(reader.u32())]
+    terms = {}
+    for _ in range(reader.u32()):
+        term = reader.str()
+        count = reader.u32()
+        terms[term] = (_le_array('I', reader.raw(4 * count)), _le_array('H', reader.raw(2 * count)))
+    return {"documents": documents, "terms": terms}
+
+
+class TaskBlocks:
+    # A project's tasks in a snapshot, iterable as the {task_id: data}
+    # entries Project.defer_tasks expects. Blocks are decoded while
+    # iterating, so nothing is read before the project is first used.
+    def __init__(self, snapshot: 'SnapshotReader', blocks: List[Tuple[int, int, int]]):
+        self.snapshot = snapshot
+        self.blocks = blocks
+
+    def __len__(self) -> int:
+        return sum(count for _, _, count in self.blocks)
+
+    def __iter__(self) -> Iterator[Dict[str, Dict[str, Any]]]:
+        for block in self.blocks:
+            for task_id, task in self.snapshot._block_tasks(block):
+                yield {task_id: task}
+
+
+class SnapshotReader:
+    # Read-only, memory-mapped view of a snapshot. Opening it reads only the
+    # header and the directory; task records are decoded when asked for,
+    # and lookups by id bisect the index inside the mapping. Uncompressed
+    # snapshots are decoded straight from the shared page cache; compressed
+    # blocks are inflated on first use and a few are kept.
+    def __init__(self, path: str, cached_blocks: int = 16):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise SnapshotError(f'{path} is empty')
+        magic, version, self.compression, _, directory = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION or not directory:
+            self.close()
+            raise SnapshotError(f'{path} is not a complete snapshot')
+        self._cache = OrderedDict()
+        self._cached_blocks = cached_blocks
+        self._lock = threading.Lock()
+        reader = _Reader(memoryview(self._map), directory)
+        self.names: List[Optional[str]] = [None] + [reader.str() for _ in range(reader.u32())]
+        self.users = []
+        for _ in range(reader.u32()):
+            username = self.names[reader.u32()]
+            self.users.append((username, reader.str(), reader.str()))
+        self.projects: Dict[str, Dict[str, Any]] = {}
+        self._project_titles: List[str] = []
+        for _ in range(reader.u32()):
+            title = reader.str()
+            creator = self.names[reader.u32()]
+            members = {}
+            for _ in range(reader.u32()):
+                member = self.names[reader.u32()]
+                members[member] = ROLES[reader.u8() - 1]
+            blocks = [reader.unpack(_BLOCK_REF) for _ in range(reader.u32())]
+            self.projects[title] = {"creator": creator, "members": members, "blocks": blocks}
+            self._project_titles.append(title)
+        self.task_count = reader.u32()
+        self._index_offset = reader.offset
+        reader.offset += self.task_count * _INDEX_ENTRY.size
+        self._archive_offset = reader.offset
+        reader.offset += _U32.size + reader.u32()
+        self._search_offset = reader.offset
+
+    def __len__(self) -> int:
+        return self.task_count
+
+    def __enter__(self) -> 'SnapshotReader':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._cache = OrderedDict()
+        try:
+            self._map.close()
+        except (AttributeError, BufferError):
+            # Still referenced by a memoryview; released with it.
+            pass
+        self._file.close()
+
+    def _block(self, block: Tuple[int, int, int]):
+        offset, length, _ = block
+        if self.compression == 0:
+            return memoryview(self._map)[offset:offset + length]
+        with self._lock:
+            data = self._cache.get(offset)
+            if data is not None:
+                self._cache.move_to_end(offset)
+                return data
+        data = _decompress(self._map[offset:offset + length], self.compression)
+        with self._lock:
+            self._cache[offset] = data
+            if len(self._cache) > self._cached_blocks:
+                self._cache.popitem(last=False)
+        return data
+
+    def _block_tasks(self, block: Tuple[int, int, int]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        reader = _Reader(self._block(block))
+        for _ in range(block[2]):
+            end = reader.u32() + reader.offset
+            yield _decode_task(reader, self.names)
+            reader.offset = end
+
+    def members(self, project_title: str) -> Dict[str, str]:
+        return dict(self.projects[project_title]["members"])
+
+    def tasks(self, project_title: str) -> TaskBlocks:
+        return TaskBlocks(self, self.projects[project_title]["blocks"])
+
+    def iter_tasks(self, project_title: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        # Task records with their id and project, like ProjectManager.iter_task_records.
+        for title in [project_title] if project_title is not None else self._project_titles:
+            for entry in self.tasks(title):
+                for task_id, task in entry.items():
+                    yield dict(task, id=task_id, project=title)
+
+    def _index_entry(self, position: int) -> tuple:
+        return _INDEX_ENTRY.unpack_from(self._map, self._index_offset + position * _INDEX_ENTRY.size)
+
+    def task_keys(self) -> Iterator[Tuple[Any, str]]:
+        # (key, project title) of every task, keyed as projectmanager.task_key
+        # does, read from the index without decoding the tasks.
+        titles = self._project_titles
+        for position in range(self.task_count):
+            key, project_number, block_number, offset, is_uuid = self._index_entry(position)
+            if not is_uuid:
+                key = self._task_at(project_number, block_number, offset)[0]
+            yield key, titles[project_number]
+
+    def _task_at(self, project_number: int, block_number: int, offset: int) -> Tuple[str, Dict[str, Any]]:
+        block = self.projects[self._project_titles[project_number]]["blocks"][block_number]
+        reader = _Reader(self._block(block), offset + _U32.size)
+        return _decode_task(reader, self.names)
+
+    def task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        key, _ = _index_key(task_id)
+        low, high = 0, self.task_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._index_entry(middle)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        while low < self.task_count:
+            entry_key, project_number, block_number, offset, is_uuid = self._index_entry(low)
+            if entry_key != key:
+                break
+            found_id, task = self._task_at(project_number, block_number, offset)
+            if is_uuid or found_id == task_id:
+                return dict(task, id=found_id, project=self._project_titles[project_number])
+            low += 1
+        return None
+
+    def archive(self) -> Dict[str, List[Optional[Dict[str, Any]]]]:
+        reader = _Reader(memoryview(self._map), self._archive_offset)
+        return _decode_archive(_Reader(reader.bytes()))
+
+    def search_index(self) -> Dict[str, Any]:
+        reader = _Reader(memoryview(self._map), self._search_offset)
+        return _decode_search(_Reader(reader.bytes()))
+
+
+def main(argv: Optional[List[str]] = None):
+    # Converts between the JSON files written by JSONStorage and a snapshot.
+    from storage import BinaryStorage, JSONStorage, convert_storage
+    parser = argparse.ArgumentParser(description='Convert Trellomize data between JSON files and a binary snapshot.')
+    parser.add_argument('direction', choices=('to-binary', 'to-json'))
+    parser.add_argument('snapshot')
+    parser.add_argument('--users', default='users.json')
+    parser.add_argument('--projects', default='projects.json')
+    parser.add_argument('--search', default='search_index.json')
+    parser.add_argument('--archive', default='archive.json')
+    parser.add_argument('--compression', choices=COMPRESSIONS, default='zlib')
+    args = parser.parse_args(argv)
+    json_storage = JSONStorage(args.users, args.projects, search_path=args.search, archive_path=args.archive)
+    binary_storage = BinaryStorage(args.snapshot, args.compression)
+    if args.direction == 'to-binary':
+        convert_storage(json_storage, binary_storage)
+    else:
+        convert_storage(binary_storage, json_storage)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,578 @@
+import json
+import os
+import itertools
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from jsonstream import JSONSource, iter_json_object, iter_json_projects
+from snapshot import SnapshotReader, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+class StorageBackend:
+    # save/load move the whole dataset; apply receives every mutation the
+    # manager performs as (op, args) so backends can persist it in place.
+    incremental = False
+
+    def save(self, manager):
+        raise NotImplementedError
+
+    def load(self, manager):
+        raise NotImplementedError
+
+    def apply(self, op: str, args: tuple):
+        pass
+
+    @contextmanager
+    def transaction(self):
+        yield
+
+    def load_admin(self, username: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def save_admin(self, data: Dict[str, Any]):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class JSONStorage(StorageBackend):
+    # The search index and archive default to files next to projects_path.
+    def __init__(self, users_path: str = 'users.json', projects_path: str = 'projects.json',
+                 admin_path: str = 'admin_data.json', search_path: Optional[str] = None,
+                 archive_path: Optional[str] = None):
+        directory = os.path.dirname(projects_path)
+        self.users_path = users_path
+        self.projects_path = projects_path
+        self.admin_path = admin_path
+        self.search_path = search_path if search_path is not None else os.path.join(directory, 'search_index.json')
+        self.archive_path = archive_path if archive_path is not None else os.path.join(directory, 'archive.json')
+        # (archive, version) last written or read, so an unchanged archive
+        # is not rewritten on every save.
+        self.archive_saved = None
+        # The projects file tasks not yet materialized are read from.
+        self.source = None
+
+    def save(self, manager):
+        # Both files are written aside and swapped in, so a failed save never
+        # leaves a truncated file; projects not yet materialized keep reading
+        # the previous projects file through self.source.
+        tmp_path = self.users_path + '.tmp'
+        with open(tmp_path, 'w') as users_file:
+            json.dump({user.username: {"password": user.password, "email": user.email}
+                       for user in manager.users.values()}, users_file, indent=4)
+        os.replace(tmp_path, self.users_path)
+        tmp_path = self.projects_path + '.tmp'
+        with open(tmp_path, 'w') as projects_file:
+            json.dump(manager._projects_data(), projects_file, indent=4)
+        os.replace(tmp_path, self.projects_path)
+        with open(self.search_path, 'w') as search_file:
+            json.dump(manager._search_index_data(), search_file, separators=(',', ':'))
+        archive = (id(manager.archive), manager.archive.version)
+        if archive != self.archive_saved or not os.path.exists(self.archive_path):
+            with open(self.archive_path, 'w') as archive_file:
+                json.dump(manager._archive_data(), archive_file, separators=(',', ':'))
+            self.archive_saved = archive
+
+    def load(self, manager):
+        if os.path.exists(self.users_path):
+            users = []
+            for username, user_data in iter_json_object(self.users_path):
+                if isinstance(user_data, dict):
+                    users.append((username, user_data['password'], user_data.get('email', '')))
+                else:
+                    users.append((username, user_data, ''))
+            manager._restore_users(users)
+        if os.path.exists(self.projects_path):
+            # Only each task's offset, length and id are read up front; a
+            # project's tasks are parsed the first time the project is used.
+            self.source = JSONSource(self.projects_path)
+            manager._restore_projects(iter_json_projects(self.source))
+            if os.path.exists(self.search_path):
+                with open(self.search_path, 'r') as search_file:
+                    manager._restore_search_index(json.load(search_file))
+        if os.path.exists(self.archive_path):
+            with open(self.archive_path, 'r') as archive_file:
+                manager._restore_archive(json.load(archive_file))
+            self.archive_saved = (id(manager.archive), manager.archive.version)
+
+    def load_admin(self, username: str) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.admin_path):
+            return None
+        with open(self.admin_path, 'r') as admin_file:
+            data = json.load(admin_file)
+        return data if data.get('username') == username else None
+
+    def save_admin(self, data: Dict[str, Any]):
+        with open(self.admin_path, 'w') as admin_file:
+            json.dump(data, admin_file, indent=4)
+
+    def close(self):
+        if self.source is not None:
+            self.source.close()
+            self.source = None
+
+
+class BinaryStorage(StorageBackend):
+    # The whole dataset in one compact snapshot file (see snapshot.py).
+    # Loading maps the file and registers every task from its index; a
+    # project's tasks are decoded the first time the project is used.
+    # Admins stay in their JSON file.
+    def __init__(self, path: str = 'trellomize.snap', compression: str = 'zlib', admin_path: str = 'admin_data.json'):
+        self.path = path
+        self.compression = compression
+        self.admins = JSONStorage(admin_path=admin_path)
+        self.reader = None
+
+    def save(self, manager):
+        write_snapshot(self.path, ((user.username, user.password, user.email) for user in manager.users.values()),
+                       manager._projects_data(), manager._archive_data(), manager._search_index_data(),
+                       self.compression)
+
+    def load(self, manager):
+        if not os.path.exists(self.path):
+            return
+        # Projects not yet materialized keep reading the previous mapping,
+        # which stays valid after save() replaces the file.
+        self.reader = reader = SnapshotReader(self.path)
+        manager._restore_users(reader.users)
+        task_keys = {}
+        for key, title in reader.task_keys():
+            task_keys.setdefault(title, []).append(key)
+        manager._restore_projects(
+            (title, {"creator": project["creator"], "members": list(project["members"]),
+                     "admins": [user for user, role in project["members"].items() if role == 'ADMIN'],
+                     "tasks": reader.tasks(title), "task_keys": task_keys.get(title, [])})
+            for title, project in reader.projects.items())
+        manager._restore_search_index(reader.search_index())
+        manager._restore_archive(reader.archive())
+
+    def load_admin(self, username: str) -> Optional[Dict[str, Any]]:
+        return self.admins.load_admin(username)
+
+    def save_admin(self, data: Dict[str, Any]):
+        self.admins.save_admin(data)
+
+
+def convert_storage(source: StorageBackend, target: StorageBackend):
+    # Copies a whole dataset between backends, e.g. JSON files to a binary
+    # snapshot and back. Tasks pass through in their stored form.
+    from projectmanager import ProjectManager
+    manager = ProjectManager(storage=source)
+    manager.load_data()
+    manager.storage = target
+    manager.save_data()
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    email TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS admins (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    email TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS projects (
+    title TEXT PRIMARY KEY,
+    creator TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS members (
+    project TEXT NOT NULL REFERENCES projects(title) ON DELETE CASCADE,
+    username TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS members_project ON members(project);
+CREATE INDEX IF NOT EXISTS members_username ON members(username);
+CREATE TABLE IF NOT EXISTS project_admins (
+    project TEXT NOT NULL REFERENCES projects(title) ON DELETE CASCADE,
+    username TEXT NOT NULL,
+    PRIMARY KEY (project, username)
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    project TEXT NOT NULL REFERENCES projects(title) ON DELETE CASCADE,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_project_status ON tasks(project, status);
+CREATE INDEX IF NOT EXISTS tasks_project_priority ON tasks(project, priority);
+CREATE TABLE IF NOT EXISTS assignees (
+    task_id TEXT NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+    username TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS assignees_task ON assignees(task_id);
+CREATE INDEX IF NOT EXISTS assignees_username ON assignees(username);
+CREATE TABLE IF NOT EXISTS comments (
+    task_id TEXT NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+    username TEXT NOT NULL,
+    comment TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS comments_task ON comments(task_id);
+CREATE TABLE IF NOT EXISTS history (
+    task_id TEXT NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+    time REAL NOT NULL,
+    kind INTEGER NOT NULL,
+    old INTEGER NOT NULL DEFAULT 0,
+    new INTEGER NOT NULL DEFAULT 0,
+    username TEXT
+);
+CREATE INDEX IF NOT EXISTS history_task ON history(task_id);
+CREATE TABLE IF NOT EXISTS search_index (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS archive (
+    project TEXT NOT NULL REFERENCES projects(title) ON DELETE CASCADE,
+    chunk INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (project, chunk)
+);
+"""
+
+# Everything but admins, children before parents.
+_DATA_TABLES = ('archive', 'history', 'comments', 'assignees', 'tasks', 'project_admins', 'members', 'projects',
+                'users', 'search_index')
+
+# history.EventKind.CREATED; the creation time of a task is stored as its
+# first history row.
+_CREATED = 0
+
+
+class TaskRows:
+    # A project's tasks in a SQLite database, iterable as the {task_id: data}
+    # entries Project.defer_tasks expects. The rows are queried while
+    # iterating, so nothing is read before the project is first used.
+    def __init__(self, storage: 'SQLiteStorage', project_title: str):
+        self.storage = storage
+        self.project_title = project_title
+
+    def __len__(self) -> int:
+        return self.storage.connection.execute('SELECT COUNT(*) FROM tasks WHERE project = ?',
+                                               (self.project_title,)).fetchone()[0]
+
+    def __iter__(self) -> Iterator[Dict[str, Dict[str, Any]]]:
+        return iter(self.storage.project_tasks(self.project_title))
+
+
+class SQLiteStorage(StorageBackend):
+    # Mutations are applied as partial updates inside an open transaction
+    # that is committed every batch_size operations, on save and on close.
+    # transaction() groups a block of mutations into a single commit.
+    incremental = True
+
+    def __init__(self, path: str = 'trellomize.db', batch_size: int = 1000):
+        self.path = path
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.executescript(_SCHEMA)
+        self.pending = 0
+        self.depth = 0
+        self.synced = False
+        self._lock = threading.RLock()
+
+    def _begin(self):
+        if not self.connection.in_transaction:
+            self.connection.execute('BEGIN')
+
+    def commit(self):
+        with self._lock:
+            if self.connection.in_transaction:
+                self.connection.execute('COMMIT')
+            self.pending = 0
+
+    @contextmanager
+    def transaction(self):
+        # Holding the lock for the whole block keeps other threads' writes
+        # out of this transaction.
+        with self._lock:
+            self._begin()
+            self.depth += 1
+            try:
+                yield self.connection
+            except Exception:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.connection.execute('ROLLBACK')
+                    self.pending = 0
+                raise
+            self.depth -= 1
+            if self.depth == 0:
+                self.commit()
+
+    def apply(self, op: str, args: tuple):
+        handler = getattr(self, '_apply_' + op, None)
+        if handler is None:
+            return
+        with self._lock:
+            self._begin()
+            handler(*args)
+            self.pending += 1
+            if self.depth == 0 and self.pending >= self.batch_size:
+                self.commit()
+
+    def _apply_create_user(self, username, password, email):
+        self.connection.execute('INSERT OR IGNORE INTO users VALUES (?, ?, ?)', (username, password, email))
+
+    def _apply_set_password_hash(self, username, password_hash):
+        self.connection.execute('UPDATE users SET password = ? WHERE username = ?', (password_hash, username))
+
+    def _apply_create_project(self, title, creator):
+        self.connection.execute('DELETE FROM projects WHERE title = ?', (title,))
+        self.connection.execute('INSERT INTO projects VALUES (?, ?)', (title, creator))
+        self.connection.execute('INSERT INTO members VALUES (?, ?)', (title, creator))
+
+    def _apply_add_member_to_project(self, project_title, member):
+        self.connection.execute('INSERT INTO members VALUES (?, ?)', (project_title, member))
+
+    def _apply_remove_member_from_project(self, project_title, member):
+        self.connection.execute('DELETE FROM members WHERE project = ? AND username = ?', (project_title, member))
+        self.connection.execute('DELETE FROM project_admins WHERE project = ? AND username = ?', (project_title, member))
+        self.connection.execute('DELETE FROM assignees WHERE username = ? AND task_id IN '
+                                '(SELECT id FROM tasks WHERE project = ?)', (member, project_title))
+
+    def _apply_set_member_role(self, project_title, member, role):
+        if role == 'ADMIN':
+            self.connection.execute('INSERT OR IGNORE INTO project_admins VALUES (?, ?)', (project_title, member))
+        else:
+            self.connection.execute('DELETE FROM project_admins WHERE project = ? AND username = ?',
+                                    (project_title, member))
+
+    def _apply_delete_project(self, project_title):
+        self.connection.execute('DELETE FROM projects WHERE title = ?', (project_title,))
+
+    def _apply_create_task(self, project_title, title, description, assigned_to, priority, status, task_id):
+        self.connection.execute('INSERT INTO tasks VALUES (?, ?, ?, ?, ?, ?)',
+                                (task_id, project_title, title, description, priority, status))
+        self.connection.executemany('INSERT INTO assignees VALUES (?, ?)', [(task_id, user) for user in assigned_to])
+
+    def _apply_create_tasks_bulk(self, project_title, records):
+        self._insert_tasks(project_title, ((record['id'], record) for record in records))
+
+    def _apply_assign_task_to_member(self, project_title, task_id, user):
+        self.connection.execute('INSERT INTO assignees VALUES (?, ?)', (task_id, user))
+
+    def _apply_unassign_task_from_member(self, project_title, task_id, user):
+        self.connection.execute('DELETE FROM assignees WHERE rowid = (SELECT rowid FROM assignees '
+                                'WHERE task_id = ? AND username = ? LIMIT 1)', (task_id, user))
+
+    def _apply_change_task_priority(self, project_title, task_id, priority):
+        self.connection.execute('UPDATE tasks SET priority = ? WHERE id = ?', (priority, task_id))
+
+    def _apply_change_task_status(self, project_title, task_id, status):
+        self.connection.execute('UPDATE tasks SET status = ? WHERE id = ?', (status, task_id))
+
+    def _apply_add_comment_to_task(self, project_title, task_id, comment, user):
+        self.connection.execute('INSERT INTO comments VALUES (?, ?, ?)', (task_id, user, comment))
+
+    def _apply_record_event(self, task_id, when, kind, old, new, user):
+        self.connection.execute('INSERT INTO history VALUES (?, ?, ?, ?, ?, ?)', (task_id, when, kind, old, new, user))
+
+    def _apply_archive_tasks(self, project_title, task_ids):
+        # Assignees, comments and history rows go with the tasks; the
+        # archived records arrive as store_archive_chunk.
+        self.connection.executemany('DELETE FROM tasks WHERE id = ?', ((task_id,) for task_id in task_ids))
+
+    def _apply_store_archive_chunk(self, project_title, number, chunk):
+        if chunk is None:
+            self.connection.execute('DELETE FROM archive WHERE project = ? AND chunk = ?', (project_title, number))
+        else:
+            self.connection.execute('INSERT OR REPLACE INTO archive VALUES (?, ?, ?)',
+                                    (project_title, number, json.dumps(chunk, separators=(',', ':'))))
+
+    def _apply_delete_all(self):
+        for table in _DATA_TABLES:
+            self.connection.execute(f'DELETE FROM {table}')
+
+    def save(self, manager):
+        if self.synced:
+            # Every mutation since load() has already been applied in place.
+            self.save_search_index(manager)
+            self.commit()
+            return
+        # Gathered before the tables are cleared: projects not yet
+        # materialized may still be reading their tasks from them.
+        projects, archive = manager._projects_data(), manager._archive_data()
+        with self.transaction() as connection:
+            for table in _DATA_TABLES:
+                connection.execute(f'DELETE FROM {table}')
+            connection.executemany('INSERT INTO users VALUES (?, ?, ?)',
+                                   ((user.username, user.password, user.email) for user in manager.users.values()))
+            for title, data in projects.items():
+                self.insert_project(title, data)
+            connection.executemany('INSERT INTO archive VALUES (?, ?, ?)', (
+                (title, number, json.dumps(chunk, separators=(',', ':')))
+                for title, chunks in archive.items()
+                for number, chunk in enumerate(chunks) if chunk is not None))
+            self.save_search_index(manager)
+        self.synced = True
+
+    def save_search_index(self, manager):
+        with self.transaction() as connection:
+            connection.execute('INSERT OR REPLACE INTO search_index VALUES (0, ?)',
+                               (json.dumps(manager._search_index_data(), separators=(',', ':')),))
+
+    def insert_project(self, title: str, data: Dict[str, Any]):
+        with self.transaction() as connection:
+            connection.execute('INSERT INTO projects VALUES (?, ?)', (title, data['creator']))
+            connection.executemany('INSERT INTO members VALUES (?, ?)', ((title, user) for user in data['members']))
+            connection.executemany('INSERT INTO project_admins VALUES (?, ?)',
+                                   ((title, user) for user in data.get('admins', ())))
+            self._insert_tasks(title, (item for entry in data['tasks'] for item in entry.items()))
+
+    def _insert_tasks(self, project_title: str, items):
+        tasks, assignees, comments, history = [], [], [], []
+        for task_id, task in items:
+            tasks.append((task_id, project_title, task['title'], task['description'], task['priority'], task['status']))
+            assignees.extend((task_id, user) for user in task['assigned_to'])
+            comments.extend((task_id, comment['user'], comment['comment']) for comment in task['comments'])
+            if task.get('created'):
+                history.append((task_id, task['created'], _CREATED, 0, 0, None))
+            events = task.get('history')
+            if events:
+                history.extend(zip(itertools.repeat(task_id), events['time'], events['kind'], events['old'],
+                                   events['new'], events['user']))
+        self.connection.executemany('INSERT INTO tasks VALUES (?, ?, ?, ?, ?, ?)', tasks)
+        self.connection.executemany('INSERT INTO assignees VALUES (?, ?)', assignees)
+        self.connection.executemany('INSERT INTO comments VALUES (?, ?, ?)', comments)
+        self.connection.executemany('INSERT INTO history VALUES (?, ?, ?, ?, ?, ?)', history)
+
+    def _task_history(self, rows, created: Dict[str, float], history: Dict[str, Dict[str, List[Any]]]):
+        # Splits history rows into creation times and per-task columns.
+        for task_id, when, kind, old, new, username in rows:
+            if kind == _CREATED:
+                created[task_id] = when
+                continue
+            events = history.get(task_id)
+            if events is None:
+                events = history[task_id] = {'time': [], 'kind': [], 'old': [], 'new': [], 'user': []}
+            events['time'].append(when)
+            events['kind'].append(kind)
+            events['old'].append(old)
+            events['new'].append(new)
+            events['user'].append(username)
+
+    def load(self, manager):
+        self.commit()
+        manager._restore_users(self.connection.execute('SELECT username, password, email FROM users ORDER BY rowid'))
+        manager._restore_projects(self._iter_projects())
+        row = self.connection.execute('SELECT data FROM search_index WHERE id = 0').fetchone()
+        if row is not None:
+            manager._restore_search_index(json.loads(row[0]))
+        archive = {}
+        for title, number, chunk in self.connection.execute('SELECT project, chunk, data FROM archive ORDER BY project, chunk'):
+            chunks = archive.setdefault(title, [])
+            chunks.extend([None] * (number - len(chunks)))
+            chunks.append(json.loads(chunk))
+        manager._restore_archive(archive)
+        self.synced = True
+
+    def _iter_projects(self):
+        members, admins = {}, {}
+        for project, username in self.connection.execute('SELECT project, username FROM members ORDER BY rowid'):
+            members.setdefault(project, []).append(username)
+        for project, username in self.connection.execute('SELECT project, username FROM project_admins ORDER BY rowid'):
+            admins.setdefault(project, []).append(username)
+        # Only task ids are read up front; a project's tasks are queried the
+        # first time the project is used.
+        for title, creator in self.connection.execute('SELECT title, creator FROM projects ORDER BY rowid').fetchall():
+            yield title, {'creator': creator, 'members': members.get(title, []), 'admins': admins.get(title, []),
+                          'tasks': TaskRows(self, title),
+                          'task_ids': [task_id for task_id, in self.connection.execute(
+                              'SELECT id FROM tasks WHERE project = ? ORDER BY rowid', (title,))]}
+
+    def project_tasks(self, project_title: str) -> List[Dict[str, Dict[str, Any]]]:
+        assignees, comments, created, history = {}, {}, {}, {}
+        for task_id, username in self.connection.execute(
+                'SELECT a.task_id, a.username FROM assignees a JOIN tasks t ON t.id = a.task_id '
+                'WHERE t.project = ? ORDER BY a.rowid', (project_title,)):
+            assignees.setdefault(task_id, []).append(username)
+        for task_id, username, comment in self.connection.execute(
+                'SELECT c.task_id, c.username, c.comment FROM comments c JOIN tasks t ON t.id = c.task_id '
+                'WHERE t.project = ? ORDER BY c.rowid', (project_title,)):
+            comments.setdefault(task_id, []).append({'user': username, 'comment': comment})
+        self._task_history(self.connection.execute(
+            'SELECT h.task_id, h.time, h.kind, h.old, h.new, h.username FROM history h JOIN tasks t ON t.id = h.task_id '
+            'WHERE t.project = ? ORDER BY h.rowid', (project_title,)), created, history)
+        tasks = []
+        for task_id, title, description, priority, status in self.connection.execute(
+                'SELECT id, title, description, priority, status FROM tasks WHERE project = ? ORDER BY rowid',
+                (project_title,)):
+            task = {
+                'title': title,
+                'description': description,
+                'assigned_to': assignees.get(task_id, []),
+                'priority': priority,
+                'status': status,
+                'comments': comments.get(task_id, []),
+                'created': created.get(task_id, 0.0)
+            }
+            if task_id in history:
+                task['history'] = history[task_id]
+            tasks.append({task_id: task})
+        return tasks
+
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        row = self.connection.execute('SELECT project, title, description, priority, status FROM tasks WHERE id = ?',
+                                      (task_id,)).fetchone()
+        if row is None:
+            return None
+        created, history = {}, {}
+        self._task_history(self.connection.execute(
+            'SELECT task_id, time, kind, old, new, username FROM history WHERE task_id = ? ORDER BY rowid',
+            (task_id,)), created, history)
+        task = {
+            'project': row[0],
+            'title': row[1],
+            'description': row[2],
+            'assigned_to': [user for user, in self.connection.execute(
+                'SELECT username FROM assignees WHERE task_id = ? ORDER BY rowid', (task_id,))],
+            'priority': row[3],
+            'status': row[4],
+            'comments': [{'user': user, 'comment': comment} for user, comment in self.connection.execute(
+                'SELECT username, comment FROM comments WHERE task_id = ? ORDER BY rowid', (task_id,))],
+            'created': created.get(task_id, 0.0)
+        }
+        if task_id in history:
+            task['history'] = history[task_id]
+        return task
+
+    def task_ids(self, project_title: str, status: Optional[str] = None, assignee: Optional[str] = None) -> List[str]:
+        query = 'SELECT t.id FROM tasks t'
+        params: List[Any] = []
+        if assignee is not None:
+            query += ' JOIN assignees a ON a.task_id = t.id AND a.username = ?'
+            params.append(assignee)
+        query += ' WHERE t.project = ?'
+        params.append(project_title)
+        if status is not None:
+            query += ' AND t.status = ?'
+            params.append(status)
+        return [task_id for task_id, in self.connection.execute(query + ' ORDER BY t.rowid', params)]
+
+    def load_admin(self, username: str) -> Optional[Dict[str, Any]]:
+        row = self.connection.execute('SELECT username, password, email FROM admins WHERE username = ?',
+                                      (username,)).fetchone()
+        if row is None:
+            return None
+        return {'username': row[0], 'password': row[1], 'email': row[2]}
+
+    def save_admin(self, data: Dict[str, Any]):
+        with self.transaction() as connection:
+            connection.execute('INSERT OR REPLACE INTO admins VALUES (?, ?, ?)',
+                               (data['username'], data['password'], data['email']))
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+        logger.info('Closed SQLite storage %s', self.path)
@@ -0,0 +1,85 @@
+from typing import Any, Dict, List, Optional
+
+
+class TaskIndex:
+    # Buckets are dicts used as insertion-ordered sets of Task objects, so
+    # membership updates are O(1) and results keep creation order.
+    def __init__(self):
+        self.by_status = {}
+        self.by_priority = {}
+        self.by_assignee = {}
+
+    @staticmethod
+    def _add(buckets: Dict[Any, Dict], key, task):
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = {}
+        bucket[task] = None
+
+    @staticmethod
+    def _discard(buckets: Dict[Any, Dict], key, task):
+        bucket = buckets.get(key)
+        if bucket is not None:
+            bucket.pop(task, None)
+            if not bucket:
+                del buckets[key]
+
+    def add(self, project_title: str, task):
+        for scope in (project_title, None):
+            self._add(self.by_status, (scope, task.status), task)
+            self._add(self.by_priority, (scope, task.priority), task)
+        for user in task.assigned_to:
+            self._add(self.by_assignee, user, task)
+
+    def remove(self, project_title: str, task):
+        for scope in (project_title, None):
+            self._discard(self.by_status, (scope, task.status), task)
+            self._discard(self.by_priority, (scope, task.priority), task)
+        for user in task.assigned_to:
+            self._discard(self.by_assignee, user, task)
+
+    def compact(self):
+        # Copies every bucket, releasing the space of removed tasks.
+        for buckets in (self.by_status, self.by_priority, self.by_assignee):
+            for key, bucket in buckets.items():
+                buckets[key] = dict(bucket)
+
+    def update(self, project_title: str, task, field: str, old, new):
+        if field == 'status':
+            for scope in (project_title, None):
+                self._discard(self.by_status, (scope, old), task)
+                self._add(self.by_status, (scope, new), task)
+        elif field == 'priority':
+            for scope in (project_title, None):
+                self._discard(self.by_priority, (scope, old), task)
+                self._add(self.by_priority, (scope, new), task)
+        elif field == 'assigned':
+            self._add(self.by_assignee, new, task)
+        elif field == 'unassigned':
+            if old not in task.assigned_to:
+                self._discard(self.by_assignee, old, task)
+
+    def query(self, project_title: Optional[str] = None, status=None, priority=None,
+              assignee: Optional[str] = None, task_projects: Optional[Dict[Any, str]] = None) -> List:
+        candidates = []
+        if status is not None:
+            candidates.append(self.by_status.get((project_title, status), {}))
+        if priority is not None:
+            candidates.append(self.by_priority.get((project_title, priority), {}))
+        if assignee is not None:
+            candidates.append(self.by_assignee.get(assignee, {}))
+        if not candidates:
+            return []
+        smallest = min(candidates, key=len)
+        result = []
+        for task in smallest:
+            if status is not None and task.status != status:
+                continue
+            if priority is not None and task.priority != priority:
+                continue
+            if assignee is not None and assignee not in task.assigned_to:
+                continue
+            if project_title is not None and task_projects is not None and task_projects.get(task.key) != project_title:
+                continue
+            result.append(task)
+        return result
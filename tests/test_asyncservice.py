@@ -0,0 +1,79 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from asyncservice import AsyncProjectManager
+from projectmanager import ProjectManager, Status
+from storage import StorageBackend
+
+
+class SlowStorage(StorageBackend):
+    # save() runs under the manager's exclusive state lock and waits here,
+    # standing in for writing out a large board.
+    def __init__(self):
+        self.saving = threading.Event()
+        self.release = threading.Event()
+
+    def save(self, manager):
+        self.saving.set()
+        self.release.wait(5)
+
+    def load(self, manager):
+        pass
+
+
+class TestAsyncProjectManager(unittest.TestCase):
+
+    def setUp(self):
+        self.storage = SlowStorage()
+        manager = ProjectManager(storage=self.storage)
+        manager.create_user("alice", "password", "alice@example.com")
+        manager.create_project("Project", "alice")
+        self.task = manager.create_task("Project", "Task", "Description", [])
+        self.service = AsyncProjectManager(manager, save_delay=0)
+
+    def test_loop_keeps_ticking_while_a_save_is_in_flight(self):
+        async def run():
+            loop = asyncio.get_running_loop()
+            save = asyncio.ensure_future(self.service.save_data())
+            await loop.run_in_executor(None, self.storage.saving.wait, 5)
+            # Released from another thread, so a blocked loop cannot hold it up.
+            threading.Timer(0.3, self.storage.release.set).start()
+            ticks = []
+
+            async def ticker():
+                while not save.done():
+                    ticks.append(time.perf_counter())
+                    await asyncio.sleep(0.01)
+
+            ticking = asyncio.ensure_future(ticker())
+            await asyncio.sleep(0.02)
+            await self.service.change_task_status("Project", self.task.id, Status.DONE)
+            await self.service.board_stats("Project")
+            await save
+            await ticking
+            return ticks
+
+        ticks = asyncio.run(run())
+        self.assertIs(self.task.status, Status.DONE)
+        self.assertGreater(len(ticks), 10)
+        self.assertLess(max(later - earlier for earlier, later in zip(ticks, ticks[1:])), 0.15)
+
+    def test_mutations_and_reads_round_trip(self):
+        async def run():
+            await self.service.create_user("bob", "password", "bob@example.com")
+            await self.service.add_member_to_project("Project", "bob")
+            task = await self.service.create_task("Project", "Other", "Description", ["bob"])
+            await self.service.add_comment_to_task("Project", task.id, "comment", "bob")
+            return task, await self.service.view_task_details("Project", task.id), \
+                await self.service.projects_of_user("bob")
+
+        task, details, projects = asyncio.run(run())
+        self.assertEqual(details["Assigned To"], ["bob"])
+        self.assertEqual(details["Comments"], [{"user": "bob", "comment": "comment"}])
+        self.assertEqual(projects, {"Project": "MEMBER"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import functools
+import os
+import tempfile
+import unittest
+
+from auth import Authenticator, SessionCache, hash_password, is_password_hash, verify_password
+from journal import Journal
+from projectmanager import ProjectManager
+from sharding import ShardedProjectManager, shard_storage
+from storage import JSONStorage
+
+# Looks like a hash but is a password someone chose.
+HASH_LIKE = "scrypt$my$secret$pass"
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestPasswords(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.journal = Journal(os.path.join(self.directory, "journal.log"),
+                               os.path.join(self.directory, "snapshot.json"))
+        self.addCleanup(self.journal.close)
+        self.manager = ProjectManager(journal=self.journal, storage=JSONStorage(
+            os.path.join(self.directory, "users.json"), os.path.join(self.directory, "projects.json")))
+        self.auth = Authenticator(self.manager)
+
+    def test_passwords_are_always_hashed(self):
+        self.manager.create_user("eve", HASH_LIKE, "eve@example.com")
+        stored = self.manager.users["eve"].password
+        self.assertNotEqual(stored, HASH_LIKE)
+        self.assertTrue(is_password_hash(stored))
+        self.assertIsNotNone(self.auth.login("eve", HASH_LIKE))
+
+        self.manager.save_data()
+        self.journal.close()
+        for name in ("users.json", "journal.log"):
+            with open(os.path.join(self.directory, name)) as data_file:
+                self.assertNotIn(HASH_LIKE, data_file.read())
+
+    def test_replay_and_precomputed_hashes_are_stored_as_given(self):
+        password_hash = hash_password("password")
+        self.manager.create_user("alice", None, "alice@example.com", password_hash=password_hash)
+        self.assertEqual(self.manager.users["alice"].password, password_hash)
+        self.manager.create_user("bob", "password", "bob@example.com")
+        self.journal.close()
+
+        recovered = ProjectManager(journal=Journal(self.journal.log_path, self.journal.snapshot_path))
+        self.addCleanup(recovered.journal.close)
+        recovered.recover()
+        for username in ("alice", "bob"):
+            self.assertEqual(recovered.users[username].password, self.manager.users[username].password)
+
+    def test_login_rehashes_legacy_plaintext(self):
+        self.manager._restore_users([("old", "plaintext", "old@example.com")])
+        self.assertIsNone(self.auth.login("old", "wrong"))
+        self.assertEqual(self.manager.users["old"].password, "plaintext")
+
+        self.assertIsNotNone(self.auth.login("old", "plaintext"))
+        stored = self.manager.users["old"].password
+        self.assertTrue(is_password_hash(stored))
+        self.assertTrue(verify_password("plaintext", stored))
+        self.assertIsNotNone(self.auth.login("old", "plaintext"))
+        self.assertEqual(self.manager.users["old"].password, stored)
+
+    def test_change_password_revokes_sessions(self):
+        self.manager.create_user("alice", "password", "alice@example.com")
+        token = self.auth.login("alice", "password")
+        self.assertFalse(self.auth.change_password("alice", "wrong", "new password"))
+        self.assertEqual(self.auth.authenticate(token), "alice")
+        self.assertTrue(self.auth.change_password("alice", "password", "new password"))
+        self.assertIsNone(self.auth.authenticate(token))
+        self.assertIsNone(self.auth.login("alice", "password"))
+        self.assertIsNotNone(self.auth.login("alice", "new password"))
+
+    def test_shard_router_hashes_once_for_every_shard(self):
+        storage_factory = functools.partial(shard_storage, directory=self.directory)
+        with ShardedProjectManager(2, storage_factory) as router:
+            router.create_user("eve", HASH_LIKE, "eve@example.com")
+            stored = [users["eve"].password for users in router._broadcast('users')]
+        self.assertEqual(stored[0], stored[1])
+        self.assertTrue(verify_password(HASH_LIKE, stored[0]))
+
+
+class TestSessionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.sessions = SessionCache(ttl=10, max_sessions=3, clock=self.clock)
+
+    def test_sessions_expire_after_ttl(self):
+        first = self.sessions.create("alice")
+        self.clock.now = 5
+        second = self.sessions.create("bob")
+        self.assertEqual(self.sessions.get(first), "alice")
+        self.clock.now = 10
+        self.assertIsNone(self.sessions.get(first))
+        self.assertEqual(self.sessions.get(second), "bob")
+        self.assertEqual(len(self.sessions), 1)
+        self.clock.now = 15
+        self.assertIsNone(self.sessions.get(second))
+        self.assertEqual(len(self.sessions), 0)
+
+    def test_oldest_sessions_are_dropped_beyond_max_sessions(self):
+        tokens = [self.sessions.create(f"user{i}") for i in range(5)]
+        self.assertEqual(len(self.sessions), 3)
+        self.assertEqual([self.sessions.get(token) for token in tokens], [None, None, "user2", "user3", "user4"])
+
+    def test_revoke(self):
+        alice = [self.sessions.create("alice") for _ in range(2)]
+        bob = self.sessions.create("bob")
+        self.sessions.revoke_user("alice")
+        self.assertEqual([self.sessions.get(token) for token in alice], [None, None])
+        self.sessions.revoke(bob)
+        self.assertIsNone(self.sessions.get(bob))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import random
+import sys
+import threading
+import unittest
+
+from projectmanager import ProjectManager, Priority, Status
+
+
+class TestConcurrentProjectManager(unittest.TestCase):
+
+    def setUp(self):
+        self.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.manager = ProjectManager()
+        self.users = [f"user{i}" for i in range(8)]
+        for user in self.users:
+            self.manager.create_user(user, "password", f"{user}@example.com")
+        self.task_ids = {}
+        for p in range(4):
+            title = f"Project {p}"
+            self.manager.create_project(title, self.users[0])
+            for user in self.users[1:]:
+                self.manager.add_member_to_project(title, user)
+            self.task_ids[title] = [self.manager.create_task(title, f"Task {t}", "Description", []).id
+                                    for t in range(20)]
+
+    def tearDown(self):
+        sys.setswitchinterval(self.switch_interval)
+
+    def worker(self, seed, comments):
+        rng = random.Random(seed)
+        for _ in range(500):
+            title = rng.choice(list(self.task_ids))
+            task_id = rng.choice(self.task_ids[title])
+            user = rng.choice(self.users)
+            action = rng.randrange(5)
+            if action == 0:
+                self.manager.assign_task_to_member(title, task_id, user)
+            elif action == 1:
+                self.manager.unassign_task_from_member(None, task_id, user)
+            elif action == 2:
+                self.manager.change_task_status(title, task_id, rng.choice(list(Status)))
+            elif action == 3:
+                self.manager.change_task_priority(None, task_id, rng.choice(list(Priority)))
+            else:
+                self.manager.add_comment_to_task(title, task_id, "comment", user)
+                comments[task_id] = comments.get(task_id, 0) + 1
+            self.manager.view_tasks_in_project(title)
+
+    def test_concurrent_mutations_keep_indexes_consistent(self):
+        per_thread = [{} for _ in range(8)]
+        threads = [threading.Thread(target=self.worker, args=(seed, per_thread[seed])) for seed in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        index = self.manager.index
+        for title, task_ids in self.task_ids.items():
+            for task_id in task_ids:
+                task = self.manager.find_task(task_id, title)
+                expected_comments = sum(comments.get(task_id, 0) for comments in per_thread)
+                self.assertEqual(len(task.comments), expected_comments)
+                self.assertIn(task, index.by_status[(title, task.status)])
+                self.assertIn(task, index.by_status[(None, task.status)])
+                self.assertIn(task, index.by_priority[(title, task.priority)])
+                for user in self.users:
+                    self.assertEqual(user in task.assigned_to, task in index.by_assignee.get(user, {}))
+
+        all_tasks = sum(len(task_ids) for task_ids in self.task_ids.values())
+        self.assertEqual(len(self.manager.tasks), all_tasks)
+        self.assertEqual(sum(len(bucket) for (scope, _), bucket in index.by_status.items() if scope is None),
+                         all_tasks)
+
+    def test_history_reads_wait_for_compaction(self):
+        title = "Project 0"
+        task = self.manager.find_task(self.task_ids[title][0], title)
+        self.manager.create_project("Scratch", self.users[0])
+        scratch = [self.manager.create_task("Scratch", f"Scratch {t}", "", []).id for t in range(50)]
+        for task_id in scratch:
+            self.manager.change_task_priority("Scratch", task_id, Priority.HIGH)
+        # Compaction moves the task's event from behind the scratch events
+        # to the front of the log.
+        self.manager.change_task_status(title, task.id, Status.DOING)
+        self.manager.archive_tasks("Scratch", scratch)
+
+        resume = threading.Event()
+
+        def live_tasks():
+            # Pauses compaction after renumbering the task but before the
+            # new columns are in place.
+            yield task
+            resume.wait(5)
+
+        compaction = threading.Thread(target=self.manager.history.compact, args=(live_tasks(),))
+        compaction.start()
+        histories = []
+        reader = threading.Thread(target=lambda: histories.append(self.manager.view_task_history(title, task.id)))
+        reader.start()
+        reader.join(0.1)
+        resume.set()
+        compaction.join()
+        reader.join()
+        self.assertEqual([(event["kind"], event["old"], event["new"]) for event in histories[0]],
+                         [("STATUS", "BACKLOG", "DOING")])
+
+if __name__ == '__main__':
+    unittest.main()
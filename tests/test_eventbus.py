@@ -0,0 +1,218 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from asyncservice import AsyncProjectManager
+from eventbus import EventBus
+from journal import Journal
+from projectmanager import ProjectManager, Status
+
+
+def kinds(subscription):
+    return [event.kind for event in subscription.get_batch(max_items=1000, timeout=0)]
+
+
+class TestSubscriptionFilters(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = ProjectManager()
+        for user in ("alice", "bob", "carol"):
+            self.manager.create_user(user, "password", f"{user}@example.com")
+        self.manager.create_project("Project A", "alice")
+        self.manager.create_project("Project B", "alice")
+        for project in ("Project A", "Project B"):
+            self.manager.add_member_to_project(project, "bob")
+
+    def test_filters_by_project_user_and_kind(self):
+        by_project = self.manager.events.subscribe(projects=["Project A"])
+        by_user = self.manager.events.subscribe(users=["bob"])
+        by_kind = self.manager.events.subscribe(kinds=["change_task_status"])
+        combined = self.manager.events.subscribe(projects=["Project B"], users=["bob"], kinds=["change_task_status"])
+
+        task_a = self.manager.create_task("Project A", "Task A", "", ["bob"])
+        task_b = self.manager.create_task("Project B", "Task B", "", [])
+        self.manager.change_task_status("Project A", task_a.id, Status.DOING)
+        self.manager.change_task_status("Project B", task_b.id, Status.DOING)
+        self.manager.add_comment_to_task("Project B", task_b.id, "A comment", "bob")
+        self.manager.add_member_to_project("Project B", "carol")
+
+        self.assertEqual(kinds(by_project), ["create_task", "change_task_status"])
+        # Events on bob's task concern him, as do his own comments.
+        self.assertEqual(kinds(by_user), ["create_task", "change_task_status", "add_comment_to_task"])
+        self.assertEqual(kinds(by_kind), ["change_task_status", "change_task_status"])
+        self.assertEqual(kinds(combined), [])
+        self.manager.assign_task_to_member("Project B", task_b.id, "bob")
+        self.manager.change_task_status("Project B", task_b.id, Status.DONE)
+        self.assertEqual([(event.project, event.task_id) for event in combined.get_batch(timeout=0)],
+                         [("Project B", task_b.id)])
+
+    def test_closed_subscription_receives_nothing(self):
+        subscription = self.manager.events.subscribe()
+        subscription.close()
+        self.manager.create_task("Project A", "Task", "", [])
+        self.assertFalse(self.manager.events.active)
+        self.assertEqual(subscription.get_batch(timeout=0), [])
+
+
+class TestOverflow(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = EventBus()
+
+    def publish(self, count):
+        for number in range(count):
+            self.bus.publish('change_task_status', 'Project', str(number))
+
+    def test_drop_oldest_keeps_the_newest_events(self):
+        subscription = self.bus.subscribe(maxsize=3, overflow='drop_oldest')
+        self.publish(5)
+        self.assertEqual(subscription.dropped, 2)
+        self.assertEqual([event.seq for event in subscription.get_batch(timeout=0)], [3, 4, 5])
+
+    def test_drop_newest_keeps_the_oldest_events(self):
+        subscription = self.bus.subscribe(maxsize=3, overflow='drop_newest')
+        self.publish(5)
+        self.assertEqual(subscription.dropped, 2)
+        self.assertEqual([event.seq for event in subscription.get_batch(timeout=0)], [1, 2, 3])
+
+    def test_block_drops_after_the_timeout(self):
+        subscription = self.bus.subscribe(maxsize=3, overflow='block', block_timeout=0.05)
+        started = time.monotonic()
+        self.publish(5)
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+        self.assertEqual(subscription.dropped, 2)
+        self.assertEqual([event.seq for event in subscription.get_batch(timeout=0)], [1, 2, 3])
+
+    def test_block_waits_for_the_consumer(self):
+        subscription = self.bus.subscribe(maxsize=2, overflow='block', block_timeout=None)
+        received = []
+
+        def consume():
+            while len(received) < 50:
+                received.extend(event.seq for event in subscription.get_batch(max_items=1, timeout=5))
+
+        consumer = threading.Thread(target=consume)
+        consumer.start()
+        self.publish(50)
+        consumer.join(5)
+        self.assertEqual(subscription.dropped, 0)
+        self.assertEqual(received, list(range(1, 51)))
+
+    def test_policies_only_apply_to_their_own_subscription(self):
+        small = self.bus.subscribe(maxsize=1, overflow='drop_newest')
+        large = self.bus.subscribe(maxsize=10)
+        self.publish(5)
+        self.assertEqual((small.dropped, large.dropped), (4, 0))
+        self.assertEqual(len(large), 5)
+
+    def test_unknown_policy_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.bus.subscribe(overflow='drop_all')
+
+
+class TestOrdering(unittest.TestCase):
+
+    def test_seq_order_across_threads(self):
+        manager = ProjectManager()
+        manager.create_user("alice", "password", "alice@example.com")
+        for number in range(4):
+            manager.create_project(f"Project {number}", "alice")
+        subscription = manager.events.subscribe(maxsize=10000)
+        received = []
+        done = threading.Event()
+
+        def consume():
+            while not done.is_set() or len(subscription):
+                received.extend(subscription.get_batch(max_items=7, timeout=0.01))
+
+        def work(project):
+            for number in range(100):
+                task = manager.create_task(project, f"Task {number}", "", [])
+                manager.change_task_status(project, task.id, Status.DOING)
+
+        consumer = threading.Thread(target=consume)
+        consumer.start()
+        workers = [threading.Thread(target=work, args=(f"Project {number}",)) for number in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        done.set()
+        consumer.join(5)
+
+        self.assertEqual(subscription.dropped, 0)
+        self.assertEqual([event.seq for event in received], list(range(1, 801)))
+        for number in range(4):
+            events = [event for event in received if event.project == f"Project {number}"]
+            # A task's status change always follows its creation.
+            created = set()
+            for event in events:
+                if event.kind == 'create_task':
+                    created.add(event.task_id)
+                else:
+                    self.assertIn(event.task_id, created)
+
+
+class TestReplay(unittest.TestCase):
+
+    def test_replay_publishes_nothing(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        paths = (os.path.join(directory.name, "journal.log"), os.path.join(directory.name, "snapshot.json"))
+        manager = ProjectManager(journal=Journal(*paths))
+        manager.create_user("alice", "password", "alice@example.com")
+        manager.create_project("Project", "alice")
+        task = manager.create_task("Project", "Task", "", ["alice"])
+        manager.change_task_status("Project", task.id, Status.DONE)
+        manager.journal.close()
+
+        recovered = ProjectManager(journal=Journal(*paths))
+        self.addCleanup(recovered.journal.close)
+        subscription = recovered.events.subscribe()
+        recovered.recover()
+        self.assertIs(recovered.find_task(task.id, "Project").status, Status.DONE)
+        self.assertEqual(subscription.get_batch(timeout=0), [])
+
+        recovered.change_task_status("Project", task.id, Status.DOING)
+        self.assertEqual([(event.seq, event.kind) for event in subscription.get_batch(timeout=0)],
+                         [(1, 'change_task_status')])
+
+
+class TestAsyncBatches(unittest.TestCase):
+
+    def test_batches_deliver_every_event_in_order(self):
+        async def run():
+            service = AsyncProjectManager()
+            await service.create_user("alice", "password", "alice@example.com")
+            await service.create_project("Project", "alice")
+            subscription = service.subscribe(projects=["Project"])
+            received = []
+
+            async def consume():
+                async for batch in subscription.batches(max_items=3):
+                    self.assertLessEqual(len(batch), 3)
+                    received.extend(batch)
+
+            consumer = asyncio.ensure_future(consume())
+            for number in range(10):
+                await service.create_task("Project", f"Task {number}", "", [])
+
+            async def settle():
+                while len(received) < 10:
+                    await asyncio.sleep(0.01)
+
+            await asyncio.wait_for(settle(), 5)
+            subscription.close()
+            await asyncio.wait_for(consumer, 5)
+            return received
+
+        received = asyncio.run(run())
+        self.assertEqual([event.kind for event in received], ['create_task'] * 10)
+        self.assertEqual([event.seq for event in received], list(range(1, 11)))
+
+
+if __name__ == '__main__':
+    unittest.main()
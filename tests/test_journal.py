@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+from journal import Journal
+from projectmanager import ProjectManager, Priority, Status
+
+
+class TestJournalRecovery(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.log_path = os.path.join(directory.name, "journal.log")
+        self.snapshot_path = os.path.join(directory.name, "snapshot.json")
+        self.manager = self.open_manager()
+        self.manager.create_user("alice", "password", "alice@example.com")
+        self.manager.create_user("bob", "password", "bob@example.com")
+        self.manager.create_project("Project", "alice")
+        self.manager.add_member_to_project("Project", "bob")
+        self.task_id = self.manager.create_task("Project", "Task", "Description", ["bob"]).id
+        self.manager.change_task_status("Project", self.task_id, Status.DOING)
+
+    def open_manager(self, compact_every=10000):
+        manager = ProjectManager(journal=Journal(self.log_path, self.snapshot_path, compact_every))
+        self.addCleanup(manager.journal.close)
+        return manager
+
+    def recovered(self):
+        self.manager.journal.close()
+        manager = self.open_manager()
+        manager.recover()
+        return manager
+
+    def test_truncated_record_is_dropped(self):
+        self.manager.journal.close()
+        complete = os.path.getsize(self.log_path)
+        self.manager.change_task_status("Project", self.task_id, Status.DONE)
+        self.manager.journal.close()
+        written = os.path.getsize(self.log_path)
+        with open(self.log_path, "r+b") as log_file:
+            log_file.truncate(complete + (written - complete) // 2)
+
+        manager = self.recovered()
+        task = manager.find_task(self.task_id, "Project")
+        self.assertEqual(task.status, Status.DOING)
+        self.assertEqual(task.assigned_to, ["bob"])
+        self.assertEqual(manager.projects["Project"].members.keys(), {"alice", "bob"})
+        self.assertEqual(os.path.getsize(self.log_path), complete)
+
+        # Records appended after the cut are replayed on the next recovery.
+        manager.change_task_priority("Project", self.task_id, Priority.HIGH)
+        self.manager = manager
+        task = self.recovered().find_task(self.task_id, "Project")
+        self.assertEqual((task.status, task.priority), (Status.DOING, Priority.HIGH))
+
+    def test_recovery_replays_records_after_the_snapshot(self):
+        self.manager.compact()
+        self.manager.add_comment_to_task("Project", self.task_id, "After the snapshot", "bob")
+
+        manager = self.recovered()
+        task = manager.find_task(self.task_id, "Project")
+        self.assertEqual(task.status, Status.DOING)
+        self.assertEqual(task.comments, [{"user": "bob", "comment": "After the snapshot"}])
+        history = manager.view_task_history("Project", self.task_id)
+        self.assertEqual([(event["kind"], event.get("new")) for event in history],
+                         [("STATUS", "DOING"), ("COMMENT", None)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import json
+import os
+import tempfile
+import unittest
+
+from jsonstream import JSONSource, iter_json_object, iter_json_projects
+
+
+class TestJSONStream(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "data.json")
+
+    def write(self, data, **kwargs):
+        with open(self.path, "w", encoding="utf-8") as data_file:
+            json.dump(data, data_file, **kwargs)
+
+    def test_iter_json_object_matches_json_load(self):
+        documents = [
+            {},
+            {"a": 1, "b": 2.5, "c": -3e10},
+            {"ünïcode ✓": {"password": "pässword", "email": "e@example.com"}, "plain": "x" * 100},
+            {"nested": [1, [2, {"3": None}], True, False], "escaped": "quote \" and \\ and \n"},
+        ]
+        for document in documents:
+            for kwargs in ({}, {"indent": 4}, {"ensure_ascii": False}):
+                with self.subTest(document=document, kwargs=kwargs):
+                    self.write(document, **kwargs)
+                    # Small chunks split keys, values and characters across reads.
+                    self.assertEqual(dict(iter_json_object(self.path, chunk_size=3)), document)
+
+    def test_iter_json_object_rejects_malformed_input(self):
+        for text in ("[1, 2]", '{"a": 1', '{"a" 1}'):
+            with self.subTest(text=text):
+                with open(self.path, "w") as data_file:
+                    data_file.write(text)
+                with self.assertRaises(ValueError):
+                    list(iter_json_object(self.path))
+
+    def test_iter_json_projects_keeps_task_spans(self):
+        projects = {
+            "Prøject ✓": {"creator": "ålice", "members": ["ålice"], "tasks": [
+                {f"id-{i}": {"title": f"Tâsk {i}", "comments": [{"user": "ålice", "comment": "✓" * i}]}}
+                for i in range(20)]},
+            "Empty": {"creator": "bob", "members": ["bob"], "tasks": []},
+        }
+        for kwargs in ({"indent": 4}, {"ensure_ascii": False}):
+            with self.subTest(kwargs=kwargs):
+                self.write(projects, **kwargs)
+                source = JSONSource(self.path)
+                self.addCleanup(source.close)
+                loaded = dict(iter_json_projects(source, chunk_size=5))
+                self.assertEqual(list(loaded), list(projects))
+                for title, data in projects.items():
+                    self.assertEqual(loaded[title]["creator"], data["creator"])
+                    self.assertEqual(loaded[title]["task_ids"], [task_id for entry in data["tasks"] for task_id in entry])
+                    self.assertEqual(len(loaded[title]["tasks"]), len(data["tasks"]))
+                    self.assertEqual(list(loaded[title]["tasks"]), data["tasks"])
+
+
+if __name__ == '__main__':
+    unittest.main()
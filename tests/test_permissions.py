@@ -0,0 +1,96 @@
+import unittest
+from unittest.mock import patch
+
+import projectmanager
+from projectmanager import ProjectManager, Role, Status
+
+
+class TestPermissions(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = ProjectManager()
+        for user in ("alice", "bob", "carol", "mallory"):
+            self.manager.create_user(user, "password", f"{user}@example.com")
+        self.manager.create_project("Project", "alice")
+        self.manager.add_member_to_project("Project", "bob")
+        self.manager.add_member_to_project("Project", "carol")
+        self.task = self.manager.create_task("Project", "Task", "Description", ["bob"])
+
+    def members(self):
+        return dict(self.manager.projects["Project"].members)
+
+    def test_only_managers_change_membership(self):
+        self.manager.add_member_to_project("Project", "mallory", actor="bob")
+        self.manager.add_member_to_project("Project", "mallory", actor="mallory")
+        self.assertNotIn("mallory", self.members())
+        self.manager.set_member_role("Project", "carol", Role.ADMIN, actor="bob")
+        self.assertIs(self.members()["carol"], Role.MEMBER)
+
+        self.manager.set_member_role("Project", "bob", Role.ADMIN, actor="alice")
+        self.manager.add_member_to_project("Project", "mallory", actor="bob")
+        self.manager.remove_member_from_project("Project", "carol", actor="bob")
+        self.assertEqual(self.members(), {"alice": Role.CREATOR, "bob": Role.ADMIN, "mallory": Role.MEMBER})
+        self.assertEqual(self.manager.projects_of_user("bob"), {"Project": "ADMIN"})
+
+    def test_creator_cannot_be_removed_or_demoted(self):
+        self.manager.set_member_role("Project", "bob", Role.ADMIN)
+        self.manager.remove_member_from_project("Project", "alice", actor="bob")
+        self.manager.remove_member_from_project("Project", "alice")
+        self.manager.set_member_role("Project", "alice", Role.MEMBER, actor="bob")
+        self.manager.set_member_role("Project", "carol", Role.CREATOR)
+        self.assertIs(self.members()["alice"], Role.CREATOR)
+        self.assertIs(self.members()["carol"], Role.MEMBER)
+
+    def test_only_the_creator_deletes_the_project(self):
+        self.manager.set_member_role("Project", "bob", Role.ADMIN)
+        self.manager.delete_project("Project", actor="bob")
+        self.assertIn("Project", self.manager.projects)
+        self.manager.delete_project("Project", actor="alice")
+        self.assertNotIn("Project", self.manager.projects)
+
+    def test_non_members_cannot_change_tasks(self):
+        for actor in ("mallory", "nobody"):
+            self.manager.change_task_status("Project", self.task.id, Status.DONE, actor=actor)
+            self.manager.add_comment_to_task("Project", self.task.id, "comment", actor, actor=actor)
+            self.manager.assign_task_to_member("Project", self.task.id, "carol", actor=actor)
+            self.assertIsNone(self.manager.create_task("Project", "Other", "", [], actor=actor))
+            self.assertEqual(self.manager.archive_tasks("Project", [self.task.id], actor=actor), 0)
+        self.assertEqual((self.task.status, self.task.comments, self.task.assigned_to), (Status.BACKLOG, [], ["bob"]))
+
+        self.manager.change_task_status("Project", self.task.id, Status.DONE, actor="carol")
+        self.assertIs(self.task.status, Status.DONE)
+
+    def test_duplicate_project_title_is_refused(self):
+        self.manager.create_project("Project", "mallory")
+        project = self.manager.projects["Project"]
+        self.assertEqual(project.creator, "alice")
+        self.assertEqual([task.id for task in project.tasks], [self.task.id])
+
+    def test_assignees_must_be_members(self):
+        self.assertIsNone(self.manager.create_task("Project", "Other", "", ["mallory"]))
+        self.manager.assign_task_to_member("Project", self.task.id, "mallory")
+        self.assertEqual(self.task.assigned_to, ["bob"])
+        created = self.manager.create_tasks_bulk("Project", [{"title": "Bulk 1", "assigned_to": ["nobody"]},
+                                                             {"title": "Bulk 2", "assigned_to": ["carol", "carol"]}])
+        self.assertEqual(created, 1)
+        bulk = [task for task in self.manager.projects["Project"].tasks if task.title.startswith("Bulk")]
+        self.assertEqual([(task.title, task.assigned_to) for task in bulk], [("Bulk 2", ["carol"])])
+
+    def test_console_drops_blank_assignee_names(self):
+        for answer, assigned_to in (("", []), ("bob, carol ,", ["bob", "carol"])):
+            with self.subTest(answer=answer):
+                answers = iter(["5", "Project", f"Console {answer!r}", "Description", answer, "low", "todo", "14"])
+                with patch.object(projectmanager, "ProjectManager", return_value=self.manager), \
+                        patch.object(projectmanager, "configure_logging"), \
+                        patch.object(self.manager, "load_data"), \
+                        patch.object(self.manager, "save_data"), \
+                        patch("builtins.input", lambda prompt="": next(answers)), \
+                        patch("builtins.print"):
+                    projectmanager.main()
+                task = next(task for task in self.manager.projects["Project"].tasks
+                            if task.title == f"Console {answer!r}")
+                self.assertEqual(task.assigned_to, assigned_to)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import json
+import os
+import tempfile
+import unittest
+import uuid
+from unittest.mock import patch
+
+from projectmanager import ProjectManager, Priority, Status
+from storage import JSONStorage
+
+
+class TestProjectManager(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = ProjectManager()
+        for user in ("admin", "user1", "user2"):
+            self.manager.create_user(user, "password1", f"{user}@example.com")
+
+    def test_create_user(self):
+        self.manager.create_user("user3", "password1", "user3@example.com")
+        self.assertIn("user3", self.manager.users)
+
+    def test_create_project(self):
+        self.manager.create_project("Project 1", "user1")
+        self.assertIn("Project 1", self.manager.projects)
+
+    def test_add_member_to_project(self):
+        self.manager.create_project("Project 1", "user1")
+        self.manager.add_member_to_project("Project 1", "user2")
+        self.assertIn("user2", self.manager.projects["Project 1"].members)
+
+    def test_create_task(self):
+        for project_title, title, description, assigned_to, priority, status in [
+            ("Project 1", "Task 1", "Description 1", ["user1"], Priority.LOW, Status.BACKLOG),
+            ("Project 2", "Task 2", "Description 2", ["user2"], Priority.HIGH, Status.TODO),
+        ]:
+            with self.subTest(project_title=project_title):
+                self.manager.create_project(project_title, "admin")
+                self.manager.add_member_to_project(project_title, assigned_to[0])
+                self.manager.create_task(project_title, title, description, assigned_to, priority, status)
+                self.assertTrue(any(task.title == title for task in self.manager.projects[project_title].tasks))
+
+    @patch('projectmanager.uuid.uuid4')
+    def test_create_task_unique_id(self, mock_uuid4):
+        mock_uuid4.return_value = uuid.UUID(int=1234)
+        self.manager.create_project("Project 1", "admin")
+        self.manager.add_member_to_project("Project 1", "user1")
+        self.manager.create_task("Project 1", "Task 1", "Description 1", ["user1"])
+        self.assertEqual(self.manager.projects["Project 1"].tasks[0].id, str(uuid.UUID(int=1234)))
+
+    def test_create_task_rejects_a_task_id_in_use(self):
+        self.manager.create_project("Project 1", "admin")
+        self.manager.create_project("Project 2", "admin")
+        task = self.manager.create_task("Project 1", "Task 1", "Description 1", [])
+        archived = self.manager.create_task("Project 1", "Task 2", "Description 2", [])
+        self.manager.archive_tasks("Project 1", [archived.id])
+        for task_id in (task.id, archived.id):
+            self.assertIsNone(self.manager.create_task("Project 2", "Copy", "Description", [], task_id=task_id))
+        self.assertIs(self.manager.find_task(task.id), task)
+        self.assertEqual(self.manager.get_task_project(task.id), "Project 1")
+        self.assertEqual(self.manager.projects["Project 2"].tasks, [])
+        self.assertEqual(self.manager.board_stats("Project 2")["tasks"], 0)
+
+    def test_archive_stale_tasks_skips_tasks_of_unknown_age(self):
+        # A DONE task as written before tasks had a created time or history.
+        legacy_id = str(uuid.uuid4())
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "projects.json"), "w") as projects_file:
+                json.dump({"Project 1": {"creator": "admin", "members": ["admin"], "tasks": [{legacy_id: {
+                    "title": "Legacy", "description": "", "assigned_to": [], "priority": "LOW", "status": "DONE",
+                    "comments": []}}]}}, projects_file)
+            self.manager.storage = JSONStorage(os.path.join(directory, "users.json"),
+                                               os.path.join(directory, "projects.json"))
+            self.manager.load_data()
+            fresh = self.manager.create_task("Project 1", "Fresh", "", [], status=Status.DONE)
+
+            self.assertEqual(self.manager.archive_stale_tasks("Project 1", done_days=30), 0)
+            # A cutoff in the future makes every DONE task of known age stale.
+            self.assertEqual(self.manager.archive_stale_tasks("Project 1", done_days=-1), 1)
+            self.assertIsNotNone(self.manager.find_task(legacy_id, "Project 1"))
+            self.assertIsNone(self.manager.find_task(fresh.id, "Project 1"))
+            self.manager.storage.close()
+
+
+class TestTaskPages(unittest.TestCase):
+
+    ORDERS = {
+        "created": lambda task: task.seq,
+        "priority": lambda task: (task.priority.value, task.seq),
+        "status": lambda task: (task.status.value, task.seq),
+    }
+
+    def setUp(self):
+        self.manager = ProjectManager()
+        self.manager.create_user("admin", "password1", "admin@example.com")
+        self.manager.create_project("Project 1", "admin")
+        priorities, statuses = list(Priority), list(Status)
+        for number in range(23):
+            self.manager.create_task("Project 1", f"Task {number}", "", [], priorities[number * 7 % len(priorities)],
+                                     statuses[number * 5 % len(statuses)])
+
+    def page_ids(self, order_by, limit, between_pages=None):
+        ids, cursor = [], None
+        while True:
+            page = self.manager.view_tasks_page("Project 1", limit, cursor, order_by, ["Task ID"])
+            self.assertLessEqual(len(page["tasks"]), limit)
+            ids.extend(row["Task ID"] for row in page["tasks"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return ids
+            if between_pages is not None:
+                between_pages()
+
+    def expected_ids(self, order_by):
+        return [task.id for task in sorted(self.manager.projects["Project 1"].tasks, key=self.ORDERS[order_by])]
+
+    def test_pages_cover_every_task_once_in_each_order(self):
+        for order_by in self.ORDERS:
+            for limit in (1, 4, 23, 50):
+                with self.subTest(order_by=order_by, limit=limit):
+                    self.assertEqual(self.page_ids(order_by, limit), self.expected_ids(order_by))
+
+    def test_tasks_created_between_pages_are_not_skipped(self):
+        # Created last with the last priority and status, so they sort after
+        # every cursor in each order.
+        def create():
+            self.manager.create_task("Project 1", "Late", "", [], Priority.LOW, Status.ARCHIVED)
+
+        for order_by in self.ORDERS:
+            with self.subTest(order_by=order_by):
+                ids = self.page_ids(order_by, 5, create)
+                self.assertEqual(len(ids), len(set(ids)))
+                self.assertEqual(ids, self.expected_ids(order_by))
+
+    def test_cursor_of_another_order_is_rejected(self):
+        cursor = self.manager.view_tasks_page("Project 1", 5, order_by="status")["next_cursor"]
+        self.assertEqual(self.manager.view_tasks_page("Project 1", 5, cursor, "priority"),
+                         {"tasks": [], "next_cursor": None})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+
+from projectmanager import ProjectManager
+from storage import JSONStorage
+
+
+def titles(results):
+    return [row["Title"] for row in results]
+
+
+class TestSearchTasks(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = ProjectManager()
+        for user in ("alice", "bob"):
+            self.manager.create_user(user, "password", f"{user}@example.com")
+        self.manager.create_project("Project 1", "alice")
+        self.manager.create_project("Project 2", "alice")
+        self.manager.add_member_to_project("Project 1", "bob")
+        self.create("Project 1", "Fix login page", "The quick brown fox breaks the login form", ["bob"])
+        self.create("Project 1", "Search results", "Results are slow for long queries", [])
+        self.create("Project 1", "Fox logo", "A brown logo with a quick fox", [])
+        self.create("Project 2", "Searching docs", "Document the quick search syntax", [])
+        comment = self.create("Project 2", "Cleanup", "Remove dead code", [])
+        self.manager.add_comment_to_task("Project 2", comment, "Mention the login flow too", "alice")
+
+    def create(self, project, title, description, assigned_to):
+        return self.manager.create_task(project, title, description, assigned_to).id
+
+    def search(self, query, **kwargs):
+        return sorted(titles(self.manager.search_tasks(query, **kwargs)))
+
+    def test_terms_must_all_match(self):
+        self.assertEqual(self.search("login"), ["Cleanup", "Fix login page"])
+        self.assertEqual(self.search("LOGIN form"), ["Fix login page"])
+        self.assertEqual(self.search("quick"), ["Fix login page", "Fox logo", "Searching docs"])
+        self.assertEqual(self.search("login missing"), [])
+
+    def test_prefix_matches_every_completion(self):
+        self.assertEqual(self.search("search*"), ["Search results", "Searching docs"])
+        self.assertEqual(self.search("log*"), ["Cleanup", "Fix login page", "Fox logo"])
+        self.assertEqual(self.search("log* brown"), ["Fix login page", "Fox logo"])
+        self.assertEqual(self.search("zzz*"), [])
+
+    def test_phrase_needs_adjacent_terms_in_order(self):
+        self.assertEqual(self.search('"quick brown fox"'), ["Fix login page"])
+        self.assertEqual(self.search('"quick fox"'), ["Fox logo"])
+        self.assertEqual(self.search('"fox quick"'), [])
+        self.assertEqual(self.search('"quick search" syntax'), ["Searching docs"])
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(titles(self.manager.search_tasks("fox")), ["Fox logo", "Fix login page"])
+
+    def test_filters_by_project_and_user(self):
+        self.assertEqual(self.search("quick", project_title="Project 2"), ["Searching docs"])
+        self.assertEqual(self.search("quick", user="bob"), ["Fix login page"])
+
+    def test_archived_tasks_are_not_found(self):
+        task_id = self.manager.search_tasks('"fox logo"')[0]["Task ID"]
+        self.manager.archive_tasks("Project 1", [task_id])
+        self.assertEqual(self.search("fox"), ["Fix login page"])
+
+    def test_index_is_rebuilt_without_a_stored_index(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        paths = [os.path.join(directory.name, name) for name in (
+            "users.json", "projects.json", "admin_data.json", "search_index.json", "archive.json")]
+        self.manager.storage = JSONStorage(*paths)
+        self.manager.save_data()
+        os.remove(paths[3])
+
+        loaded = ProjectManager(storage=JSONStorage(*paths))
+        self.addCleanup(loaded.storage.close)
+        loaded.load_data()
+        # Built from the stored task data without loading any project.
+        self.assertEqual(len(loaded.search_index), 5)
+        for project in loaded.projects.values():
+            self.assertIsNotNone(project.pending_tasks)
+        for query in ("login", "search*", '"quick brown fox"', "fox"):
+            with self.subTest(query=query):
+                self.assertEqual(titles(loaded.search_tasks(query)), titles(self.manager.search_tasks(query)))
+        self.assertEqual(titles(loaded.search_tasks("quick", project_title="Project 2")), ["Searching docs"])
+
+
+if __name__ == '__main__':
+    unittest.main()
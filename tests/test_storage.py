@@ -0,0 +1,143 @@
+import os
+import tempfile
+import unittest
+
+from projectmanager import ProjectManager, Priority, Role, Status
+from storage import BinaryStorage, JSONStorage, SQLiteStorage, convert_storage
+
+
+def board(manager):
+    # Everything a storage backend has to keep, in comparable form.
+    users = {user.username: (user.password, user.email) for user in manager.users.values()}
+    projects = {title: (project.creator, {user: role.name for user, role in project.members.items()})
+                for title, project in manager.projects.items()}
+    tasks = sorted(manager.iter_task_records(), key=lambda record: record["id"])
+    return users, projects, tasks
+
+
+class TestStorageRoundTrip(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def json_storage(self, prefix=""):
+        return JSONStorage(*(self.path(prefix + name) for name in (
+            "users.json", "projects.json", "admin_data.json", "search_index.json", "archive.json")))
+
+    def fill(self, manager):
+        manager.create_user("alice", "password", "alice@example.com")
+        manager.create_user("bob", "password", "bob@example.com")
+        manager.create_user("carol", "password", "carol@example.com")
+        manager.create_project("Project", "alice")
+        manager.create_project("Pröject ✓", "bob")
+        manager.add_member_to_project("Project", "bob")
+        manager.add_member_to_project("Project", "carol")
+        manager.set_member_role("Project", "bob", Role.ADMIN)
+        task_ids = [manager.create_task("Project", f"Task {t}", f"Description {t}", ["bob"] if t % 2 else [],
+                                        Priority.HIGH if t % 3 else Priority.LOW).id for t in range(10)]
+        manager.create_task("Pröject ✓", "Tâsk ✓", "Ünicode", ["bob"])
+        manager.change_task_status("Project", task_ids[0], Status.DOING)
+        manager.change_task_status("Project", task_ids[1], Status.DONE)
+        manager.assign_task_to_member("Project", task_ids[2], "carol")
+        manager.add_comment_to_task("Project", task_ids[3], "A comment", "carol")
+        manager.archive_tasks("Project", task_ids[4:6])
+        return task_ids
+
+    def assertLoadsSame(self, manager, storage):
+        loaded = ProjectManager(storage=storage)
+        loaded.load_data()
+        self.assertEqual(board(loaded), board(manager))
+        self.assertEqual(len(loaded.search_tasks("Description")), len(manager.search_tasks("Description")))
+        return loaded
+
+    def test_sqlite_applies_mutations_as_they_happen(self):
+        storage = SQLiteStorage(self.path("trellomize.db"))
+        manager = ProjectManager(storage=storage)
+        task_ids = self.fill(manager)
+        storage.close()
+
+        storage = SQLiteStorage(self.path("trellomize.db"))
+        loaded = self.assertLoadsSame(manager, storage)
+        loaded.change_task_priority("Project", task_ids[0], Priority.CRITICAL)
+        loaded.unarchive_task("Project", task_ids[4])
+        # Untouched projects still read their tasks from the first connection.
+        self.addCleanup(storage.close)
+        storage.commit()
+
+        storage = SQLiteStorage(self.path("trellomize.db"))
+        self.addCleanup(storage.close)
+        self.assertLoadsSame(loaded, storage)
+
+    def test_sqlite_load_defers_tasks_until_used(self):
+        storage = SQLiteStorage(self.path("trellomize.db"))
+        manager = ProjectManager(storage=storage)
+        task_ids = self.fill(manager)
+        manager.save_data()
+        storage.close()
+
+        storage = SQLiteStorage(self.path("trellomize.db"))
+        self.addCleanup(storage.close)
+        statements = []
+        storage.connection.set_trace_callback(statements.append)
+        loaded = ProjectManager(storage=storage)
+        loaded.load_data()
+        self.assertFalse([statement for statement in statements if "FROM comments" in statement])
+        for project in loaded.projects.values():
+            self.assertIsNotNone(project.pending_tasks)
+        self.assertEqual(loaded.get_task_project(task_ids[0]), "Project")
+        self.assertEqual(len(loaded.projects["Project"].pending_tasks), 8)
+        self.assertEqual(loaded.find_task(task_ids[0], "Project").status, Status.DOING)
+        self.assertIsNone(loaded.projects["Project"].pending_tasks)
+        self.assertIsNotNone(loaded.projects["Pröject ✓"].pending_tasks)
+        self.assertEqual(board(loaded), board(manager))
+
+    def test_json_save_keeps_users_file_when_writing_fails(self):
+        storage = self.json_storage()
+        manager = ProjectManager(storage=storage)
+        self.fill(manager)
+        manager.save_data()
+        with open(self.path("users.json")) as users_file:
+            saved = users_file.read()
+
+        manager.users["carol"].email = object()
+        manager.save_data()
+        with open(self.path("users.json")) as users_file:
+            self.assertEqual(users_file.read(), saved)
+
+    def test_sqlite_save_replaces_contents(self):
+        manager = ProjectManager()
+        self.fill(manager)
+        storage = SQLiteStorage(self.path("trellomize.db"))
+        self.addCleanup(storage.close)
+        manager.storage = storage
+        manager.save_data()
+        loaded = SQLiteStorage(self.path("trellomize.db"))
+        self.addCleanup(loaded.close)
+        self.assertLoadsSame(manager, loaded)
+
+    def test_binary_round_trip(self):
+        for compression in ("none", "zlib"):
+            with self.subTest(compression=compression):
+                manager = ProjectManager(storage=BinaryStorage(self.path(f"{compression}.snap"), compression))
+                self.fill(manager)
+                manager.save_data()
+                self.assertLoadsSame(manager, BinaryStorage(self.path(f"{compression}.snap"), compression))
+
+    def test_convert_storage_between_json_and_binary(self):
+        manager = ProjectManager(storage=self.json_storage())
+        self.fill(manager)
+        manager.save_data()
+
+        convert_storage(self.json_storage(), BinaryStorage(self.path("trellomize.snap")))
+        self.assertLoadsSame(manager, BinaryStorage(self.path("trellomize.snap")))
+        convert_storage(BinaryStorage(self.path("trellomize.snap")), self.json_storage("copy-"))
+        self.assertLoadsSame(manager, self.json_storage("copy-"))
+
+
+if __name__ == '__main__':
+    unittest.main()